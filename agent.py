@@ -1,4 +1,4 @@
-import asyncio, random, string
+import asyncio, os, random, string
 import nest_asyncio
 
 nest_asyncio.apply()
@@ -12,7 +12,7 @@ import uuid
 import models
 
 from python.helpers import extract_tools, files, errors, history, tokens, context as context_helper
-from python.helpers import dirty_json
+from python.helpers import dirty_json, dotenv, state_monitor
 from python.helpers.print_style import PrintStyle
 
 from langchain_core.prompts import (
@@ -21,8 +21,8 @@ from langchain_core.prompts import (
 from langchain_core.messages import SystemMessage, BaseMessage
 
 import python.helpers.log as Log
-from python.helpers.dirty_json import DirtyJson
-from python.helpers.defer import DeferredTask
+from python.helpers.dirty_json import DirtyJson, DirtyJsonStream
+from python.helpers.defer import DeferredTask, EventLoopPool
 from typing import Callable
 from python.helpers.localization import Localization
 from python.helpers.extension import call_extensions
@@ -57,16 +57,8 @@ class AgentContext:
         output_data: dict | None = None,
         set_current: bool = False,
     ):
-        # initialize context
-        self.id = id or AgentContext.generate_id()
-        existing = self._contexts.get(self.id, None)
-        if existing:
-            AgentContext.remove(self.id)
-        self._contexts[self.id] = self
-        if set_current:
-            AgentContext.set_current(self.id)
-
         # initialize state
+        self.id = id or AgentContext.generate_id()
         self.name = name
         self.config = config
         self.log = log or Log.Log()
@@ -83,10 +75,31 @@ class AgentContext:
         self.data = data or {}
         self.output_data = output_data or {}
 
+        # register the context only when fully initialized, other threads list it right away
+        existing = self._contexts.get(self.id, None)
+        if existing:
+            AgentContext.remove(self.id)
+        self._contexts[self.id] = self
+        if set_current:
+            AgentContext.set_current(self.id)
+        state_monitor.mark_dirty()
+
+    @property
+    def paused(self) -> bool:
+        return self._paused
 
+    @paused.setter
+    def paused(self, value: bool):
+        self._paused = value
+        state_monitor.mark_dirty(self.id)
 
     @staticmethod
     def get(id: str):
+        from python.helpers import persist_chat
+
+        if id and persist_chat.is_unloaded(id):
+            # saved chats are only restored on first access, waits for a restore in progress
+            return persist_chat.load_tmp_chat(id)
         return AgentContext._contexts.get(id, None)
 
     @staticmethod
@@ -112,7 +125,9 @@ class AgentContext:
     @staticmethod
     def first():
         if not AgentContext._contexts:
-            return None
+            from python.helpers import persist_chat
+            unloaded = persist_chat.get_unloaded_chat_ids()
+            return AgentContext.get(unloaded[0]) if unloaded else None
         return list(AgentContext._contexts.values())[0]
 
     @staticmethod
@@ -121,11 +136,13 @@ class AgentContext:
 
     @staticmethod
     def generate_id():
+        from python.helpers import persist_chat
+
         def generate_short_id():
             return ''.join(random.choices(string.ascii_letters + string.digits, k=8))
         while True:
             short_id = generate_short_id()
-            if short_id not in AgentContext._contexts:
+            if short_id not in AgentContext._contexts and not persist_chat.is_unloaded(short_id):
                 return short_id
 
     @classmethod
@@ -135,11 +152,22 @@ class AgentContext:
             cls._notification_manager = NotificationManager()
         return cls._notification_manager
 
+    @staticmethod
+    def get_loop_pool() -> EventLoopPool:
+        # chats are spread over several event loops so one blocking chat does not stall the others
+        return EventLoopPool.get(
+            "AgentContext",
+            size=int(dotenv.get_dotenv_value("AGENT_LOOP_THREADS", None) or min(os.cpu_count() or 1, 4)),
+            strategy=dotenv.get_dotenv_value("AGENT_LOOP_ASSIGNMENT", None) or "least_load",
+        )
+
     @staticmethod
     def remove(id: str):
         context = AgentContext._contexts.pop(id, None)
         if context and context.task:
             context.task.kill()
+        AgentContext.get_loop_pool().release(id)
+        state_monitor.mark_dirty()
         return context
 
     def get_data(self, key: str, recursive: bool = True):
@@ -157,6 +185,7 @@ class AgentContext:
     def set_output_data(self, key: str, value: Any, recursive: bool = True):
         # recursive is not used now, prepared for context hierarchy
         self.output_data[key] = value
+        state_monitor.mark_dirty()
 
     def output(self):
         return {
@@ -245,7 +274,7 @@ class AgentContext:
     ):
         if not self.task:
             self.task = DeferredTask(
-                thread_name=self.__class__.__name__,
+                thread_name=AgentContext.get_loop_pool().assign(self.id),
             )
         self.task.start_task(func, *args, **kwargs)
         return self.task
@@ -331,6 +360,8 @@ class Agent:
     DATA_NAME_SUPERIOR = "_superior"
     DATA_NAME_SUBORDINATE = "_subordinate"
     DATA_NAME_CTX_WINDOW = "ctx_window"
+    DATA_NAME_CTX_WINDOW_PROMPT = "_ctx_window_prompt"
+    DATA_NAME_SYSTEM_PROMPT = "_system_prompt"
 
     def __init__(
         self, number: int, config: AgentConfig, context: AgentContext | None = None
@@ -489,13 +520,23 @@ class Agent:
 
         # set system prompt and message history
         loop_data.system = await self.get_system_prompt(self.loop_data)
-        loop_data.history_output = self.history.output()
+        loop_data.history_output = history_output = self.history.output()
+        history_tokens = self.history.get_tokens()
 
         # and allow extensions to edit them
         await self.call_extensions("message_loop_prompts_after", loop_data=loop_data)
 
-        # concatenate system prompt
-        system_text = "\n\n".join(loop_data.system)
+        # concatenate system prompt, text and tokens are reused while its parts are unchanged
+        cached_system = self.get_data(Agent.DATA_NAME_SYSTEM_PROMPT)
+        if cached_system and cached_system[0] == loop_data.system:
+            _, system_text, system_tokens = cached_system
+        else:
+            system_text = "\n\n".join(loop_data.system)
+            system_tokens = tokens.approximate_tokens(system_text)
+            self.set_data(
+                Agent.DATA_NAME_SYSTEM_PROMPT,
+                (list(loop_data.system), system_text, system_tokens),
+            )
 
         # join extras
         extras = history.Message(  # type: ignore[abstract]
@@ -519,19 +560,37 @@ class Agent:
             SystemMessage(content=system_text),
             *history_langchain,
         ]
-        full_text = ChatPromptTemplate.from_messages(full_prompt).format()
-
-        # store as last context window content
-        self.set_data(
-            Agent.DATA_NAME_CTX_WINDOW,
-            {
-                "text": full_text,
-                "tokens": tokens.approximate_tokens(full_text),
-            },
+
+        # count tokens from the history's running totals, recount only if extensions replaced the output
+        if loop_data.history_output is not history_output or len(history_output) != len(
+            loop_data.history_output
+        ):
+            history_tokens = tokens.approximate_tokens(
+                history.output_text(loop_data.history_output)
+            )
+        prompt_tokens = (
+            system_tokens
+            + history_tokens
+            + tokens.approximate_tokens(history.output_text(extras))
         )
 
+        # store as last context window, the text is formatted only when requested
+        self.set_data(Agent.DATA_NAME_CTX_WINDOW, {"tokens": prompt_tokens})
+        self.set_data(Agent.DATA_NAME_CTX_WINDOW_PROMPT, full_prompt)
+
         return full_prompt
 
+    def get_ctx_window(self) -> dict[str, Any]:
+        window = self.get_data(Agent.DATA_NAME_CTX_WINDOW)
+        if not window or not isinstance(window, dict):
+            return {"text": "", "tokens": 0}
+        prompt = self.get_data(Agent.DATA_NAME_CTX_WINDOW_PROMPT)
+        if prompt:
+            text = ChatPromptTemplate.from_messages(prompt).format()
+        else:
+            text = window.get("text", "")  # stored by chats saved before the lazy window
+        return {"text": text, "tokens": window.get("tokens", 0)}
+
     def handle_critical_exception(self, exception: Exception):
         if isinstance(exception, HandledException):
             raise exception  # Re-raise the exception to kill the loop
@@ -865,6 +924,9 @@ class Agent:
 
     async def handle_reasoning_stream(self, stream: str):
         await self.handle_intervention()
+        await self.process_reasoning_stream(stream)
+
+    async def process_reasoning_stream(self, stream: str):
         await self.call_extensions(
             "reasoning_stream",
             loop_data=self.loop_data,
@@ -873,16 +935,24 @@ class Agent:
 
     async def handle_response_stream(self, stream: str):
         await self.handle_intervention()
+        await self.process_response_stream(stream)
+
+    async def process_response_stream(self, stream: str):
         try:
             if len(stream) < 25:
                 return  # no reason to try
-            response = DirtyJson.parse_string(stream)
+            # one incremental parser per response, fed only the new part of the stream
+            parser = self.loop_data.params_temporary.get("response_stream_parser")
+            if not parser:
+                parser = DirtyJsonStream()
+                self.loop_data.params_temporary["response_stream_parser"] = parser
+            response = parser.update(stream)
             if isinstance(response, dict):
                 await self.call_extensions(
                     "response_stream",
                     loop_data=self.loop_data,
                     text=stream,
-                    parsed=response,
+                    parsed=dict(response),  # extensions must not alter the parser's state
                 )
 
         except Exception as e:
@@ -1,7 +1,11 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
 from dataclasses import dataclass, field
 from enum import Enum
+import json
 import logging
 import os
+import threading
 from typing import (
     Any,
     Awaitable,
@@ -14,16 +18,17 @@ from typing import (
     TypedDict,
 )
 
-from litellm import completion, acompletion, embedding
+from litellm import completion, acompletion, embedding, aembedding
 import litellm
 import openai
 from litellm.types.utils import ModelResponse
 
-from python.helpers import dotenv
+from python.helpers import dotenv, files
 from python.helpers import settings, dirty_json
 from python.helpers.dotenv import load_dotenv
 from python.helpers.providers import get_provider_config
 from python.helpers.rate_limiter import RateLimiter
+from python.helpers.embedding_batch import EmbeddingBatcher
 from python.helpers.tokens import approximate_tokens
 from python.helpers import dirty_json, browser_use_monkeypatch
 
@@ -196,6 +201,10 @@ class ChatGenerationResult:
 
 rate_limiters: dict[str, RateLimiter] = {}
 api_keys_round_robin: dict[str, int] = {}
+_sentence_transformers: dict[str, tuple[SentenceTransformer, EmbeddingBatcher]] = {}
+_sentence_transformers_lock = threading.Lock()
+# sync callers on a running event loop wait for the rate limiter on a loop of their own here
+_rate_limiter_sync_pool = ThreadPoolExecutor(thread_name_prefix="RateLimiterSync")
 
 
 def get_api_key(service: str) -> str:
@@ -218,7 +227,16 @@ def get_rate_limiter(
     provider: str, name: str, requests: int, input: int, output: int
 ) -> RateLimiter:
     key = f"{provider}\\{name}"
-    rate_limiters[key] = limiter = rate_limiters.get(key, RateLimiter(seconds=60))
+    limiter = rate_limiters.get(key)
+    if limiter is None:
+        # with a shared directory set, all processes using it share one budget per model
+        shared_dir = dotenv.get_dotenv_value("RATE_LIMIT_SHARED_DIR")
+        path = (
+            os.path.join(shared_dir, files.safe_file_name(key) + ".json")
+            if shared_dir
+            else None
+        )
+        rate_limiters[key] = limiter = RateLimiter(seconds=60, path=path)
     limiter.limits["requests"] = requests or 0
     limiter.limits["input"] = input or 0
     limiter.limits["output"] = output or 0
@@ -266,9 +284,9 @@ async def apply_rate_limiter(
         model_config.limit_input,
         model_config.limit_output,
     )
-    limiter.add(input=approximate_tokens(input_text))
-    limiter.add(requests=1)
-    await limiter.wait(rate_limiter_callback)
+    await limiter.acquire(
+        rate_limiter_callback, input=approximate_tokens(input_text), requests=1
+    )
     return limiter
 
 
@@ -281,12 +299,14 @@ def apply_rate_limiter_sync(
 ):
     if not model_config:
         return
-    import asyncio, nest_asyncio
-
-    nest_asyncio.apply()
-    return asyncio.run(
-        apply_rate_limiter(model_config, input_text, rate_limiter_callback)
-    )
+    coro = apply_rate_limiter(model_config, input_text, rate_limiter_callback)
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return asyncio.run(coro)  # no loop in this thread, nothing is nested
+    # a sync call from code running on an event loop: instead of nesting a loop
+    # in it, wait on a helper thread, the limiter serves waiters of any loop
+    return _rate_limiter_sync_pool.submit(asyncio.run, coro).result()
 
 
 class LiteLLMChatWrapper(SimpleChatModel):
@@ -691,6 +711,19 @@ class LiteLLMEmbeddingWrapper(Embeddings):
         item = resp.data[0]  # type: ignore
         return item.get("embedding") if isinstance(item, dict) else item.embedding  # type: ignore
 
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        # Apply rate limiting if configured
+        await apply_rate_limiter(self.a0_model_conf, " ".join(texts))
+
+        resp = await aembedding(model=self.model_name, input=texts, **self.kwargs)
+        return [
+            item.get("embedding") if isinstance(item, dict) else item.embedding  # type: ignore
+            for item in resp.data  # type: ignore
+        ]
+
+    async def aembed_query(self, text: str) -> List[float]:
+        return (await self.aembed_documents([text]))[0]
+
 
 class LocalSentenceTransformerWrapper(Embeddings):
     """Local wrapper for sentence-transformers models to avoid HuggingFace API calls"""
@@ -720,7 +753,8 @@ class LocalSentenceTransformerWrapper(Embeddings):
         }
         st_kwargs = {k: v for k, v in (kwargs or {}).items() if k in st_allowed_keys}
 
-        self.model = SentenceTransformer(model, **st_kwargs)
+        # the model is loaded once per process, requests of all wrappers share its batcher
+        self.model, self.batcher = _get_sentence_transformer(model, st_kwargs)
         self.model_name = model
         self.a0_model_conf = model_config
 
@@ -728,18 +762,44 @@ class LocalSentenceTransformerWrapper(Embeddings):
         # Apply rate limiting if configured
         apply_rate_limiter_sync(self.a0_model_conf, " ".join(texts))
 
-        embeddings = self.model.encode(texts, convert_to_tensor=False)  # type: ignore
-        return embeddings.tolist() if hasattr(embeddings, "tolist") else embeddings  # type: ignore
+        return self.batcher.embed(texts)
 
     def embed_query(self, text: str) -> List[float]:
         # Apply rate limiting if configured
         apply_rate_limiter_sync(self.a0_model_conf, text)
 
-        embedding = self.model.encode([text], convert_to_tensor=False)  # type: ignore
-        result = (
-            embedding[0].tolist() if hasattr(embedding[0], "tolist") else embedding[0]
-        )
-        return result  # type: ignore
+        return self.batcher.embed([text])[0]
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        # Apply rate limiting if configured
+        await apply_rate_limiter(self.a0_model_conf, " ".join(texts))
+
+        return await self.batcher.aembed(texts)
+
+    async def aembed_query(self, text: str) -> List[float]:
+        # Apply rate limiting if configured
+        await apply_rate_limiter(self.a0_model_conf, text)
+
+        return (await self.batcher.aembed([text]))[0]
+
+
+def _get_sentence_transformer(
+    model: str, st_kwargs: dict
+) -> tuple[SentenceTransformer, EmbeddingBatcher]:
+    key = json.dumps([model, st_kwargs], sort_keys=True, default=str)
+    with _sentence_transformers_lock:
+        if key not in _sentence_transformers:
+            st = SentenceTransformer(model, **st_kwargs)
+
+            def encode(texts: list[str]) -> list[list[float]]:
+                embeddings = st.encode(texts, convert_to_tensor=False)  # type: ignore
+                return embeddings.tolist() if hasattr(embeddings, "tolist") else embeddings  # type: ignore
+
+            _sentence_transformers[key] = (
+                st,
+                EmbeddingBatcher(encode, name=f"EmbeddingBatch-{model}"),
+            )
+        return _sentence_transformers[key]
 
 
 def _get_litellm_chat(
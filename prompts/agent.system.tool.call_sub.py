@@ -6,6 +6,18 @@ from python.helpers.print_style import PrintStyle
 
 
 class CallSubordinate(VariablesPlugin):
+    def get_cache_key(self, file: str, backup_dirs: list[str] | None = None) -> Any:
+        # profiles do not depend on the prompt folders
+        return "agent_profiles"
+
+    def get_dependencies(self, file: str, backup_dirs: list[str] | None = None) -> list[str]:
+        # profiles added or removed change the agents folder, edited contexts themselves
+        agent_subdirs = files.get_subdirectories("agents", exclude=["_example"])
+        return [files.get_abs_path("agents")] + [
+            files.get_abs_path("agents", agent_subdir, "_context.md")
+            for agent_subdir in agent_subdirs
+        ]
+
     def get_variables(self, file: str, backup_dirs: list[str] | None = None) -> dict[str, Any]:
 
         # collect all prompt profiles from subdirectories (_context.md file)
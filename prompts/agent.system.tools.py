@@ -6,14 +6,29 @@ from python.helpers.print_style import PrintStyle
 
 
 class CallSubordinate(VariablesPlugin):
-    def get_variables(self, file: str, backup_dirs: list[str] | None = None) -> dict[str, Any]:
+    def get_cache_key(self, file: str, backup_dirs: list[str] | None = None) -> Any:
+        # the same prompt folders, that is the same agent profile, give the same tools
+        return tuple(self.get_folders(file, backup_dirs))
+
+    def get_dependencies(self, file: str, backup_dirs: list[str] | None = None) -> list[str]:
+        # tool files added or removed change the folders, the tool prompts and what they
+        # include or load (agent profiles...) are tracked while rendering them
+        folders = self.get_folders(file, backup_dirs)
+        return folders + files.get_unique_filenames_in_dirs(folders, "agent.system.tool.*.md")
 
+    def get_folders(self, file: str, backup_dirs: list[str] | None = None) -> list[str]:
         # collect all prompt folders in order of their priority
         folder = files.get_abs_path(os.path.dirname(file))
         folders = [folder]
         if backup_dirs:
             for backup_dir in backup_dirs:
                 folders.append(files.get_abs_path(backup_dir))
+        return folders
+
+    def get_variables(self, file: str, backup_dirs: list[str] | None = None) -> dict[str, Any]:
+
+        # collect all prompt folders in order of their priority
+        folders = self.get_folders(file, backup_dirs)
 
         # collect all tool instruction files
         prompt_files = files.get_unique_filenames_in_dirs(folders, "agent.system.tool.*.md")
@@ -0,0 +1,15 @@
+from python.helpers.api import ApiHandler, Request, Response
+
+from agent import AgentContext
+
+
+class LoopsStatus(ApiHandler):
+
+    @classmethod
+    def get_methods(cls) -> list[str]:
+        return ["GET", "POST"]
+
+    async def process(self, input: dict, request: Request) -> dict | Response:
+        pool = AgentContext.get_loop_pool()
+        # per loop: pinned contexts, pending tasks and how late the loop runs callbacks (seconds)
+        return {"success": True, "strategy": pool.strategy, "loops": pool.get_stats()}
@@ -0,0 +1,81 @@
+import json
+import time
+
+from python.helpers.api import ApiHandler, Request, Response
+
+from agent import AgentContext
+from python.api.poll import get_state
+from python.helpers import state_monitor
+from python.helpers.localization import Localization
+from python.helpers.dotenv import get_dotenv_value
+
+
+class PollStream(ApiHandler):
+    """Server-sent events variant of /poll.
+
+    The connection waits on the state monitor and pushes the same payload as
+    /poll (with logs and notifications as deltas) only when the shared lists or
+    its own context changed, so an idle client costs a sleeping thread instead of
+    four requests a second, and streaming in other chats does not wake it.
+    """
+
+    KEEPALIVE = 15  # seconds, comment ping and full resync on an idle stream
+    COALESCE = 0.025  # seconds, batch bursts of streamed tokens into one event
+
+    @classmethod
+    def get_methods(cls) -> list[str]:
+        return ["GET"]
+
+    async def process(self, input: dict, request: Request) -> dict | Response:
+        ctxid = request.args.get("context", "")
+        log_from = int(request.args.get("log_from", 0) or 0)
+        notifications_from = int(request.args.get("notifications_from", 0) or 0)
+
+        timezone = request.args.get("timezone", get_dotenv_value("DEFAULT_USER_TIMEZONE", "UTC"))
+        Localization.get().set_timezone(timezone)
+
+        def events():
+            nonlocal log_from, notifications_from
+            log_guid = notifications_guid = None
+            sent = None
+            version = state_monitor.get_version(ctxid)
+
+            while True:
+                context = AgentContext.get(ctxid) if ctxid else None
+                state = get_state(ctxid, context, log_from, notifications_from)
+
+                # chat reset or notifications cleared, resend from the start
+                if (log_guid is not None and state["log_guid"] != log_guid) or (
+                    notifications_guid is not None
+                    and state["notifications_guid"] != notifications_guid
+                ):
+                    if state["log_guid"] != log_guid:
+                        log_from = 0
+                    if state["notifications_guid"] != notifications_guid:
+                        notifications_from = 0
+                    state = get_state(ctxid, context, log_from, notifications_from)
+
+                rest = json.dumps(
+                    {k: v for k, v in state.items() if k not in ("logs", "notifications")}
+                )
+                if state["logs"] or state["notifications"] or rest != sent:
+                    yield f"data: {json.dumps(state)}\n\n"
+                    sent = rest
+                    log_guid, log_from = state["log_guid"], state["log_version"]
+                    notifications_guid = state["notifications_guid"]
+                    notifications_from = state["notifications_version"]
+                    if state["deselect_chat"]:
+                        return  # the client switches context and reconnects
+
+                new_version = state_monitor.wait_for_change(version, self.KEEPALIVE, ctxid)
+                if new_version == version:
+                    yield ": keepalive\n\n"
+                else:
+                    time.sleep(self.COALESCE)
+                    version = state_monitor.get_version(ctxid)
+
+        return Response(
+            events(),
+            mimetype="text/event-stream",
+            headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+        )
@@ -1,6 +1,6 @@
 import asyncio
 from python.helpers.extension import Extension
-from python.helpers.memory import Memory
+from python.helpers.memory import Memory, MemorySearch
 from agent import LoopData
 from python.tools.memory_load import DEFAULT_THRESHOLD as DEFAULT_MEMORY_THRESHOLD
 from python.helpers import dirty_json, errors, settings, log 
@@ -114,20 +114,21 @@ class RecallMemories(Extension):
         # get memory database
         db = await Memory.get(self.agent)
 
-        # search for general memories and fragments
-        memories = await db.search_similarity_threshold(
+        # search for general memories and fragments, and for solutions, in one pass
+        memories, solutions = await db.search_similarity_threshold_multi(
             query=query,
-            limit=set["memory_recall_memories_max_search"],
-            threshold=set["memory_recall_similarity_threshold"],
-            filter=f"area == '{Memory.Area.MAIN.value}' or area == '{Memory.Area.FRAGMENTS.value}'",  # exclude solutions
-        )
-
-        # search for solutions
-        solutions = await db.search_similarity_threshold(
-            query=query,
-            limit=set["memory_recall_solutions_max_search"],
-            threshold=set["memory_recall_similarity_threshold"],
-            filter=f"area == '{Memory.Area.SOLUTIONS.value}'",  # exclude solutions
+            searches=[
+                MemorySearch(
+                    limit=set["memory_recall_memories_max_search"],
+                    threshold=set["memory_recall_similarity_threshold"],
+                    filter=f"area == '{Memory.Area.MAIN.value}' or area == '{Memory.Area.FRAGMENTS.value}'",  # exclude solutions
+                ),
+                MemorySearch(
+                    limit=set["memory_recall_solutions_max_search"],
+                    threshold=set["memory_recall_similarity_threshold"],
+                    filter=f"area == '{Memory.Area.SOLUTIONS.value}'",
+                ),
+            ],
         )
 
         if not memories and not solutions:
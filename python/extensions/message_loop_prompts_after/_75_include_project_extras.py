@@ -1,3 +1,4 @@
+import asyncio
 from python.helpers.extension import Extension
 from agent import LoopData
 from python.helpers import projects
@@ -16,7 +17,10 @@ class IncludeProjectExtras(Extension):
 
         # load file structure if enabled
         if project["file_structure"]["enabled"]:
-            file_structure = projects.get_file_structure(project_name)
+            # cached until the project's directories change, the walk runs off the event loop
+            file_structure = await asyncio.get_running_loop().run_in_executor(
+                None, projects.get_file_structure, project_name, project
+            )
             gitignore = cleanup_gitignore(project["file_structure"]["gitignore"])
 
             # read prompt
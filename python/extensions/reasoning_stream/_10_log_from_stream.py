@@ -26,4 +26,4 @@ class LogFromStream(Extension):
 
         # update log message
         log_item = loop_data.params_temporary["log_item_generating"]
-        log_item.update(heading=heading, reasoning=text)
+        log_item.update_throttled(heading=heading, reasoning=text)
@@ -4,7 +4,7 @@ from python.helpers.extension import Extension
 class MaskReasoningStreamEnd(Extension):
     async def execute(self, **kwargs):
         # Get agent and finalize the streaming filter
-        agent = kwargs.get("agent")
+        agent = kwargs.get("agent") or self.agent
         if not agent:
             return
 
@@ -19,6 +19,8 @@ class MaskReasoningStreamEnd(Extension):
                 if tail:
                     from python.helpers.print_style import PrintStyle
                     PrintStyle().stream(tail)
+                    # the held back tail has not reached the log yet, pass the complete text again
+                    await agent.process_reasoning_stream(filter_instance.output)
 
                 # Clean up the filter
                 agent.set_data(filter_key, None)
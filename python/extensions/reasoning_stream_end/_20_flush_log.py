@@ -0,0 +1,10 @@
+from python.helpers.extension import Extension
+from agent import LoopData
+
+
+class FlushReasoningLog(Extension):
+    async def execute(self, loop_data: LoopData = LoopData(), **kwargs):
+        # apply the last throttled update of the streamed log item
+        log_item = loop_data.params_temporary.get("log_item_generating")
+        if log_item:
+            log_item.flush()
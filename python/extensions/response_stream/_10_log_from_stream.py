@@ -47,5 +47,5 @@ class LogFromStream(Extension):
             kvps["reasoning"] = log_item.kvps["reasoning"]
         kvps.update(parsed)
 
-        # update the log item
-        log_item.update(heading=heading, content=text, kvps=kvps)
\ No newline at end of file
+        # update the log item, applied a few times per second, flushed at stream end
+        log_item.update_throttled(heading=heading, content=text, kvps=kvps)
\ No newline at end of file
@@ -8,17 +8,17 @@ class MaskResponseStreamChunk(Extension):
     async def execute(self, **kwargs):
         # Get stream data and agent from kwargs
         stream_data = kwargs.get("stream_data")
-        agent = kwargs.get("agent")
+        agent = kwargs.get("agent") or self.agent
         if not agent or not stream_data:
             return
 
         try:
             secrets_mgr = get_secrets_manager(self.agent.context)
 
-            # Initialize filter if not exists
+            # Initialize filter if not exists, or for a new stream after an interrupted one
             filter_key = "_resp_stream_filter"
             filter_instance = agent.get_data(filter_key)
-            if not filter_instance:
+            if not filter_instance or stream_data["chunk"] == stream_data["full"]:
                 filter_instance = secrets_mgr.create_streaming_filter()
                 agent.set_data(filter_key, filter_instance)
 
@@ -28,13 +28,11 @@ class MaskResponseStreamChunk(Extension):
             # Update the stream data with processed chunk
             stream_data["chunk"] = processed_chunk
 
-            # Also mask the full text for consistency
-            stream_data["full"] = secrets_mgr.mask_values(stream_data["full"])
+            # The full text is what the filter emitted so far, masked chunk by chunk
+            # instead of re-masking the whole accumulated response on every chunk
+            stream_data["full"] = filter_instance.output
 
-            # Print the processed chunk (this is where printing should happen)
-            if processed_chunk:
-                from python.helpers.print_style import PrintStyle
-                PrintStyle().stream(processed_chunk)
+            # The agent prints the processed chunk after extensions ran
         except Exception as e:
             # If masking fails, proceed without masking
             pass
@@ -5,7 +5,7 @@ from python.helpers.secrets import SecretsManager
 class MaskResponseStreamEnd(Extension):
     async def execute(self, **kwargs):
         # Get agent and finalize the streaming filter
-        agent = kwargs.get("agent")
+        agent = kwargs.get("agent") or self.agent
         if not agent:
             return
 
@@ -20,6 +20,8 @@ class MaskResponseStreamEnd(Extension):
                 if tail:
                     from python.helpers.print_style import PrintStyle
                     PrintStyle().stream(tail)
+                    # the held back tail has not reached the parser and log yet, pass the complete text again
+                    await agent.process_response_stream(filter_instance.output)
 
                 # Clean up the filter
                 agent.set_data(filter_key, None)
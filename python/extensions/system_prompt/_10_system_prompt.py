@@ -1,10 +1,14 @@
-from typing import Any
+from typing import Any, Callable, TypeVar
 from python.helpers.extension import Extension
 from python.helpers.mcp_handler import MCPConfig
 from agent import Agent, LoopData
 from python.helpers.settings import get_settings
 from python.helpers import projects
 
+T = TypeVar("T")
+
+CONTEXT_DATA_KEY_SECTIONS = "_system_prompt_sections"  # not persisted, starts with _
+
 
 class SystemPrompt(Extension):
 
@@ -31,6 +35,24 @@ class SystemPrompt(Extension):
             system_prompt.append(project_prompt)
 
 
+def memoize(agent: Agent, section: str, inputs: Any, build: Callable[[], T]) -> T:
+    """Reuse the value built for a section of the context while its inputs stay equal.
+
+    Prompt files are not inputs here, they are re-rendered on each build
+    through the compiled template cache, which follows their changes.
+    """
+    sections: dict[str, tuple[Any, Any]] | None = agent.context.get_data(CONTEXT_DATA_KEY_SECTIONS)
+    if sections is None:
+        sections = {}
+        agent.context.set_data(CONTEXT_DATA_KEY_SECTIONS, sections)
+    cached = sections.get(section)
+    if cached is not None and cached[0] == inputs:
+        return cached[1]
+    value = build()
+    sections[section] = (inputs, value)
+    return value
+
+
 def get_main_prompt(agent: Agent):
     return agent.read_prompt("agent.system.main.md")
 
@@ -45,23 +67,35 @@ def get_tools_prompt(agent: Agent):
 def get_mcp_tools_prompt(agent: Agent):
     mcp_config = MCPConfig.get_instance()
     if mcp_config.servers:
-        pre_progress = agent.context.log.progress
-        agent.context.log.set_progress(
-            "Collecting MCP tools"
-        )  # MCP might be initializing, better inform via progress bar
-        tools = MCPConfig.get_instance().get_tools_prompt()
-        agent.context.log.set_progress(pre_progress)  # return original progress
-        return tools
+        # version is read first, tools listed meanwhile make the next build collect again
+        return memoize(
+            agent, "mcp_tools", MCPConfig.get_tools_version(), lambda: collect_mcp_tools_prompt(agent)
+        )
     return ""
 
 
+def collect_mcp_tools_prompt(agent: Agent):
+    pre_progress = agent.context.log.progress
+    agent.context.log.set_progress(
+        "Collecting MCP tools"
+    )  # MCP might be initializing, better inform via progress bar
+    tools = MCPConfig.get_instance().get_tools_prompt()
+    agent.context.log.set_progress(pre_progress)  # return original progress
+    return tools
+
+
 def get_secrets_prompt(agent: Agent):
     try:
         # Use lazy import to avoid circular dependencies
         from python.helpers.secrets import get_secrets_manager
 
         secrets_manager = get_secrets_manager(agent.context)
-        secrets = secrets_manager.get_secrets_for_prompt()
+        secrets = memoize(
+            agent,
+            "secrets",
+            (id(secrets_manager), secrets_manager.get_version()),
+            secrets_manager.get_secrets_for_prompt,
+        )
         vars = get_settings()["variables"]
         return agent.read_prompt("agent.system.secrets.md", secrets=secrets, vars=vars)
     except Exception as e:
@@ -73,7 +107,12 @@ def get_project_prompt(agent: Agent):
     result = agent.read_prompt("agent.system.projects.main.md")
     project_name = agent.context.get_data(projects.CONTEXT_DATA_KEY_PROJECT)
     if project_name:
-        project_vars = projects.build_system_prompt_vars(project_name)
+        project_vars = memoize(
+            agent,
+            "project",
+            (project_name, projects.get_system_prompt_version(project_name)),
+            lambda: projects.build_system_prompt_vars(project_name),
+        )
         result += "\n\n" + agent.read_prompt(
             "agent.system.projects.active.md", **project_vars
         )
@@ -1,6 +1,9 @@
 import asyncio
+from collections import deque
 from dataclasses import dataclass
 import threading
+import time
+import zlib
 from concurrent.futures import Future
 from typing import Any, Callable, Optional, Coroutine, TypeVar, Awaitable
 
@@ -50,6 +53,97 @@ class EventLoopThread:
         return asyncio.run_coroutine_threadsafe(coro, self.loop)
 
 
+class EventLoopPool:
+    """A fixed set of EventLoopThreads sharing one kind of work.
+
+    Keys (context ids) are pinned to one loop for their lifetime so their tasks
+    never migrate, and a blocking call only stalls the keys sharing its loop.
+    New keys go to the least loaded loop or are spread by hash. Every loop runs
+    a small probe measuring how late its callbacks run, exposed by get_stats.
+    """
+
+    _instances: dict[str, "EventLoopPool"] = {}
+    _lock = threading.Lock()
+
+    PROBE_INTERVAL = 1.0  # seconds between lag samples
+    PROBE_SAMPLES = 60  # samples kept for max lag
+
+    @classmethod
+    def get(cls, name: str, size: int = 1, strategy: str = "least_load") -> "EventLoopPool":
+        with cls._lock:
+            if name not in cls._instances:
+                cls._instances[name] = cls(name, size, strategy)
+            return cls._instances[name]
+
+    def __init__(self, name: str, size: int = 1, strategy: str = "least_load"):
+        self.name = name
+        self.size = max(1, size)
+        self.strategy = strategy
+        self._assigned: dict[str, int] = {}
+        self._lags: list[deque[float]] = [deque(maxlen=self.PROBE_SAMPLES) for _ in range(self.size)]
+        self._probes: set[int] = set()
+        self._lock = threading.Lock()
+
+    def thread_name(self, index: int) -> str:
+        # a single loop keeps the plain name
+        return self.name if self.size == 1 else f"{self.name}-{index}"
+
+    def assign(self, key: str) -> str:
+        """Return the thread name of the loop the key is pinned to, assigning one if needed."""
+        with self._lock:
+            index = self._assigned.get(key)
+            if index is None:
+                if self.strategy == "hash":
+                    index = zlib.crc32(key.encode("utf-8")) % self.size
+                else:
+                    load = [0] * self.size
+                    for i in self._assigned.values():
+                        load[i] += 1
+                    index = load.index(min(load))
+                self._assigned[key] = index
+            start_probe = index not in self._probes
+            self._probes.add(index)
+        name = self.thread_name(index)
+        if start_probe:
+            EventLoopThread(name).run_coroutine(self._probe(index))
+        return name
+
+    def release(self, key: str):
+        with self._lock:
+            self._assigned.pop(key, None)
+
+    def get_stats(self) -> list[dict[str, Any]]:
+        with self._lock:
+            load = [0] * self.size
+            for i in self._assigned.values():
+                load[i] += 1
+            probes = set(self._probes)
+
+        stats = []
+        for index in range(self.size):
+            name = self.thread_name(index)
+            lags = list(self._lags[index])
+            loop = EventLoopThread(name).loop if index in probes else None
+            stats.append(
+                {
+                    "name": name,
+                    "keys": load[index],
+                    # tasks on the loop, the lag probe excluded
+                    "tasks": max(len(asyncio.all_tasks(loop)) - 1, 0) if loop else 0,
+                    "lag": lags[-1] if lags else 0.0,
+                    "max_lag": max(lags) if lags else 0.0,
+                }
+            )
+        return stats
+
+    async def _probe(self, index: int):
+        # a sleep that wakes up late means something blocked the loop for that long
+        while True:
+            start = time.monotonic()
+            await asyncio.sleep(self.PROBE_INTERVAL)
+            self._lags[index].append(max(time.monotonic() - start - self.PROBE_INTERVAL, 0.0))
+
+
 @dataclass
 class ChildTask:
     task: "DeferredTask"
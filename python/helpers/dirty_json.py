@@ -1,4 +1,5 @@
 import json
+import re
 
 def try_parse(json_string: str):
     try:
@@ -15,7 +16,19 @@ def stringify(obj, **kwargs):
     return json.dumps(obj, ensure_ascii=False, **kwargs)
 
 
+# characters that interrupt a plain run inside a quoted string
+_STRING_STOPS = {q: re.compile("[\\\\" + re.escape(q) + "]") for q in ['"', "'", "`"]}
+
+
 class DirtyJson:
+    """Forgiving JSON parser.
+
+    parse() parses a complete string in one go. feed() parses input incrementally:
+    the parser suspends where the input ends and resumes there on the next chunk,
+    so every chunk costs time proportional to its own size. After each feed()
+    the result holds everything parsed so far, including partial strings.
+    """
+
     def __init__(self):
         self._reset()
 
@@ -25,6 +38,10 @@ class DirtyJson:
         self.current_char = None
         self.result = None
         self.stack = []
+        self._complete = False  # no more input will arrive
+        self._parser = None  # suspended parsing generator when feeding
+        self._done = False
+        self._slot = None  # (container, key) the value being parsed goes to
 
     @staticmethod
     def parse_string(json_string):
@@ -34,29 +51,79 @@ class DirtyJson:
     def parse(self, json_string):
         self._reset()
         self.json_string = json_string
+        self._complete = True
 
         # Add bounds checking to prevent IndexError
         if not json_string:
             # Return None for empty strings
             return None
 
-        self.index = self.get_start_pos(self.json_string)
+        # with complete input the parser never suspends
+        self._parser = self._run()
+        self._resume()
+        return self.result
+
+    def feed(self, chunk):
+        if self._done:
+            return self.result
+        if self._parser is None:
+            self._parser = self._run()
+        # the parser never looks back, consumed input can be dropped
+        self.json_string = self.json_string[self.index :] + chunk
+        self.index = 0
+        self.current_char = self.json_string[0] if self.json_string else None
+        self._resume()
+        return self.result
+
+    def _resume(self):
+        try:
+            next(self._parser)  # type: ignore
+        except StopIteration:
+            self._done = True
+
+    def _run(self):
+        yield from self._seek_start()
 
         # Ensure index is within bounds
         if self.index >= len(self.json_string):
             # If start position is beyond string length, return None
-            return None
+            return
 
         self.current_char = self.json_string[self.index]
-        self._parse()
-        return self.result
-
-    def feed(self, chunk):
-        self.json_string += chunk
-        if not self.current_char and self.json_string:
-            self.current_char = self.json_string[0]
-        self._parse()
-        return self.result
+        self._slot = None
+        self.result = yield from self._parse_value()
+
+    def _seek_start(self):
+        while True:
+            pos = self._find_start(self.json_string, self.index)
+            if pos != -1:
+                self.index = pos
+                return
+            if self._complete:
+                self.index = 0
+                return
+            self.index = len(self.json_string)
+            yield
+
+    def _need(self, lookahead=0):
+        # suspend until the cursor (plus lookahead) is buffered or input is complete
+        while not self._complete and self.index + lookahead >= len(self.json_string):
+            yield
+
+    def _more(self):
+        # called when out of buffered input, returns False at the real end of input
+        yield from self._need()
+        return self.current_char is not None
+
+    def _publish(self, value):
+        # expose a partially parsed value in the result while waiting for input
+        if self._complete:
+            return
+        if self._slot is None:
+            self.result = value
+        else:
+            container, key = self._slot
+            container[key] = value
 
     def _advance(self, count=1):
         self.index += count
@@ -66,84 +133,74 @@ class DirtyJson:
             self.current_char = None
 
     def _skip_whitespace(self):
-        while self.current_char is not None:
-            if self.current_char.isspace():
+        while self.current_char is not None or (yield from self._more()):
+            if self.current_char.isspace():  # type: ignore
                 self._advance()
-            elif (
-                self.current_char == "/" and self._peek(1) == "/"
-            ):  # Single-line comment
-                self._skip_single_line_comment()
-            elif (
-                self.current_char == "/" and self._peek(1) == "*"
-            ):  # Multi-line comment
-                self._skip_multi_line_comment()
+            elif self.current_char == "/":
+                yield from self._need(1)
+                if self._peek(1) == "/":  # Single-line comment
+                    yield from self._skip_single_line_comment()
+                elif self._peek(1) == "*":  # Multi-line comment
+                    yield from self._skip_multi_line_comment()
+                else:
+                    break
             else:
                 break
 
     def _skip_single_line_comment(self):
-        while self.current_char is not None and self.current_char != "\n":
+        while (
+            self.current_char is not None or (yield from self._more())
+        ) and self.current_char != "\n":
             self._advance()
         if self.current_char == "\n":
             self._advance()
 
     def _skip_multi_line_comment(self):
         self._advance(2)  # Skip /*
-        while self.current_char is not None:
-            if self.current_char == "*" and self._peek(1) == "/":
-                self._advance(2)  # Skip */
-                break
+        while self.current_char is not None or (yield from self._more()):
+            if self.current_char == "*":
+                yield from self._need(1)
+                if self._peek(1) == "/":
+                    self._advance(2)  # Skip */
+                    break
             self._advance()
 
-    def _parse(self):
-        if self.result is None:
-            self.result = self._parse_value()
-        else:
-            self._continue_parsing()
-
-    def _continue_parsing(self):
-        while self.current_char is not None:
-            if isinstance(self.result, dict):
-                self._parse_object_content()
-            elif isinstance(self.result, list):
-                self._parse_array_content()
-            elif isinstance(self.result, str):
-                self.result = self._parse_string()
-            else:
-                break
-
     def _parse_value(self):
-        self._skip_whitespace()
+        yield from self._skip_whitespace()
         if self.current_char == "{":
+            yield from self._need(1)
             if self._peek(1) == "{":  # Handle {{
                 self._advance(2)
-            return self._parse_object()
+            return (yield from self._parse_object())
         elif self.current_char == "[":
-            return self._parse_array()
+            return (yield from self._parse_array())
         elif self.current_char in ['"', "'", "`"]:
+            yield from self._need(2)
             if self._peek(2) == self.current_char * 2:  # type: ignore
-                return self._parse_multiline_string()
-            return self._parse_string()
+                return (yield from self._parse_multiline_string())
+            return (yield from self._parse_string())
         elif self.current_char and (
             self.current_char.isdigit() or self.current_char in ["-", "+"]
         ):
-            return self._parse_number()
-        elif self._match("true"):
+            return (yield from self._parse_number())
+        elif (yield from self._match("true")):
             return True
-        elif self._match("false"):
+        elif (yield from self._match("false")):
             return False
-        elif self._match("null") or self._match("undefined"):
+        elif (yield from self._match("null")) or (yield from self._match("undefined")):
             return None
         elif self.current_char:
-            return self._parse_unquoted_string()
+            return (yield from self._parse_unquoted_string())
         return None
 
-    def _match(self, text: str) -> bool:
+    def _match(self, text: str):
         # first char should match current char
         if not self.current_char or self.current_char.lower() != text[0].lower():
             return False
 
         # peek remaining chars
         remaining = len(text) - 1
+        yield from self._need(remaining)
         if self._peek(remaining).lower() == text[1:].lower():
             self._advance(len(text))
             return True
@@ -152,14 +209,16 @@ class DirtyJson:
     def _parse_object(self):
         obj = {}
         self._advance()  # Skip opening brace
+        self._publish(obj)
         self.stack.append(obj)
-        self._parse_object_content()
+        yield from self._parse_object_content()
         return obj
 
     def _parse_object_content(self):
-        while self.current_char is not None:
-            self._skip_whitespace()
+        while self.current_char is not None or (yield from self._more()):
+            yield from self._skip_whitespace()
             if self.current_char == "}":
+                yield from self._need(1)
                 if self._peek(1) == "}":  # Handle }}
                     self._advance(2)
                 else:
@@ -170,21 +229,22 @@ class DirtyJson:
                 self.stack.pop()
                 return  # End of input reached while parsing object
 
-            key = self._parse_key()
+            key = yield from self._parse_key()
             value = None
-            self._skip_whitespace()
+            yield from self._skip_whitespace()
 
+            self._slot = (self.stack[-1], key)
             if self.current_char == ":":
                 self._advance()
-                value = self._parse_value()
+                value = yield from self._parse_value()
             elif self.current_char is None:
                 value = None  # End of input reached after key
             else:
-                value = self._parse_value()
+                value = yield from self._parse_value()
 
             self.stack[-1][key] = value
 
-            self._skip_whitespace()
+            yield from self._skip_whitespace()
             if self.current_char == ",":
                 self._advance()
                 continue
@@ -195,44 +255,47 @@ class DirtyJson:
                 continue
 
     def _parse_key(self):
-        self._skip_whitespace()
+        yield from self._skip_whitespace()
         if self.current_char in ['"', "'"]:
-            return self._parse_string()
+            return (yield from self._parse_string(publish=False))
         else:
-            return self._parse_unquoted_key()
+            return (yield from self._parse_unquoted_key())
 
     def _parse_unquoted_key(self):
         result = ""
         while (
-            self.current_char is not None
-            and not self.current_char.isspace()
+            (self.current_char is not None or (yield from self._more()))
+            and not self.current_char.isspace()  # type: ignore
             and self.current_char not in [":", ",", "}", "]"]
         ):
-            result += self.current_char
+            result += self.current_char  # type: ignore
             self._advance()
         return result
 
     def _parse_array(self):
         arr = []
         self._advance()  # Skip opening bracket
+        self._publish(arr)
         self.stack.append(arr)
-        self._parse_array_content()
+        yield from self._parse_array_content()
         return arr
 
     def _parse_array_content(self):
-        while self.current_char is not None:
-            self._skip_whitespace()
+        while self.current_char is not None or (yield from self._more()):
+            yield from self._skip_whitespace()
             if self.current_char == "]":
                 self._advance()
                 self.stack.pop()
                 return
-            value = self._parse_value()
-            self.stack[-1].append(value)
-            self._skip_whitespace()
+            arr = self.stack[-1]
+            arr.append(None)
+            self._slot = (arr, len(arr) - 1)
+            arr[-1] = yield from self._parse_value()
+            yield from self._skip_whitespace()
             if self.current_char == ",":
                 self._advance()
                 # handle trailing commas, end of array
-                self._skip_whitespace()
+                yield from self._skip_whitespace()
                 if self.current_char is None or self.current_char == "]":
                     if self.current_char == "]":
                         self._advance()
@@ -242,13 +305,25 @@ class DirtyJson:
                 self.stack.pop()
                 return
 
-    def _parse_string(self):
+    def _parse_string(self, publish=True):
         result = ""
         quote_char = self.current_char
+        stops = _STRING_STOPS[quote_char]  # type: ignore
         self._advance()  # Skip opening quote
-        while self.current_char is not None and self.current_char != quote_char:
+        while True:
+            if self.current_char is None:
+                if publish:
+                    self._publish(result)
+                if not (yield from self._more()):
+                    break
+            if self.current_char == quote_char:
+                break
             if self.current_char == "\\":
                 self._advance()
+                if self.current_char is None:
+                    if publish:
+                        self._publish(result)
+                    yield from self._more()
                 if self.current_char in ['"', "'", "\\", "/", "b", "f", "n", "r", "t"]:
                     result += {
                         "b": "\b",
@@ -256,12 +331,16 @@ class DirtyJson:
                         "n": "\n",
                         "r": "\r",
                         "t": "\t",
-                    }.get(self.current_char, self.current_char)
+                    }.get(self.current_char, self.current_char)  # type: ignore
                 elif self.current_char == "u":
                     self._advance()  # Skip 'u'
                     unicode_char = ""
                     # Try to collect exactly 4 hex digits
                     for _ in range(4):
+                        if self.current_char is None:
+                            if publish:
+                                self._publish(result)
+                            yield from self._more()
                         if self.current_char is None or not self.current_char.isalnum():
                             # If we can't get 4 hex digits, treat it as a literal '\u' followed by whatever we got
                             return result + "\\u" + unicode_char
@@ -273,9 +352,13 @@ class DirtyJson:
                         # If invalid hex value, treat as literal
                         result += "\\u" + unicode_char
                     continue
+                self._advance()
             else:
-                result += self.current_char
-            self._advance()
+                # copy the whole run up to the next quote or escape at once
+                match = stops.search(self.json_string, self.index)
+                end = match.start() if match else len(self.json_string)
+                result += self.json_string[self.index : end]
+                self._advance(end - self.index)
         if self.current_char == quote_char:
             self._advance()  # Skip closing quote
         return result
@@ -284,21 +367,34 @@ class DirtyJson:
         result = ""
         quote_char = self.current_char
         self._advance(3)  # Skip first quote
-        while self.current_char is not None:
-            if self.current_char == quote_char and self._peek(2) == quote_char * 2:  # type: ignore
-                self._advance(3)  # Skip first quote
-                break
-            result += self.current_char
-            self._advance()
+        while True:
+            if self.current_char is None:
+                self._publish(result.strip())
+                if not (yield from self._more()):
+                    break
+            if self.current_char == quote_char:
+                yield from self._need(2)
+                if self._peek(2) == quote_char * 2:  # type: ignore
+                    self._advance(3)  # Skip first quote
+                    break
+                result += self.current_char
+                self._advance()
+            else:
+                # copy the whole run up to the next quote char at once
+                end = self.json_string.find(quote_char, self.index)  # type: ignore
+                if end == -1:
+                    end = len(self.json_string)
+                result += self.json_string[self.index : end]
+                self._advance(end - self.index)
         return result.strip()
 
     def _parse_number(self):
         number_str = ""
-        while self.current_char is not None and (
-            self.current_char.isdigit()
+        while (self.current_char is not None or (yield from self._more())) and (
+            self.current_char.isdigit()  # type: ignore
             or self.current_char in ["-", "+", ".", "e", "E"]
         ):
-            number_str += self.current_char
+            number_str += self.current_char  # type: ignore
             self._advance()
         try:
             return int(number_str)
@@ -307,13 +403,14 @@ class DirtyJson:
 
     def _parse_unquoted_string(self):
         result = ""
-        while self.current_char is not None and self.current_char not in [
-            ":",
-            ",",
-            "}",
-            "]",
-        ]:
-            result += self.current_char
+        while True:
+            if self.current_char is None:
+                self._publish(result.strip())
+                if not (yield from self._more()):
+                    break
+            if self.current_char in [":", ",", "}", "]"]:
+                break
+            result += self.current_char  # type: ignore
             self._advance()
         self._advance()
         return result.strip()
@@ -330,6 +427,41 @@ class DirtyJson:
         return result
 
     def get_start_pos(self, input_str: str) -> int:
+        pos = self._find_start(input_str)
+        return pos if pos != -1 else 0
+
+    @staticmethod
+    def _find_start(input_str: str, start: int = 0) -> int:
         chars = ["{", "[", '"']
-        indices = [input_str.find(char) for char in chars if input_str.find(char) != -1]
-        return min(indices) if indices else 0
+        indices = [i for i in (input_str.find(char, start) for char in chars) if i != -1]
+        return min(indices) if indices else -1
+
+
+class DirtyJsonStream:
+    """Parses a growing text, such as an LLM response stream, incrementally.
+
+    Each update feeds only the text appended since the previous update. When the
+    text was rewritten rather than extended (e.g. secrets masked retroactively),
+    parsing restarts from scratch. Only the last OVERLAP characters consumed are
+    compared to tell, so an update costs time proportional to the new text only.
+    """
+
+    OVERLAP = 64
+
+    def __init__(self):
+        self.length = 0  # characters consumed so far
+        self.tail = ""  # the last of them
+        self.parser = DirtyJson()
+
+    def update(self, full: str):
+        start = self.length - len(self.tail)
+        if len(full) >= self.length and full[start : self.length] == self.tail:
+            chunk = full[self.length :]
+        else:
+            self.parser = DirtyJson()
+            chunk = full
+        self.length = len(full)
+        self.tail = full[-self.OVERLAP :]
+        if chunk:
+            self.parser.feed(chunk)
+        return self.parser.result
@@ -2,7 +2,10 @@ import mimetypes
 import os
 import asyncio
 import aiohttp
+import hashlib
 import json
+import time
+from collections import OrderedDict
 
 from python.helpers.vector_db import VectorDB
 
@@ -10,7 +13,7 @@ os.environ["USER_AGENT"] = "@mixedbread-ai/unstructured"  # noqa E402
 from langchain_unstructured import UnstructuredLoader  # noqa E402
 
 from urllib.parse import urlparse
-from typing import Callable, Sequence, List, Optional, Tuple
+from typing import Callable, Mapping, Sequence, List, Optional, Tuple
 from datetime import datetime
 
 from langchain_community.document_loaders import AsyncHtmlLoader
@@ -30,29 +33,38 @@ from langchain.text_splitter import RecursiveCharacterTextSplitter
 
 
 DEFAULT_SEARCH_THRESHOLD = 0.5
+CONTEXT_DATA_KEY_STORE = "_document_query_store"  # not persisted, starts with _
 
 
 class DocumentQueryStore:
     """
     FAISS Store for document query results.
     Manages documents identified by URI for storage, retrieval, and searching.
+    One store lives as long as its AgentContext, so documents are loaded and embedded only once.
     """
 
     # Default chunking parameters
     DEFAULT_CHUNK_SIZE = 1000
     DEFAULT_CHUNK_OVERLAP = 100
 
-    # Cache for initialized stores
-    _stores: dict[str, "DocumentQueryStore"] = {}
+    # Maximum number of chunk vectors kept per store, least recently used documents are evicted
+    MAX_VECTORS = 50_000
+
+    # Seconds a remote document is used without asking the server whether it changed
+    REMOTE_TTL = 300
 
     @staticmethod
     def get(agent: Agent):
-        """Create a DocumentQueryStore instance for the specified agent."""
+        """Get the DocumentQueryStore instance of the agent's context."""
         if not agent or not agent.config:
             raise ValueError("Agent and agent config must be provided")
 
-        # Initialize store
-        store = DocumentQueryStore(agent)
+        # kept in the context's data, so it is dropped together with the context
+        store: DocumentQueryStore | None = agent.context.get_data(CONTEXT_DATA_KEY_STORE)
+        if not store:
+            store = DocumentQueryStore(agent)
+            agent.context.set_data(CONTEXT_DATA_KEY_STORE, store)
+        store.agent = agent
         return store
 
     def __init__(
@@ -62,6 +74,12 @@ class DocumentQueryStore:
         """Initialize a DocumentQueryStore instance."""
         self.agent = agent
         self.vector_db: VectorDB | None = None
+        # indexed documents by normalized URI, in least recently used order
+        self.documents: OrderedDict[str, dict] = OrderedDict()
+
+    @staticmethod
+    def content_hash(text: str) -> str:
+        return hashlib.sha256(text.encode("utf-8", errors="replace")).hexdigest()
 
     @staticmethod
     def normalize_uri(uri: str) -> str:
@@ -98,7 +116,11 @@ class DocumentQueryStore:
         return VectorDB(self.agent, cache=True)
 
     async def add_document(
-        self, text: str, document_uri: str, metadata: dict | None = None
+        self,
+        text: str,
+        document_uri: str,
+        metadata: dict | None = None,
+        signature: str = "",
     ) -> tuple[bool, list[str]]:
         """
         Add a document to the store with the given URI.
@@ -107,6 +129,7 @@ class DocumentQueryStore:
             text: The document text content
             document_uri: The URI that uniquely identifies this document
             metadata: Optional metadata for the document
+            signature: Optional source version (e.g. file mtime and size) checked by document_exists
 
         Returns:
             True if successful, False otherwise
@@ -114,6 +137,15 @@ class DocumentQueryStore:
         # Normalize the URI
         document_uri = self.normalize_uri(document_uri)
 
+        # Same content already indexed, skip splitting and embedding
+        content_hash = self.content_hash(text)
+        existing = self.documents.get(document_uri)
+        if existing and existing["hash"] == content_hash:
+            existing["signature"] = signature
+            existing["checked"] = time.monotonic()
+            self.documents.move_to_end(document_uri)
+            return True, existing["ids"]
+
         # Delete existing document if it exists to avoid duplicates
         await self.delete_document(document_uri)
 
@@ -146,9 +178,16 @@ class DocumentQueryStore:
                 self.vector_db = self.init_vector_db()
 
             ids = await self.vector_db.insert_documents(docs)
+            self.documents[document_uri] = {
+                "ids": ids,
+                "hash": content_hash,
+                "signature": signature,
+                "checked": time.monotonic(),
+            }
             PrintStyle.standard(
                 f"Added document '{document_uri}' with {len(docs)} chunks"
             )
+            await self._evict(keep=document_uri)
             return True, ids
         except Exception as e:
             err_text = errors.format_error(e)
@@ -208,21 +247,24 @@ class DocumentQueryStore:
         # Normalize the URI
         document_uri = self.normalize_uri(document_uri)
 
-        # get docs from vector db
-
-        chunks = await self.vector_db.search_by_metadata(
-            filter=f"document_uri == '{document_uri}'",
-        )
+        # get docs from vector db by their known ids
+        entry = self.documents.get(document_uri)
+        if not entry:
+            return []
+        self.documents.move_to_end(document_uri)
+        chunks = self.vector_db.db.get_by_ids(entry["ids"])
 
         PrintStyle.standard(f"Found {len(chunks)} chunks for document: {document_uri}")
         return chunks
 
-    async def document_exists(self, document_uri: str) -> bool:
+    async def document_exists(self, document_uri: str, signature: str = "") -> bool:
         """
         Check if a document exists in the store.
 
         Args:
             document_uri: The URI of the document to check
+            signature: Optional current source version, a changed source counts as missing.
+                Without one, a document older than REMOTE_TTL counts as missing.
 
         Returns:
             True if the document exists, False otherwise
@@ -235,8 +277,24 @@ class DocumentQueryStore:
         # Normalize the URI
         document_uri = self.normalize_uri(document_uri)
 
-        chunks = await self._get_document_chunks(document_uri)
-        return len(chunks) > 0
+        entry = self.documents.get(document_uri)
+        if not entry:
+            return False
+        if signature:
+            if entry["signature"] != signature:
+                return False
+        elif self._is_expired(entry):
+            return False
+        entry["checked"] = time.monotonic()
+        return True
+
+    def is_expired(self, document_uri: str) -> bool:
+        """Check if a document is missing or was last validated more than REMOTE_TTL ago."""
+        entry = self.documents.get(self.normalize_uri(document_uri))
+        return not entry or self._is_expired(entry)
+
+    def _is_expired(self, entry: dict) -> bool:
+        return time.monotonic() - entry["checked"] > self.REMOTE_TTL
 
     async def delete_document(self, document_uri: str) -> bool:
         """
@@ -256,14 +314,12 @@ class DocumentQueryStore:
         # Normalize the URI
         document_uri = self.normalize_uri(document_uri)
 
-        chunks = await self.vector_db.search_by_metadata(
-            filter=f"document_uri == '{document_uri}'",
-        )
-        if not chunks:
+        entry = self.documents.pop(document_uri, None)
+        if not entry:
             return False
 
         # Collect IDs to delete
-        ids_to_delete = [chunk.metadata["id"] for chunk in chunks]
+        ids_to_delete = entry["ids"]
 
         # Delete from vector store
         if ids_to_delete:
@@ -340,15 +396,18 @@ class DocumentQueryStore:
         if not self.vector_db:
             return []
 
-        # Extract unique URIs
-        uris = set()
-        for doc in self.vector_db.db.get_all_docs().values():
-            if isinstance(doc.metadata, dict):
-                uri = doc.metadata.get("document_uri")
-                if uri:
-                    uris.add(uri)
+        return sorted(self.documents.keys())
 
-        return sorted(list(uris))
+    async def _evict(self, keep: str = ""):
+        """Remove least recently used documents while the store holds too many vectors."""
+        total = sum(len(entry["ids"]) for entry in self.documents.values())
+        for uri in list(self.documents.keys()):
+            if total <= self.MAX_VECTORS:
+                break
+            if uri == keep:
+                continue
+            total -= len(self.documents[uri]["ids"])
+            await self.delete_document(uri)
 
 
 class DocumentQueryHelper:
@@ -448,38 +507,20 @@ class DocumentQueryHelper:
         scheme = url.scheme or "file"
         mimetype, encoding = mimetypes.guess_type(document_uri)
         mimetype = mimetype or "application/octet-stream"
+        headers = None
 
         if mimetype == "application/octet-stream":
             if url.scheme in ["http", "https"]:
-                response: aiohttp.ClientResponse | None = None
-                retries = 0
-                last_error = ""
-                while not response and retries < 3:
-                    try:
-                        async with aiohttp.ClientSession() as session:
-                            response = await session.head(
-                                document_uri,
-                                timeout=aiohttp.ClientTimeout(total=2.0),
-                                allow_redirects=True,
-                            )
-                            if response.status > 399:
-                                raise Exception(response.status)
-                            break
-                    except Exception as e:
-                        await asyncio.sleep(1)
-                        last_error = str(e)
-                    retries += 1
-                    await self.agent.handle_intervention()
-
-                if not response:
+                headers, last_error = await self._fetch_headers(document_uri)
+                if headers is None:
                     raise ValueError(
                         f"DocumentQueryHelper::document_get_content: Document fetch error: {document_uri} ({last_error})"
                     )
 
-                mimetype = response.headers["content-type"]
-                if "content-length" in response.headers:
+                mimetype = headers["content-type"]
+                if "content-length" in headers:
                     content_length = (
-                        float(response.headers["content-length"]) / 1024 / 1024
+                        float(headers["content-length"]) / 1024 / 1024
                     )  # MB
                     if content_length > 50.0:
                         raise ValueError(
@@ -507,8 +548,23 @@ class DocumentQueryHelper:
         # Use the store's normalization method
         document_uri_norm = self.store.normalize_uri(document_uri)
 
+        # local files are re-read when modified, remote documents are revalidated
+        # by ETag / Last-Modified once REMOTE_TTL passed, or re-fetched without them
+        signature = ""
+        if scheme == "file":
+            try:
+                stat = os.stat(document_uri)
+                signature = f"{stat.st_mtime_ns}:{stat.st_size}"
+            except OSError:
+                pass
+        elif scheme in ["http", "https"]:
+            if headers is None and self.store.is_expired(document_uri_norm):
+                headers, _ = await self._fetch_headers(document_uri, retries=1)
+            if headers is not None:
+                signature = self.remote_signature(headers)
+
         await self.agent.handle_intervention()
-        exists = await self.store.document_exists(document_uri_norm)
+        exists = await self.store.document_exists(document_uri_norm, signature)
         document_content = ""
         if not exists:
             await self.agent.handle_intervention()
@@ -528,7 +584,7 @@ class DocumentQueryHelper:
                 self.progress_callback(f"Indexing document")
                 await self.agent.handle_intervention()
                 success, ids = await self.store.add_document(
-                    document_content, document_uri_norm
+                    document_content, document_uri_norm, signature=signature
                 )
                 if not success:
                     self.progress_callback(f"Failed to index document")
@@ -547,6 +603,36 @@ class DocumentQueryHelper:
                 )
         return document_content
 
+    async def _fetch_headers(
+        self, document_uri: str, retries: int = 3
+    ) -> tuple[Mapping[str, str] | None, str]:
+        """HEAD a remote document, returns its headers (None on failure) and the last error."""
+        last_error = ""
+        for attempt in range(retries):
+            if attempt:
+                await asyncio.sleep(1)
+            try:
+                async with aiohttp.ClientSession() as session:
+                    response = await session.head(
+                        document_uri,
+                        timeout=aiohttp.ClientTimeout(total=2.0),
+                        allow_redirects=True,
+                    )
+                    if response.status > 399:
+                        raise Exception(response.status)
+                    return response.headers, ""
+            except Exception as e:
+                last_error = str(e)
+            await self.agent.handle_intervention()
+        return None, last_error
+
+    @staticmethod
+    def remote_signature(headers: Mapping[str, str]) -> str:
+        """Version of a remote document from its validators, empty if the server sends none."""
+        etag = headers.get("etag", "")
+        last_modified = headers.get("last-modified", "")
+        return f"{etag}:{last_modified}" if etag or last_modified else ""
+
     def handle_image_document(self, document: str, scheme: str) -> str:
         return self.handle_unstructured_document(document, scheme)
 
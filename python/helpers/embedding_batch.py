@@ -0,0 +1,87 @@
+import asyncio
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Callable
+
+MAX_BATCH = 64  # texts encoded in one forward pass
+MAX_WAIT = 0.005  # seconds to wait for more requests to join a batch
+
+
+class EmbeddingBatcher:
+    """Coalesces concurrent embedding requests into single encode calls.
+
+    Requests from all contexts and threads are queued. A worker thread takes
+    the first one, waits up to max_wait for more to arrive (up to max_batch
+    texts), encodes them all at once and hands each caller its slice of the
+    result. Callers block on embed() or await aembed(), the event loop is not
+    blocked by the encoding itself.
+    """
+
+    def __init__(
+        self,
+        encode: Callable[[list[str]], list[list[float]]],
+        max_batch: int = MAX_BATCH,
+        max_wait: float = MAX_WAIT,
+        name: str = "EmbeddingBatch",
+    ):
+        self.encode = encode
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self.name = name
+        self._queue: queue.Queue[tuple[list[str], Future]] = queue.Queue()
+        self._lock = threading.Lock()
+        self._thread: threading.Thread | None = None
+
+    def submit(self, texts: list[str]) -> Future:
+        future: Future = Future()
+        if not texts:
+            future.set_result([])
+            return future
+        self._queue.put((list(texts), future))
+        self._ensure_worker()
+        return future
+
+    def embed(self, texts: list[str]) -> list[list[float]]:
+        return self.submit(texts).result()
+
+    async def aembed(self, texts: list[str]) -> list[list[float]]:
+        return await asyncio.wrap_future(self.submit(texts))
+
+    def _ensure_worker(self):
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(
+                    target=self._run, daemon=True, name=self.name
+                )
+                self._thread.start()
+
+    def _run(self):
+        while True:
+            batch = [self._queue.get()]
+            size = len(batch[0][0])
+            deadline = time.monotonic() + self.max_wait
+            while size < self.max_batch:
+                try:
+                    item = self._queue.get(timeout=max(0, deadline - time.monotonic()))
+                except queue.Empty:
+                    break
+                batch.append(item)
+                size += len(item[0])
+            self._process(batch)
+
+    def _process(self, batch: list[tuple[list[str], Future]]):
+        batch = [(texts, f) for texts, f in batch if f.set_running_or_notify_cancel()]
+        if not batch:
+            return
+        try:
+            vectors = self.encode([text for texts, _ in batch for text in texts])
+        except Exception as e:
+            for _, future in batch:
+                future.set_exception(e)
+            return
+        start = 0
+        for texts, future in batch:
+            future.set_result(vectors[start : start + len(texts)])
+            start += len(texts)
@@ -0,0 +1,74 @@
+import threading
+from collections import OrderedDict
+
+from langchain_core.embeddings import Embeddings
+
+from python.helpers import dotenv
+
+MAX_QUERIES = 2048  # query embeddings kept in memory, shared by all models
+KEY_PERSIST_QUERIES = "EMBEDDING_QUERY_CACHE_PERSIST"  # also store query embeddings in the on-disk cache
+
+_queries: OrderedDict[tuple[str, str], list[float]] = OrderedDict()
+_lock = threading.Lock()
+
+
+class CachedQueryEmbeddings(Embeddings):
+    """Embeddings wrapper remembering the most recent query embeddings.
+
+    The same query texts are embedded over and over (memory recall, consolidation,
+    document queries), and CacheBackedEmbeddings only caches documents unless
+    given a query store. Entries are keyed by namespace (the model) and text and
+    evicted least recently used first. Documents pass through unchanged.
+    """
+
+    def __init__(self, underlying: Embeddings, namespace: str):
+        self.underlying = underlying
+        self.namespace = namespace
+
+    def embed_documents(self, texts: list[str]) -> list[list[float]]:
+        return self.underlying.embed_documents(texts)
+
+    async def aembed_documents(self, texts: list[str]) -> list[list[float]]:
+        return await self.underlying.aembed_documents(texts)
+
+    def embed_query(self, text: str) -> list[float]:
+        key = (self.namespace, text)
+        vector = _get(key)
+        if vector is None:
+            vector = self.underlying.embed_query(text)
+            _put(key, vector)
+        return vector
+
+    async def aembed_query(self, text: str) -> list[float]:
+        key = (self.namespace, text)
+        vector = _get(key)
+        if vector is None:
+            vector = await self.underlying.aembed_query(text)
+            _put(key, vector)
+        return vector
+
+
+def persist_query_embeddings() -> bool:
+    value = dotenv.get_dotenv_value(KEY_PERSIST_QUERIES, "")
+    return str(value).strip().lower() in ("1", "true", "yes", "on")
+
+
+def clear():
+    with _lock:
+        _queries.clear()
+
+
+def _get(key: tuple[str, str]) -> list[float] | None:
+    with _lock:
+        vector = _queries.get(key)
+        if vector is not None:
+            _queries.move_to_end(key)
+        return vector
+
+
+def _put(key: tuple[str, str], vector: list[float]):
+    with _lock:
+        _queries[key] = vector
+        _queries.move_to_end(key)
+        while len(_queries) > MAX_QUERIES:
+            _queries.popitem(last=False)
@@ -1,6 +1,8 @@
 from abc import abstractmethod
+import os
+import time
 from typing import Any
-from python.helpers import extract_tools, files 
+from python.helpers import extract_tools, files
 from typing import TYPE_CHECKING
 if TYPE_CHECKING:
     from agent import Agent
@@ -17,44 +19,68 @@ class Extension:
 
 
 async def call_extensions(extension_point: str, agent: "Agent|None" = None, **kwargs) -> Any:
-
-    # get default extensions
-    defaults = await _get_extensions("python/extensions/" + extension_point)
-    classes = defaults
-
-    # get agent extensions
-    if agent and agent.config.profile:
-        agentics = await _get_extensions("agents/" + agent.config.profile + "/extensions/" + extension_point)
-        if agentics:
-            # merge them, agentics overwrite defaults
-            unique = {}
-            for cls in defaults + agentics:
-                unique[_get_file_from_module(cls.__module__)] = cls
-
-            # sort by name
-            classes = sorted(unique.values(), key=lambda cls: _get_file_from_module(cls.__module__))
+    profile = agent.config.profile if agent else ""
+    classes = _get_extensions(extension_point, profile)
 
     # call extensions
     for cls in classes:
         await cls(agent=agent).execute(**kwargs)
 
 
+def reload_extensions():
+    "Drop the registry, extensions are loaded again on the next call."
+    _registry.clear()
+    extract_tools.clear_cache()
+
+
 def _get_file_from_module(module_name: str) -> str:
     return module_name.split(".")[-1]
 
-_cache: dict[str, list[type[Extension]]] = {}
-async def _get_extensions(folder:str):
-    global _cache
-    folder = files.get_abs_path(folder)
-    if folder in _cache:
-        classes = _cache[folder]
-    else:
+
+# (extension point, profile) -> (folder stamp, last check, merged and sorted classes)
+_registry: dict[tuple[str, str], tuple[tuple, float, list[type[Extension]]]] = {}
+_CHECK_INTERVAL = 1.0  # seconds between checks of the folders for changed files
+
+
+def _get_extensions(extension_point: str, profile: str) -> list[type[Extension]]:
+    key = (extension_point, profile)
+    entry = _registry.get(key)
+    now = time.monotonic()
+    if entry and now - entry[1] < _CHECK_INTERVAL:
+        return entry[2]
+
+    # default extensions, then agent extensions that overwrite defaults
+    folders = [files.get_abs_path("python/extensions", extension_point)]
+    if profile:
+        folders.append(files.get_abs_path("agents", profile, "extensions", extension_point))
+
+    stamp = _get_stamp(folders)
+    if entry and entry[0] == stamp:
+        _registry[key] = (stamp, now, entry[2])
+        return entry[2]
+
+    unique: dict[str, type[Extension]] = {}
+    for folder in folders:
         if not files.exists(folder):
-            return []
-        classes = extract_tools.load_classes_from_folder(
-            folder, "*", Extension
-        )
-        _cache[folder] = classes
+            continue
+        for cls in extract_tools.load_classes_from_folder(folder, "*", Extension):
+            unique[_get_file_from_module(cls.__module__)] = cls
 
+    # sort by name
+    classes = sorted(unique.values(), key=lambda cls: _get_file_from_module(cls.__module__))
+    _registry[key] = (stamp, now, classes)
     return classes
 
+
+def _get_stamp(folders: list[str]) -> tuple:
+    # file names and mtimes of all extension files, any edit, addition or removal changes it
+    stamp = []
+    for folder in folders:
+        try:
+            with os.scandir(folder) as entries:
+                for entry in entries:
+                    if entry.name.endswith(".py"):
+                        stamp.append((folder, entry.name, entry.stat().st_mtime_ns))
+        except FileNotFoundError:
+            continue
+    return tuple(sorted(stamp))
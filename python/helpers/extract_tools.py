@@ -1,4 +1,4 @@
-import re, os, importlib, importlib.util, inspect
+import re, os, importlib, importlib.util, inspect, threading
 from types import ModuleType
 from typing import Any, Type, TypeVar
 from .dirty_json import DirtyJson
@@ -59,9 +59,24 @@ def fix_json_string(json_string):
 
 T = TypeVar('T')  # Define a generic type variable
 
+# modules and their extracted classes, keyed by absolute path and invalidated by file mtime
+_modules: dict[str, tuple[int, ModuleType]] = {}
+_classes: dict[tuple[str, type, bool], tuple[int, list[type]]] = {}
+_cache_lock = threading.Lock()
+
 def import_module(file_path: str) -> ModuleType:
+    return _import_module(get_abs_path(file_path))[1]
+
+def _import_module(abs_path: str) -> tuple[int, ModuleType]:
     # Handle file paths with periods in the name using importlib.util
-    abs_path = get_abs_path(file_path)
+    mtime = os.stat(abs_path).st_mtime_ns
+
+    # Reuse the module unless the file changed since it was executed
+    with _cache_lock:
+        cached = _modules.get(abs_path)
+    if cached and cached[0] == mtime:
+        return cached
+
     module_name = os.path.basename(abs_path).replace('.py', '')
     
     # Create the module spec and load the module
@@ -71,7 +86,16 @@ def import_module(file_path: str) -> ModuleType:
         
     module = importlib.util.module_from_spec(spec)
     spec.loader.exec_module(module)
-    return module
+
+    with _cache_lock:
+        _modules[abs_path] = (mtime, module)
+    return mtime, module
+
+def clear_cache():
+    "Forget all loaded modules, the next lookup executes them again."
+    with _cache_lock:
+        _modules.clear()
+        _classes.clear()
 
 def load_classes_from_folder(folder: str, name_pattern: str, base_class: Type[T], one_per_file: bool = True) -> list[Type[T]]:
     classes = []
@@ -85,26 +109,20 @@ def load_classes_from_folder(folder: str, name_pattern: str, base_class: Type[T]
     # Iterate through the sorted list of files
     for file_name in py_files:
         file_path = os.path.join(abs_folder, file_name)
-        # Use the new import_module function
-        module = import_module(file_path)
-
-        # Get all classes in the module
-        class_list = inspect.getmembers(module, inspect.isclass)
-
-        # Filter for classes that are subclasses of the given base_class
-        # iterate backwards to skip imported superclasses
-        for cls in reversed(class_list):
-            if cls[1] is not base_class and issubclass(cls[1], base_class):
-                classes.append(cls[1])
-                if one_per_file:
-                    break
+        classes.extend(load_classes_from_file(file_path, base_class, one_per_file))
 
     return classes
 
 def load_classes_from_file(file: str, base_class: type[T], one_per_file: bool = True) -> list[type[T]]:
+    # Use the new import_module function, cached modules also keep their class lists
+    key = (get_abs_path(file), base_class, one_per_file)
+    mtime, module = _import_module(key[0])
+    with _cache_lock:
+        cached = _classes.get(key)
+    if cached and cached[0] == mtime:
+        return list(cached[1])  # type: ignore
+
     classes = []
-    # Use the new import_module function
-    module = import_module(file)
     
     # Get all classes in the module
     class_list = inspect.getmembers(module, inspect.isclass)
@@ -116,5 +134,7 @@ def load_classes_from_file(file: str, base_class: type[T], one_per_file: bool =
             classes.append(cls[1])
             if one_per_file:
                 break
-                
-    return classes
+
+    with _cache_lock:
+        _classes[key] = (mtime, classes)
+    return list(classes)
@@ -33,6 +33,7 @@ def file_tree(
     sort: tuple[Literal["name", "created", "modified"], Literal["asc", "desc"]] = ("modified", "desc"),
     ignore: str | None = None,
     output_mode: Literal["string", "flat", "nested"] = OUTPUT_MODE_STRING,
+    dir_mtimes: dict[str, int] | None = None,
 ) -> str | list[dict]:
     """Render a directory tree relative to the repository base path.
 
@@ -60,6 +61,9 @@ def file_tree(
 
         output_mode: One of :data:`OUTPUT_MODE_STRING`, :data:`OUTPUT_MODE_FLAT`, or
             :data:`OUTPUT_MODE_NESTED`.
+        dir_mtimes: Optional dict filled with the modification time (``st_mtime_ns``) of every
+            directory listed, taken before listing it, and when sorting by modification time of
+            every entry sorted too. The tree stays the same while :func:`mtimes_unchanged` holds.
 
     Returns:
         ``OUTPUT_MODE_STRING`` → ``str``: multi-line ASCII tree.
@@ -121,7 +125,11 @@ def file_tree(
     limit_reached = False
     visibility_cache: dict[str, bool] = {}
 
+    # files edited in place change the order only through their own mtimes
+    entry_mtimes = dir_mtimes if sort_key == SORT_BY_MODIFIED else None
+
     def make_entry(entry: os.DirEntry, parent: _TreeEntry, level: int, item_type: Literal["file", "folder"]) -> _TreeEntry:
+        _record_mtime(entry.path, entry_mtimes)
         stat = entry.stat(follow_symlinks=False)
         rel_path = os.path.relpath(entry.path, abs_root)
         rel_posix = _normalize_relative_path(rel_path)
@@ -149,6 +157,7 @@ def file_tree(
             ignore_spec,
             max_depth_remaining=remaining_depth,
             cache=visibility_cache,
+            dir_mtimes=dir_mtimes,
         )
 
         folder_entries = [make_entry(folder, parent_node, level, "folder") for folder in folders]
@@ -214,6 +223,7 @@ def file_tree(
                 folder_path,
                 abs_root,
                 ignore_spec,
+                dir_mtimes,
             )
             if summary is None:
                 continue
@@ -288,6 +298,7 @@ def _directory_has_visible_entries(
     ignore_spec: PathSpec,
     cache: dict[str, bool],
     max_depth_remaining: int,
+    dir_mtimes: dict[str, int] | None = None,
 ) -> bool:
     if max_depth_remaining == 0:
         return False
@@ -297,6 +308,7 @@ def _directory_has_visible_entries(
         return cached
 
     try:
+        _record_mtime(directory, dir_mtimes)
         with os.scandir(directory) as iterator:
             for entry in iterator:
                 rel_path = os.path.relpath(entry.path, root_abs_path)
@@ -315,6 +327,7 @@ def _directory_has_visible_entries(
                             ignore_spec,
                             cache,
                             next_depth,
+                            dir_mtimes,
                         ):
                             cache[directory] = True
                             return True
@@ -383,6 +396,7 @@ def _create_folder_unprocessed_comment(
     folder_path: str,
     abs_root: str,
     ignore_spec: Optional[PathSpec],
+    dir_mtimes: dict[str, int] | None = None,
 ) -> Optional[_TreeEntry]:
     try:
         folders, files = _list_directory_children(
@@ -391,6 +405,7 @@ def _create_folder_unprocessed_comment(
             ignore_spec,
             max_depth_remaining=-1,
             cache={},
+            dir_mtimes=dir_mtimes,
         )
     except FileNotFoundError:
         return None
@@ -495,6 +510,23 @@ def _resolve_ignore_patterns(ignore: str | None, root_abs_path: str) -> Optional
     return PathSpec.from_lines("gitwildmatch", lines)
 
 
+def mtimes_unchanged(dir_mtimes: dict[str, int]) -> bool:
+    """Check that every path recorded by ``file_tree(dir_mtimes=...)`` still has its recorded mtime."""
+    return all(_get_mtime(path) == mtime for path, mtime in dir_mtimes.items())
+
+
+def _get_mtime(path: str) -> int:
+    try:
+        return os.stat(path).st_mtime_ns
+    except OSError:
+        return -1  # missing or broken link
+
+
+def _record_mtime(path: str, dir_mtimes: dict[str, int] | None) -> None:
+    if dir_mtimes is not None and path not in dir_mtimes:
+        dir_mtimes[path] = _get_mtime(path)
+
+
 def _list_directory_children(
     directory: str,
     root_abs_path: str,
@@ -502,11 +534,13 @@ def _list_directory_children(
     *,
     max_depth_remaining: int,
     cache: dict[str, bool],
+    dir_mtimes: dict[str, int] | None = None,
 ) -> tuple[list[os.DirEntry], list[os.DirEntry]]:
     folders: list[os.DirEntry] = []
     files: list[os.DirEntry] = []
 
     try:
+        _record_mtime(directory, dir_mtimes)
         with os.scandir(directory) as iterator:
             for entry in iterator:
                 if entry.name in (".", ".."):
@@ -525,6 +559,7 @@ def _list_directory_children(
                                 ignore_spec,
                                 cache,
                                 max_depth_remaining - 1,
+                                dir_mtimes,
                             ):
                                 folders.append(entry)
                             continue
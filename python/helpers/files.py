@@ -15,6 +15,7 @@ import importlib.util
 import inspect
 import glob
 import mimetypes
+import threading
 
 
 class VariablesPlugin(ABC):
@@ -22,12 +23,41 @@ class VariablesPlugin(ABC):
     def get_variables(self, file: str, backup_dirs: list[str] | None = None, **kwargs) -> dict[str, Any]:  # type: ignore
         pass
 
+    def get_cache_key(self, file: str, backup_dirs: list[str] | None = None, **kwargs) -> Any:
+        """Key the variables can be cached under, None to compute them on every render"""
+        return None
+
+    def get_dependencies(self, file: str, backup_dirs: list[str] | None = None, **kwargs) -> list[str]:
+        """Files and directories whose modification invalidates the cached variables"""
+        return []
+
+
+# keyed by plugin file and class name, a reloaded class replaces its entries
+_plugin_instances: dict[tuple[str, str], VariablesPlugin] = {}
+_plugin_variables: dict[tuple, tuple[type, tuple, dict[str, Any]]] = {}
+_recorders = threading.local()  # dependencies of the cached variables being computed
+
+
+def _record_dependencies(deps):
+    # templates and variables used while computing cached variables make them stale as well
+    for recorder in getattr(_recorders, "stack", ()):
+        recorder.extend(deps)
+
 
 def load_plugin_variables(
     file: str, backup_dirs: list[str] | None = None, **kwargs
 ) -> dict[str, Any]:
+    plugin_file = find_plugin_file(file, backup_dirs)
+    if plugin_file:
+        return get_plugin_variables(plugin_file, file, backup_dirs, **kwargs)
+    return {}
+
+
+def find_plugin_file(
+    file: str, backup_dirs: list[str] | None = None, _deps: list | None = None
+) -> str | None:
     if not file.endswith(".md"):
-        return {}
+        return None
 
     if backup_dirs is None:
         backup_dirs = []
@@ -36,19 +66,65 @@ def load_plugin_variables(
         # Create filename and directories list
         plugin_filename = basename(file, ".md") + ".py"
         directories = [dirname(file)] + backup_dirs
-        plugin_file = find_file_in_dirs(plugin_filename, directories)
+        plugin_file = find_file_in_dirs(plugin_filename, directories, _deps)
     except FileNotFoundError:
         plugin_file = None
 
     if plugin_file and exists(plugin_file):
+        return plugin_file
+    return None
+
+
+def get_plugin_variables(
+    plugin_file: str, file: str, backup_dirs: list[str] | None = None, **kwargs
+) -> dict[str, Any]:
+    if backup_dirs is None:
+        backup_dirs = []
+
+    if plugin_file:
 
         from python.helpers import extract_tools
 
+        # modules are cached by mtime, a reloaded module brings new classes and instances
         classes = extract_tools.load_classes_from_file(
             plugin_file, VariablesPlugin, one_per_file=False
         )
         for cls in classes:
-            return cls().get_variables(file, backup_dirs, **kwargs)  # type: ignore < abstract class here is ok, it is always a subclass
+            name = (plugin_file, cls.__qualname__)
+            plugin = _plugin_instances.get(name)
+            if type(plugin) is not cls:
+                plugin = _plugin_instances[name] = cls()  # type: ignore < abstract class here is ok, it is always a subclass
+
+            key = plugin.get_cache_key(file, backup_dirs, **kwargs)
+            if key is None:
+                return plugin.get_variables(file, backup_dirs, **kwargs)
+
+            cache_key = (name, key)
+            cached = _plugin_variables.get(cache_key)
+            if (
+                cached
+                and cached[0] is cls
+                and all(_get_mtime(path) == mtime for path, mtime in cached[1])
+            ):
+                _record_dependencies(cached[1])
+                return dict(cached[2])
+
+            # the prompts rendered by get_variables are dependencies too
+            recorded = []
+            stack = _recorders.__dict__.setdefault("stack", [])
+            stack.append(recorded)
+            try:
+                deps = [
+                    (path, _get_mtime(path))
+                    for path in plugin.get_dependencies(file, backup_dirs, **kwargs)
+                ]
+                variables = plugin.get_variables(file, backup_dirs, **kwargs)
+            finally:
+                stack.pop()
+            deps = tuple(dict.fromkeys(deps + recorded))
+            _record_dependencies(deps)
+            _plugin_variables[cache_key] = (cls, deps, variables)
+            return dict(variables)
 
         # load python code and extract variables variables from it
         # module = None
@@ -80,39 +156,132 @@ def load_plugin_variables(
 from python.helpers.strings import sanitize_string
 
 
+# {{ include 'path' }} or {{include'path'}}, and {{placeholder}}
+_TEMPLATE_PATTERN = re.compile(r"{{\s*include\s*['\"](.*?)['\"]\s*}}|{{(\w+)}}")
+_PLACEHOLDER_PATTERN = re.compile(r"{{(\w+)}}")
+_TEXT, _VARIABLE, _INCLUDE = 0, 1, 2
+
+
+class _Template:
+    """A prompt file split into text, placeholders and includes.
+
+    Kept with the modification times of the file, its variables plugin and
+    the directories searched before they were found, so edits, new files in
+    a profile and removed files all invalidate it.
+    """
+
+    def __init__(self, path: str, plugin_file: str | None, is_json: bool, content: str, deps: list):
+        self.path = path
+        self.plugin_file = plugin_file
+        self.is_json = is_json
+        self.deps = tuple(deps)
+        self.parts: list[tuple[int, str, str]] = []  # (kind, name or path, original text)
+
+        pattern = _PLACEHOLDER_PATTERN if is_json else _TEMPLATE_PATTERN
+        pos = 0
+        for match in pattern.finditer(content):
+            if match.start() > pos:
+                self.parts.append((_TEXT, content[pos : match.start()], ""))
+            if is_json:
+                self.parts.append((_VARIABLE, match.group(1), match.group(0)))
+            elif match.group(2) is not None:
+                self.parts.append((_VARIABLE, match.group(2), match.group(0)))
+            else:
+                self.parts.append((_INCLUDE, match.group(1), match.group(0)))
+            pos = match.end()
+        if pos < len(content):
+            self.parts.append((_TEXT, content[pos:], ""))
+
+    def is_current(self) -> bool:
+        return all(_get_mtime(path) == mtime for path, mtime in self.deps)
+
+    def render(self, directories: list[str], variables: dict[str, Any], kwargs: dict[str, Any]) -> str:
+        result = []
+        for kind, value, original in self.parts:
+            if kind == _TEXT:
+                result.append(value)
+            elif kind == _VARIABLE:
+                if value not in variables:
+                    result.append(original)
+                elif self.is_json:
+                    result.append(json.dumps(variables[value]))
+                else:
+                    text = str(variables[value])
+                    if "{{" in text:  # includes coming with values are processed as well
+                        text = process_includes(text, directories, **kwargs)
+                    result.append(text)
+            elif os.path.isabs(value):
+                # if the path is absolute, do not process it
+                result.append(original)
+            else:
+                try:
+                    # here we use kwargs, the plugin variables are not inherited
+                    result.append(read_prompt_file(value, directories, **kwargs))
+                except FileNotFoundError:
+                    result.append(original)  # Return original if file not found
+        return "".join(result)
+
+
+_templates: dict[tuple, _Template] = {}
+
+
+def _get_mtime(path: str) -> int | None:
+    try:
+        return os.stat(path).st_mtime_ns
+    except OSError:
+        return None
+
+
+def _get_template(kind: str, _filename: str, _directories: list[str], _encoding: str) -> _Template:
+    key = (kind, _filename, tuple(_directories), _encoding)
+    template = _templates.get(key)
+    if template is not None and template.is_current():
+        _record_dependencies(template.deps)
+        return template
+
+    # Find the file in the directories
+    deps = []
+    absolute_path = find_file_in_dirs(_filename, _directories, deps)
+    with open(absolute_path, "r", encoding=_encoding) as f:
+        content = f.read()
+    deps.append((absolute_path, _get_mtime(absolute_path)))
+
+    if kind == "parse":
+        is_json = is_full_json_template(content)
+        content = remove_code_fences(content)
+        plugin_file = find_plugin_file(absolute_path, _directories, deps)
+    else:
+        is_json = False
+        plugin_file = find_plugin_file(_filename, _directories, deps)
+    if plugin_file:
+        deps.append((plugin_file, _get_mtime(plugin_file)))
+
+    template = _Template(absolute_path, plugin_file, is_json, content, deps)
+    _templates[key] = template
+    _record_dependencies(template.deps)
+    return template
+
+
+def clear_template_cache():
+    _templates.clear()
+
+
 def parse_file(
     _filename: str, _directories: list[str] | None = None, _encoding="utf-8", **kwargs
 ):
     if _directories is None:
         _directories = []
 
-    # Find the file in the directories
-    absolute_path = find_file_in_dirs(_filename, _directories)
-
-    # Read the file content
-    with open(absolute_path, "r", encoding=_encoding) as f:
-        # content = remove_code_fences(f.read())
-        content = f.read()
-
-    is_json = is_full_json_template(content)
-    content = remove_code_fences(content)
-    variables = load_plugin_variables(absolute_path, _directories, **kwargs) or {}  # type: ignore
+    # compiled once per file and directories, rendering only substitutes values
+    template = _get_template("parse", _filename, _directories, _encoding)
+    variables = {}
+    if template.plugin_file:
+        variables = get_plugin_variables(template.plugin_file, template.path, _directories, **kwargs) or {}  # type: ignore
     variables.update(kwargs)
-    if is_json:
-        content = replace_placeholders_json(content, **variables)
-        obj = json.loads(content)
-        # obj = replace_placeholders_dict(obj, **variables)
-        return obj
-    else:
-        content = replace_placeholders_text(content, **variables)
-        # Process include statements
-        content = process_includes(
-            # here we use kwargs, the plugin variables are not inherited
-            content,
-            _directories,
-            **kwargs,
-        )
-        return content
+    content = template.render(_directories, variables, kwargs)
+    if template.is_json:
+        return json.loads(content)
+    return content
 
 
 def read_prompt_file(
@@ -127,29 +296,13 @@ def read_prompt_file(
         _file = os.path.basename(_file)
         _directories = [folder_path] + _directories
 
-    # Find the file in the directories
-    absolute_path = find_file_in_dirs(_file, _directories)
-
-    # Read the file content
-    with open(absolute_path, "r", encoding=_encoding) as f:
-        # content = remove_code_fences(f.read())
-        content = f.read()
-
-    variables = load_plugin_variables(_file, _directories, **kwargs) or {}  # type: ignore
+    # compiled once per file and directories, rendering only substitutes values
+    template = _get_template("read", _file, _directories, _encoding)
+    variables = {}
+    if template.plugin_file:
+        variables = get_plugin_variables(template.plugin_file, _file, _directories, **kwargs) or {}  # type: ignore
     variables.update(kwargs)
-
-    # Replace placeholders with values from kwargs
-    content = replace_placeholders_text(content, **variables)
-
-    # Process include statements
-    content = process_includes(
-        # here we use kwargs, the plugin variables are not inherited
-        content,
-        _directories,
-        **kwargs,
-    )
-
-    return content
+    return template.render(_directories, variables, kwargs)
 
 
 def read_file(relative_path: str, encoding="utf-8"):
@@ -246,15 +399,19 @@ def process_includes(_content: str, _directories: list[str], **kwargs):
     return re.sub(include_pattern, replace_include, _content)
 
 
-def find_file_in_dirs(_filename: str, _directories: list[str]):
+def find_file_in_dirs(_filename: str, _directories: list[str], _deps: list | None = None):
     """
     This function searches for a filename in a list of directories in order.
     Returns the absolute path of the first found file.
+    Directories searched are added to _deps with their modification times, if given.
     """
     # Loop through the directories in order
     for directory in _directories:
         # Create full path
         full_path = get_abs_path(directory, _filename)
+        if _deps is not None:
+            parent = os.path.dirname(full_path)
+            _deps.append((parent, _get_mtime(parent)))
         if exists(full_path):
             return full_path
 
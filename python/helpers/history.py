@@ -119,29 +119,49 @@ class Message(Record):
     @staticmethod
     def from_dict(data: dict, history: "History"):
         content = data.get("content", "Content lost")
-        msg = Message(ai=data["ai"], content=content)
+        msg = Message(ai=data["ai"], content=content, tokens=data.get("tokens", 0))
         msg.summary = data.get("summary", "")
-        msg.tokens = data.get("tokens", 0)
+        if msg.summary and not data.get("tokens", 0):
+            msg.tokens = msg.calculate_tokens()
         return msg
 
 
-class Topic(Record):
+class Summarized:
+    # summary with its token count, counted once when the summary is set
+    _summary: str = ""
+    _summary_tokens: int = 0
+
+    @property
+    def summary(self) -> str:
+        return self._summary
+
+    @summary.setter
+    def summary(self, value: str):
+        self._summary = value
+        self._summary_tokens = tokens.approximate_tokens(value) if value else 0
+
+
+class Topic(Summarized, Record):
     def __init__(self, history: "History"):
         self.history = history
         self.summary: str = ""
         self.messages: list[Message] = []
+        self._tokens: int | None = None  # running total of message tokens, None to recount
 
     def get_tokens(self):
         if self.summary:
-            return tokens.approximate_tokens(self.summary)
-        else:
-            return sum(msg.get_tokens() for msg in self.messages)
+            return self._summary_tokens
+        if self._tokens is None:
+            self._tokens = sum(msg.get_tokens() for msg in self.messages)
+        return self._tokens
 
     def add_message(
         self, ai: bool, content: MessageContent, tokens: int = 0
     ) -> Message:
         msg = Message(ai=ai, content=content, tokens=tokens)
         self.messages.append(msg)
+        if self._tokens is not None:
+            self._tokens += msg.get_tokens()
         return msg
 
     def output(self) -> list[OutputMessage]:
@@ -191,6 +211,7 @@ class Topic(Record):
                 )
                 msg.set_summary(_json_dumps(trunc))
 
+            self._tokens = None
             return True
         return False
 
@@ -211,6 +232,7 @@ class Topic(Record):
             )
             sum_msg = Message(False, sum_msg_content)
             self.messages[1 : cnt_to_sum + 1] = [sum_msg]
+            self._tokens = None
             return True
         return False
 
@@ -242,7 +264,7 @@ class Topic(Record):
         return topic
 
 
-class Bulk(Record):
+class Bulk(Summarized, Record):
     def __init__(self, history: "History"):
         self.history = history
         self.summary: str = ""
@@ -250,8 +272,9 @@ class Bulk(Record):
 
     def get_tokens(self):
         if self.summary:
-            return tokens.approximate_tokens(self.summary)
+            return self._summary_tokens
         else:
+            # records are topics and bulks with their own cached totals
             return sum([r.get_tokens() for r in self.records])
 
     def output(
@@ -296,6 +319,7 @@ class History(Record):
         from agent import Agent
 
         self.counter = 0
+        self.revision = 0  # bumped on changes other than appending messages to the current topic
         self.bulks: list[Bulk] = []
         self.topics: list[Topic] = []
         self.current = Topic(history=self)
@@ -332,6 +356,7 @@ class History(Record):
         if self.current.messages:
             self.topics.append(self.current)
             self.current = Topic(history=self)
+            self.revision += 1
 
     def output(self) -> list[OutputMessage]:
         result: list[OutputMessage] = []
@@ -391,6 +416,7 @@ class History(Record):
 
             if compressed_part:
                 compressed = True
+                self.revision += 1
                 continue
             else:
                 return compressed
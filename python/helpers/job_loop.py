@@ -7,7 +7,7 @@ from python.helpers import errors
 from python.helpers import runtime
 
 
-SLEEP_TIME = 60
+SLEEP_TIME = 60  # longest sleep between ticks, the loop wakes earlier for due tasks and task changes
 
 keep_running = True
 pause_time = 0
@@ -31,7 +31,11 @@ async def run_loop():
                 await scheduler_tick()
             except Exception as e:
                 PrintStyle().error(errors.format_error(e))
-        await asyncio.sleep(SLEEP_TIME)  # TODO! - if we lower it under 1min, it can run a 5min job multiple times in it's target minute
+        if keep_running:
+            # each fire time is run once, so the loop can wake exactly when a task is due
+            await TaskScheduler.get().wait_for_next_run(SLEEP_TIME)
+        else:
+            await asyncio.sleep(SLEEP_TIME)
 
 
 async def scheduler_tick():
@@ -1,5 +1,7 @@
 from dataclasses import dataclass, field
+import asyncio
 import json
+import time
 from typing import Any, Literal, Optional, Dict, TypeVar, TYPE_CHECKING
 
 T = TypeVar("T")
@@ -9,6 +11,7 @@ from python.helpers.strings import truncate_text_by_ratio
 import copy
 from typing import TypeVar
 from python.helpers.secrets import get_secrets_manager
+from python.helpers import state_monitor
 
 
 if TYPE_CHECKING:
@@ -41,6 +44,7 @@ RESPONSE_CONTENT_MAX_LEN: int = 250_000
 KEY_MAX_LEN: int = 60
 VALUE_MAX_LEN: int = 5000
 PROGRESS_MAX_LEN: int = 120
+UPDATE_RATE: float = 15.0  # max updates per second applied by LogItem.update_throttled
 
 
 def _truncate_heading(text: str | None) -> str:
@@ -119,6 +123,10 @@ def _truncate_content(text: str | None, type: Type) -> str:
 
 
 
+def _changed(**values) -> dict:
+    return {k: v for k, v in values.items() if v is not None}
+
+
 @dataclass
 class LogItem:
     log: "Log"
@@ -132,6 +140,10 @@ class LogItem:
     id: Optional[str] = None  # Add id field
     guid: str = ""
 
+    _pending: dict = field(default_factory=dict, init=False, repr=False, compare=False)
+    _applied: float = field(default=0.0, init=False, repr=False, compare=False)
+    _timer: Optional[asyncio.TimerHandle] = field(default=None, init=False, repr=False, compare=False)
+
     def __post_init__(self):
         self.guid = self.log.guid
 
@@ -145,17 +157,52 @@ class LogItem:
         update_progress: ProgressUpdate | None = None,
         **kwargs,
     ):
+        # values still pending from update_throttled go first, these override them
+        values = self._take_pending()
+        values.update(_changed(type=type, heading=heading, content=content, kvps=kvps, temp=temp, update_progress=update_progress))
+        values.update(kwargs)
         if self.guid == self.log.guid:
-            self.log._update_item(
-                self.no,
-                type=type,
-                heading=heading,
-                content=content,
-                kvps=kvps,
-                temp=temp,
-                update_progress=update_progress,
-                **kwargs,
-            )
+            self._applied = time.monotonic()
+            self.log._update_item(self.no, **values)
+
+    def update_throttled(
+        self,
+        type: Type | None = None,
+        heading: str | None = None,
+        content: str | None = None,
+        kvps: dict | None = None,
+        temp: bool | None = None,
+        update_progress: ProgressUpdate | None = None,
+        rate: float = UPDATE_RATE,
+        **kwargs,
+    ):
+        """Like update, for values changing on every streamed chunk.
+        Only the latest values are applied, at most `rate` times per second,
+        the rest is applied by a timer or by flush() at the end of the stream."""
+        self._pending.update(_changed(type=type, heading=heading, content=content, kvps=kvps, temp=temp, update_progress=update_progress))
+        self._pending.update(kwargs)
+        wait = self._applied + 1 / rate - time.monotonic()
+        if wait <= 0:
+            self.flush()
+        elif self._timer is None:
+            try:
+                self._timer = asyncio.get_running_loop().call_later(wait, self.flush)
+            except RuntimeError:
+                pass  # no event loop, applied by the next call or flush()
+
+    def flush(self):
+        """Apply values pending from update_throttled"""
+        if self._pending:
+            self.update()
+        else:
+            self._take_pending()
+
+    def _take_pending(self) -> dict:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        pending, self._pending = self._pending, {}
+        return pending
 
     def stream(
         self,
@@ -277,6 +324,7 @@ class Log:
 
         self.updates += [item.no]
         self._update_progress_from_item(item)
+        state_monitor.mark_dirty(self.context.id if self.context else "")
 
     def set_progress(self, progress: str, no: int = 0, active: bool = True):
         progress = self._mask_recursive(progress)
@@ -286,6 +334,7 @@ class Log:
             no = len(self.logs)
         self.progress_no = no
         self.progress_active = active
+        state_monitor.mark_dirty(self.context.id if self.context else "")
 
     def set_initial_progress(self):
         self.set_progress("Waiting for input", 0, False)
@@ -309,7 +358,7 @@ class Log:
         self.guid = str(uuid.uuid4())
         self.updates = []
         self.logs = []
-        self.set_initial_progress()
+        self.set_initial_progress()  # marks the state dirty
 
     def _update_progress_from_item(self, item: LogItem):
         if item.heading and item.update_progress != "none":
@@ -17,6 +17,7 @@ from typing import (
 )
 import threading
 import asyncio
+import time
 from contextlib import AsyncExitStack
 from shutil import which
 from datetime import timedelta
@@ -41,6 +42,14 @@ from pydantic import BaseModel, Field, Discriminator, Tag, PrivateAttr
 from python.helpers import dirty_json
 from python.helpers.print_style import PrintStyle
 from python.helpers.tool import Tool, Response
+from python.helpers.defer import EventLoopThread
+
+_tools_version = 0  # incremented whenever servers are configured or their tools listed
+
+
+def _tools_changed():
+    global _tools_version
+    _tools_version += 1
 
 
 def normalize_name(name: str) -> str:
@@ -252,8 +261,9 @@ class MCPServerRemote(BaseModel):
     ) -> CallToolResult:
         """Call a tool with the given input data"""
         with self.__lock:
-            # We already run in an event loop, dont believe Pylance
-            return await self.__client.call_tool(tool_name, input_data)  # type: ignore
+            client = self.__client
+        # await outside of the lock, the client limits concurrency per server itself
+        return await client.call_tool(tool_name, input_data)  # type: ignore
 
     def update(self, config: dict[str, Any]) -> "MCPServerRemote":
         with self.__lock:
@@ -279,7 +289,12 @@ class MCPServerRemote(BaseModel):
             # We already run in an event loop, dont believe Pylance
             return asyncio.run(self.__on_update())
 
+    def close(self):
+        with self.__lock:
+            self.__client.close()  # type: ignore
+
     async def __on_update(self) -> "MCPServerRemote":
+        self.__client.close()  # type: ignore # config may have changed, reconnect
         await self.__client.update_tools()  # type: ignore
         return self
 
@@ -331,8 +346,9 @@ class MCPServerLocal(BaseModel):
     ) -> CallToolResult:
         """Call a tool with the given input data"""
         with self.__lock:
-            # We already run in an event loop, dont believe Pylance
-            return await self.__client.call_tool(tool_name, input_data)  # type: ignore
+            client = self.__client
+        # await outside of the lock, the client limits concurrency per server itself
+        return await client.call_tool(tool_name, input_data)  # type: ignore
 
     def update(self, config: dict[str, Any]) -> "MCPServerLocal":
         with self.__lock:
@@ -356,7 +372,12 @@ class MCPServerLocal(BaseModel):
             # We already run in an event loop, dont believe Pylance
             return asyncio.run(self.__on_update())
 
+    def close(self):
+        with self.__lock:
+            self.__client.close()  # type: ignore
+
     async def __on_update(self) -> "MCPServerLocal":
+        self.__client.close()  # type: ignore # config may have changed, reconnect
         await self.__client.update_tools()  # type: ignore
         return self
 
@@ -483,6 +504,7 @@ class MCPConfig(BaseModel):
             #         )
 
             cls.__initialized = True
+            _tools_changed()
             return instance
 
     @classmethod
@@ -520,6 +542,10 @@ class MCPConfig(BaseModel):
         # If servers is a field like `servers: List[MCPServer] = Field(default_factory=list)`,
         # then super().__init__() might try to initialize it.
         # We are re-assigning self.servers later in this __init__.
+        # close persistent sessions of the servers being replaced
+        for server in getattr(self, "servers", None) or []:
+            server.close()
+
         super().__init__()
 
         # Clear any servers potentially initialized by super().__init__() before we populate based on servers_list
@@ -615,6 +641,11 @@ class MCPConfig(BaseModel):
                     {"config": server_item, "error": error_msg, "name": server_name}
                 )
 
+    @classmethod
+    def get_tools_version(cls) -> int:
+        """Changes whenever the output of get_tools_prompt may change"""
+        return _tools_version
+
     def get_server_log(self, server_name: str) -> str:
         with self.__lock:
             for server in self.servers:
@@ -785,7 +816,14 @@ T = TypeVar("T")
 class MCPClientBase(ABC):
     # server: Union[MCPServerLocal, MCPServerRemote] # Defined in __init__
     # tools: List[dict[str, Any]] # Defined in __init__
-    # No self.session, self.exit_stack, self.stdio, self.write as persistent instance fields
+    # The session is long-lived and owned by a task on the shared MCP event loop, see _run_session
+
+    IDLE_TIMEOUT = 300  # seconds without requests before the connection (and stdio process) is closed
+    HEALTH_CHECK_AFTER = 60  # seconds of inactivity after which the session is pinged before reuse
+    HEALTH_CHECK_TIMEOUT = 5  # seconds to wait for the ping response
+    MAX_CONCURRENCY = 4  # parallel requests per server
+    RECONNECT_BACKOFF = 1  # seconds, doubled on every failed connect attempt
+    RECONNECT_BACKOFF_MAX = 60
 
     __lock: ClassVar[threading.Lock] = threading.Lock()
 
@@ -796,6 +834,19 @@ class MCPClientBase(ABC):
         self.log: List[str] = []
         self.log_file: Optional[TextIO] = None
 
+        # session state, only touched from the MCP event loop
+        self._loop_thread = EventLoopThread("MCPClients")
+        self._session: Optional[ClientSession] = None
+        self._session_task: Optional[asyncio.Task] = None
+        self._closing: Optional[asyncio.Event] = None
+        self._connect_lock = asyncio.Lock()
+        self._semaphore = asyncio.Semaphore(self.MAX_CONCURRENCY)
+        self._active = 0
+        self._last_used = 0.0
+        self._failures = 0
+        self._retry_at = 0.0
+        self._last_error: Optional[Exception] = None
+
     # Protected method
     @abstractmethod
     async def _create_stdio_transport(
@@ -813,62 +864,162 @@ class MCPClientBase(ABC):
         read_timeout_seconds=60,
     ) -> T:
         """
-        Manages the lifecycle of an MCP session for a single operation.
-        Creates a temporary session, executes coro_func with it, and ensures cleanup.
+        Runs coro_func with the server's persistent MCP session.
+        The session is created on first use and reused by later operations, so stdio
+        servers are spawned and initialized once instead of once per operation.
         """
+        # transports use anyio task groups bound to the task that opened them,
+        # so all session work happens on one dedicated loop regardless of the caller's loop
+        future = self._loop_thread.run_coroutine(
+            self._execute_on_session(coro_func, read_timeout_seconds)
+        )
+        return await asyncio.wrap_future(future)
+
+    async def _execute_on_session(
+        self,
+        coro_func: Callable[[ClientSession], Awaitable[T]],
+        read_timeout_seconds: int,
+    ) -> T:
         operation_name = coro_func.__name__  # For logging
-        # PrintStyle(font_color="cyan").print(f"MCPClientBase ({self.server.name}): Creating new session for operation '{operation_name}'...")
-        # Store the original exception outside the async block
-        original_exception = None
-        try:
-            async with AsyncExitStack() as temp_stack:
+        async with self._semaphore:
+            self._active += 1
+            try:
+                session = await self._get_session(read_timeout_seconds)
                 try:
+                    return await coro_func(session)
+                except Exception:
+                    # tool errors keep the session, a dead connection is dropped to be reopened next time
+                    if not await self._is_alive(session):
+                        self._drop_session(session)
+                    raise
+            except Exception as e:
+                excs = getattr(e, "exceptions", None)  # Python 3.11+ ExceptionGroup
+                if excs:
+                    e = excs[0]
+                PrintStyle(
+                    background_color="#AA4455", font_color="white", padding=False
+                ).print(
+                    f"MCPClientBase ({self.server.name} - {operation_name}): Error during operation: {type(e).__name__}: {e}"
+                )
+                raise e
+            finally:
+                self._active -= 1
+                self._last_used = time.monotonic()
+
+    async def _get_session(self, read_timeout_seconds: int) -> ClientSession:
+        async with self._connect_lock:
+            session = self._session
+            if (
+                session
+                and time.monotonic() - self._last_used > self.HEALTH_CHECK_AFTER
+                and not await self._is_alive(session)
+            ):
+                PrintStyle(font_color="orange").print(
+                    f"MCPClientBase ({self.server.name}): Session is not responding, reconnecting..."
+                )
+                self._drop_session(session)
+            if self._session:
+                return self._session
 
-                    stdio, write = await self._create_stdio_transport(temp_stack)
-                    # PrintStyle(font_color="cyan").print(f"MCPClientBase ({self.server.name} - {operation_name}): Transport created. Initializing session...")
-                    session = await temp_stack.enter_async_context(
-                        ClientSession(
-                            stdio,  # type: ignore
-                            write,  # type: ignore
-                            read_timeout_seconds=timedelta(
-                                seconds=read_timeout_seconds
-                            ),
-                        )
-                    )
-                    await session.initialize()
+            if time.monotonic() < self._retry_at:
+                raise ConnectionError(
+                    f"Server '{self.server.name}' is unavailable, next connection attempt in {self._retry_at - time.monotonic():.0f}s. Last error: {self._last_error}"
+                )
 
-                    result = await coro_func(session)
+            ready: asyncio.Future[ClientSession] = asyncio.get_running_loop().create_future()
+            self._closing = asyncio.Event()
+            self._session_task = asyncio.create_task(
+                self._run_session(ready, self._closing, read_timeout_seconds)
+            )
+            try:
+                session = await ready
+            except Exception as e:
+                self._failures += 1
+                self._retry_at = time.monotonic() + min(
+                    self.RECONNECT_BACKOFF * 2 ** (self._failures - 1),
+                    self.RECONNECT_BACKOFF_MAX,
+                )
+                self._last_error = e
+                raise
+            self._failures = 0
+            self._last_used = time.monotonic()
+            return session
 
-                    return result
-                except Exception as e:
-                    # Store the original exception and raise a dummy exception
-                    excs = getattr(e, "exceptions", None)  # Python 3.11+ ExceptionGroup
-                    if excs:
-                        original_exception = excs[0]
-                    else:
-                        original_exception = e
-                    # Create a dummy exception to break out of the async block
-                    raise RuntimeError("Dummy exception to break out of async block")
+    async def _run_session(
+        self,
+        ready: "asyncio.Future[ClientSession]",
+        closing: asyncio.Event,
+        read_timeout_seconds: int,
+    ):
+        """Open the transport and session and hold them until closed, idle or broken."""
+        try:
+            async with AsyncExitStack() as stack:
+                stdio, write = await self._create_stdio_transport(stack)
+                session = await stack.enter_async_context(
+                    ClientSession(
+                        stdio,  # type: ignore
+                        write,  # type: ignore
+                        read_timeout_seconds=timedelta(seconds=read_timeout_seconds),
+                    )
+                )
+                await session.initialize()
+                self._session = session
+                ready.set_result(session)
+
+                while not closing.is_set():
+                    idle = time.monotonic() - self._last_used
+                    if not self._active and idle >= self.IDLE_TIMEOUT:
+                        break
+                    try:
+                        await asyncio.wait_for(
+                            closing.wait(), timeout=max(self.IDLE_TIMEOUT - idle, 1)
+                        )
+                    except asyncio.TimeoutError:
+                        pass
+                # stop handing out the session before the transport is torn down
+                if self._closing is closing:
+                    self._session = None
         except Exception as e:
-            # Check if this is our dummy exception
-            if original_exception is not None:
-                e = original_exception
-            # We have the original exception stored
-            PrintStyle(
-                background_color="#AA4455", font_color="white", padding=False
-            ).print(
-                f"MCPClientBase ({self.server.name} - {operation_name}): Error during operation: {type(e).__name__}: {e}"
-            )
-            raise e  # Re-raise the original exception
-        # finally:
-        #     PrintStyle(font_color="cyan").print(
-        #         f"MCPClientBase ({self.server.name} - {operation_name}): Session and transport will be closed by AsyncExitStack."
-        #     )
-        # This line should ideally be unreachable if the try/except/finally logic within the 'async with' is exhaustive.
-        # Adding it to satisfy linters that might not fully trace the raise/return paths through async context managers.
-        raise RuntimeError(
-            f"MCPClientBase ({self.server.name} - {operation_name}): _execute_with_session exited 'async with' block unexpectedly."
-        )
+            excs = getattr(e, "exceptions", None)  # Python 3.11+ ExceptionGroup
+            if excs:
+                e = excs[0]
+            if not ready.done():
+                ready.set_exception(e)
+            else:
+                PrintStyle(font_color="orange").print(
+                    f"MCPClientBase ({self.server.name}): Session closed: {type(e).__name__}: {e}"
+                )
+        finally:
+            if not ready.done():
+                ready.set_exception(ConnectionError("Session closed during initialization"))
+            if self._closing is closing:
+                self._session = None
+
+    async def _is_alive(self, session: ClientSession) -> bool:
+        try:
+            await asyncio.wait_for(session.send_ping(), timeout=self.HEALTH_CHECK_TIMEOUT)
+            return True
+        except Exception:
+            return False
+
+    def _drop_session(self, session: ClientSession):
+        if self._session is session:
+            self._session = None
+            if self._closing:
+                self._closing.set()
+
+    def close(self):
+        """Close the persistent session, the next operation reconnects."""
+
+        def _close():
+            self._session = None
+            self._failures = 0
+            self._retry_at = 0.0
+            if self._closing:
+                self._closing.set()
+
+        if self._loop_thread.loop:
+            self._loop_thread.loop.call_soon_threadsafe(_close)
 
     async def update_tools(self) -> "MCPClientBase":
         # PrintStyle(font_color="cyan").print(f"MCPClientBase ({self.server.name}): Starting 'update_tools' operation...")
@@ -884,6 +1035,7 @@ class MCPClientBase(ABC):
                     }
                     for tool in response.tools
                 ]
+            _tools_changed()
             PrintStyle(font_color="green").print(
                 f"MCPClientBase ({self.server.name}): Tools updated. Found {len(self.tools)} tools."
             )
@@ -907,6 +1059,7 @@ class MCPClientBase(ABC):
             with self.__lock:
                 self.tools = []  # Ensure tools are cleared on failure
                 self.error = f"Failed to initialize. {error_text[:200]}{'...' if len(error_text) > 200 else ''}"  # store error from tools fetch
+            _tools_changed()
         return self
 
     def has_tool(self, tool_name: str) -> bool:
@@ -1073,7 +1226,12 @@ class MCPClientRemote(MCPClientBase):
 
         # Use lower timeouts for faster failure detection
         init_timeout = min(server.init_timeout or set["mcp_client_init_timeout"], 5)
-        tool_timeout = min(server.tool_timeout or set["mcp_client_tool_timeout"], 10)
+        # but the session is kept open between operations, its event stream may stay silent
+        # until the session is closed as idle, or for as long as a tool runs
+        sse_read_timeout = (
+            max(self.IDLE_TIMEOUT, server.tool_timeout or set["mcp_client_tool_timeout"])
+            + self.HEALTH_CHECK_TIMEOUT
+        )
 
         client_factory = CustomHTTPClientFactory(verify=server.verify)
         # Check if this is a streaming HTTP type
@@ -1084,7 +1242,7 @@ class MCPClientRemote(MCPClientBase):
                     url=server.url,
                     headers=server.headers,
                     timeout=timedelta(seconds=init_timeout),
-                    sse_read_timeout=timedelta(seconds=tool_timeout),
+                    sse_read_timeout=timedelta(seconds=sse_read_timeout),
                     httpx_client_factory=client_factory,
                 )
             )
@@ -1102,7 +1260,7 @@ class MCPClientRemote(MCPClientBase):
                     url=server.url,
                     headers=server.headers,
                     timeout=init_timeout,
-                    sse_read_timeout=tool_timeout,
+                    sse_read_timeout=sse_read_timeout,
                     httpx_client_factory=client_factory,
                 )
             )
@@ -1,5 +1,7 @@
+from contextlib import nullcontext
 from datetime import datetime
-from typing import Any, List, Sequence
+from dataclasses import dataclass
+from typing import Any, Callable, List, Sequence
 from langchain.storage import InMemoryByteStore, LocalFileStore
 from langchain.embeddings import CacheBackedEmbeddings
 from python.helpers import guids
@@ -18,11 +20,15 @@ from langchain_community.vectorstores.utils import (
 )
 from langchain_core.embeddings import Embeddings
 
-import os, json
+import os, json, math
 
 import numpy as np
 
 from python.helpers.print_style import PrintStyle
+from python.helpers.memory_wal import MemoryWal
+from python.helpers.memory_index import MemoryIndex
+from python.helpers.embedding_cache import CachedQueryEmbeddings, persist_query_embeddings
+from python.helpers.metadata_index import MetadataIndex, compile_filter, get_comparator
 from . import files
 from langchain_core.documents import Document
 from python.helpers import knowledge_import
@@ -31,14 +37,63 @@ from enum import Enum
 from agent import Agent, AgentContext
 import models
 import logging
-from simpleeval import simple_eval
 
 
+FILTER_FETCH_K = 20  # vectors fetched for a filtered search, langchain's default
+FILTER_FETCH_K_MAX = 10_000  # upper bound when the filter matches only a few documents
+
 # Raise the log level so WARNING messages aren't shown
 logging.getLogger("langchain_core.vectorstores.base").setLevel(logging.ERROR)
 
 
+@dataclass
+class MemorySearch:
+    limit: int
+    threshold: float
+    filter: str = ""
+
+
 class MyFaiss(FAISS):
+    wal: MemoryWal | None = None  # mutation log of a persisted DB
+    ann: MemoryIndex | None = None  # index type management, flat or approximate
+    _metadata_index: MetadataIndex | None = None
+
+    # all of langchain's add methods end up here
+    def _FAISS__add(self, texts, embeddings, metadatas=None, ids=None):
+        if self.ann:
+            ids = self.ann.add(self, texts, embeddings, metadatas, ids)
+        else:
+            ids = FAISS._FAISS__add(self, texts, embeddings, metadatas, ids)  # type: ignore
+        if self._metadata_index:
+            self._metadata_index.add((id, self.docstore._dict[id]) for id in ids)  # type: ignore
+        return ids
+
+    def delete(self, ids: Sequence[str] | None = None, **kwargs) -> bool | None:
+        if self.ann:
+            if ids is None:
+                raise ValueError("No ids provided to delete.")
+            result = self.ann.delete(self, list(ids))
+        else:
+            result = super().delete(ids=ids, **kwargs)  # type: ignore
+        if self._metadata_index and ids:
+            self._metadata_index.remove(ids)
+        return result
+
+    def get_metadata_index(self) -> MetadataIndex:
+        # built on first use, kept up to date by add and delete from then on
+        if self._metadata_index is None:
+            with self.ann.lock if self.ann else nullcontext():
+                if self._metadata_index is None:
+                    self._metadata_index = MetadataIndex(docs=dict(self.get_all_docs()))
+        return self._metadata_index
+
+    def similarity_search_with_score_by_vector(self, embedding, k=4, filter=None, fetch_k=20, **kwargs):
+        if self.ann:
+            return self.ann.search(self, embedding, k=k, filter=filter, fetch_k=fetch_k, **kwargs)
+        return super().similarity_search_with_score_by_vector(
+            embedding, k=k, filter=filter, fetch_k=fetch_k, **kwargs
+        )
+
     # override aget_by_ids
     def get_by_ids(self, ids: Sequence[str], /) -> List[Document]:
         # return all self.docstore._dict[id] in ids
@@ -146,6 +201,10 @@ class Memory:
         # make sure embeddings and database directories exist
         os.makedirs(db_dir, exist_ok=True)
 
+        # finish or discard a snapshot interrupted by a crash
+        wal = MemoryWal.get(db_dir)
+        wal.recover()
+
         if in_memory:
             store = InMemoryByteStore()
         else:
@@ -162,9 +221,14 @@ class Memory:
         )
 
         # here we setup the embeddings model with the chosen cache storage
+        # queries are kept in memory, and on disk too if enabled
         embedder = CacheBackedEmbeddings.from_bytes_store(
-            embeddings_model, store, namespace=embeddings_model_id
+            embeddings_model,
+            store,
+            namespace=embeddings_model_id,
+            query_embedding_cache=persist_query_embeddings() and not in_memory,
         )
+        embedder = CachedQueryEmbeddings(embedder, namespace=embeddings_model_id)
 
         # initial DB and docs variables
         db: MyFaiss | None = None
@@ -182,6 +246,11 @@ class Memory:
                 # normalize_L2=True,
                 relevance_score_fn=Memory._cosine_normalizer,
             )  # type: ignore
+            db.ann = MemoryIndex(db_dir, wal.lock)
+
+            # apply mutations logged since the snapshot
+            if wal.replay(db):
+                PrintStyle.standard("Replayed memory log")
 
             # if there is a mismatch in embeddings used, re-index the whole DB
             emb_ok = False
@@ -213,6 +282,7 @@ class Memory:
                 # normalize_L2=True,
                 relevance_score_fn=Memory._cosine_normalizer,
             )
+            db.ann = MemoryIndex(db_dir, wal.lock)
 
             # insert docs if reindexing
             if docs:
@@ -222,6 +292,7 @@ class Memory:
                 db.add_documents(documents=list(docs.values()), ids=list(docs.keys()))
 
             # save DB
+            db.wal = wal
             Memory._save_db_file(db, memory_subdir)
             # save meta file
             meta_file_path = files.get_abs_path(db_dir, "embedding.json")
@@ -237,6 +308,9 @@ class Memory:
 
             created = True
 
+        db.wal = wal
+        # promote, demote or rebuild the index if it does not fit the DB or its config
+        db.ann.check(db)  # type: ignore
         return db, created
 
     def __init__(
@@ -341,15 +415,93 @@ class Memory:
     async def search_similarity_threshold(
         self, query: str, limit: int, threshold: float, filter: str = ""
     ):
-        comparator = Memory._get_comparator(filter) if filter else None
-
-        return await self.db.asearch(
-            query,
-            search_type="similarity_score_threshold",
-            k=limit,
-            score_threshold=threshold,
-            filter=comparator,
+        results = await self.search_similarity_threshold_multi(
+            query, [MemorySearch(limit=limit, threshold=threshold, filter=filter)]
         )
+        return results[0]
+
+    async def search_similarity_threshold_multi(
+        self, query: str, searches: list["MemorySearch"]
+    ) -> list[list[Document]]:
+        """Several searches of one query (e.g. per area), embedded once and run in one index pass"""
+        embedding = await self.embed_query(query)
+        return await self.search_by_embedding(embedding, searches)
+
+    async def embed_query(self, query: str) -> list[float]:
+        return await self.db._aembed_query(query)
+
+    async def search_by_embedding(
+        self, embedding: list[float], searches: list["MemorySearch"]
+    ) -> list[list[Document]]:
+        results: list[list[Document]] = [[] for _ in searches]
+        total = len(self.db.index_to_docstore_id)
+        if not total:
+            return results
+
+        comparators: dict[int, Callable[[dict], Any] | None] = {}
+        fetch_k = FILTER_FETCH_K
+        for i, search in enumerate(searches):
+            if search.limit <= 0:
+                continue
+            if not search.filter:
+                comparators[i] = None
+                continue
+            candidates = compile_filter(search.filter).candidates(
+                self.db.get_metadata_index()
+            )
+            if candidates is not None:
+                if not candidates:
+                    continue  # nothing can match
+                # search deep enough to find the limit among the candidates
+                fetch_k = max(
+                    fetch_k, search.limit * math.ceil(total / len(candidates))
+                )
+            comparators[i] = Memory._get_comparator(search.filter, candidates)
+        if not comparators:
+            return results
+
+        filters = [c for c in comparators.values() if c]
+        if not filters:
+            db_filter = None
+        elif len(filters) < len(comparators):
+            db_filter = lambda data: True  # keeps fetch_k depth for the filtered searches
+        else:
+            db_filter = lambda data: any(f(data) for f in filters)
+
+        # filtered searches keep everything matching within fetch_k, each takes its limit below
+        k = max(searches[i].limit for i in comparators)
+        fetch_k = min(max(fetch_k, k), FILTER_FETCH_K_MAX, total)
+        docs = await self.db.asimilarity_search_with_score_by_vector(
+            embedding, k=fetch_k if db_filter else k, filter=db_filter, fetch_k=fetch_k
+        )
+
+        # distribute the results, best first, same relevance scores as langchain's threshold search
+        relevance = self.db._select_relevance_score_fn()
+        for doc, score in docs:
+            similarity = relevance(score)
+            for i, comparator in comparators.items():
+                search = searches[i]
+                if (
+                    len(results[i]) < search.limit
+                    and similarity >= search.threshold
+                    and (comparator is None or comparator(doc.metadata))
+                ):
+                    results[i].append(doc)
+        return results
+
+    async def search_by_metadata(self, filter: str, limit: int = 0) -> list[Document]:
+        candidates = compile_filter(filter).candidates(self.db.get_metadata_index())
+        all_docs = self.db.get_all_docs()
+        comparator = Memory._get_comparator(filter)
+        result = []
+        for id in list(all_docs.keys() if candidates is None else candidates):
+            doc = all_docs.get(id)
+            if doc and comparator(doc.metadata):
+                result.append(doc)
+                # stop if limit reached and limit > 0
+                if limit > 0 and len(result) >= limit:
+                    break
+        return result
 
     async def delete_documents_by_query(
         self, query: str, threshold: float, filter: str = ""
@@ -374,7 +526,7 @@ class Memory:
                 # fnd = self.db.get(where={"id": {"$in": document_ids}})
                 # if fnd["ids"]: self.db.delete(ids=fnd["ids"])
                 # tot += len(fnd["ids"])
-                await self.db.adelete(ids=document_ids)
+                self._delete_db(document_ids)
                 tot += len(document_ids)
 
             # If fewer than K document IDs, break the loop
@@ -392,7 +544,7 @@ class Memory:
         )  # existing docs to remove (prevents error)
         if rem_docs:
             rem_ids = [doc.metadata["id"] for doc in rem_docs]  # ids to remove
-            await self.db.adelete(ids=rem_ids)
+            self._delete_db(rem_ids)
 
         if rem_docs:
             self._save_db()  # persist
@@ -414,19 +566,39 @@ class Memory:
                 if not doc.metadata.get("area", ""):
                     doc.metadata["area"] = Memory.Area.MAIN.value
 
-            await self.db.aadd_documents(documents=docs, ids=ids)
+            await self._add_db(docs, ids)
             self._save_db()  # persist
         return ids
 
     async def update_documents(self, docs: list[Document]):
         ids = [doc.metadata["id"] for doc in docs]
-        await self.db.adelete(ids=ids)  # delete originals
-        ins = await self.db.aadd_documents(documents=docs, ids=ids)  # add updated
+        await self._add_db(docs, ids)  # replaces originals
         self._save_db()  # persist
-        return ins
+        return ids
+
+    async def _add_db(self, docs: list[Document], ids: list[str]):
+        if not self.db.wal:
+            await self.db.aadd_documents(documents=docs, ids=ids)
+            return
+        # embed outside of the log lock, only the index update is serialized
+        vectors = await self.db.embeddings.aembed_documents(  # type: ignore
+            [doc.page_content for doc in docs]
+        )
+        self.db.wal.add(self.db, ids, docs, vectors)
+
+    def _delete_db(self, ids: list[str]):
+        if self.db.wal:
+            self.db.wal.delete(self.db, ids)
+        else:
+            self.db.delete(ids=ids)
 
     def _save_db(self):
-        Memory._save_db_file(self.db, self.memory_subdir)
+        # mutations are already in the log, only compact it when it grew large or old
+        if self.db.wal:
+            if self.db.wal.needs_compaction():
+                self.db.wal.snapshot(self.db)
+        else:
+            Memory._save_db_file(self.db, self.memory_subdir)
 
     def _generate_doc_id(self):
         while True:
@@ -436,20 +608,20 @@ class Memory:
 
     @staticmethod
     def _save_db_file(db: MyFaiss, memory_subdir: str):
+        if db.wal:
+            # full snapshot, supersedes any logged mutations
+            db.wal.snapshot(db, background=False)
+            return
         abs_dir = abs_db_dir(memory_subdir)
         db.save_local(folder_path=abs_dir)
 
     @staticmethod
-    def _get_comparator(condition: str):
-        def comparator(data: dict[str, Any]):
-            try:
-                result = simple_eval(condition, names=data)
-                return result
-            except Exception as e:
-                PrintStyle.error(f"Error evaluating condition: {e}")
-                return False
-
-        return comparator
+    def _get_comparator(condition: str, candidates: set[str] | None = None):
+        return get_comparator(
+            condition,
+            candidates,
+            on_error=lambda e: PrintStyle.error(f"Error evaluating condition: {e}"),
+        )
 
     @staticmethod
     def _score_normalizer(val: float) -> float:
@@ -7,7 +7,7 @@ from enum import Enum
 
 from langchain_core.documents import Document
 
-from python.helpers.memory import Memory
+from python.helpers.memory import Memory, MemorySearch
 from python.helpers.dirty_json import DirtyJson
 from python.helpers.log import LogItem
 from python.helpers.print_style import PrintStyle
@@ -336,32 +336,46 @@ class MemoryConsolidator:
         """
         db = await Memory.get(self.agent)
 
-        # Step 1: Extract keywords/queries for enhanced search
+        # Step 1: Extract keywords/queries for enhanced search,
+        # the new memory is embedded meanwhile
+        semantic_embedding = asyncio.create_task(db.embed_query(new_memory))
         search_queries = await self._extract_search_keywords(new_memory, log_item)
+        search_queries = [query.strip() for query in search_queries if query.strip()]
+
+        # keyword queries are embedded concurrently, repeated ones come from the query cache
+        embeddings = await asyncio.gather(
+            semantic_embedding, *(db.embed_query(query) for query in search_queries)
+        )
 
         all_similar = []
 
         # Step 2: Semantic similarity search with scores
-        semantic_similar = await db.search_similarity_threshold(
-            query=new_memory,
-            limit=self.config.max_similar_memories,
-            threshold=self.config.similarity_threshold,
-            filter=f"area == '{area}'"
+        [semantic_similar] = await db.search_by_embedding(
+            embeddings[0],
+            [
+                MemorySearch(
+                    limit=self.config.max_similar_memories,
+                    threshold=self.config.similarity_threshold,
+                    filter=f"area == '{area}'",
+                )
+            ],
         )
         all_similar.extend(semantic_similar)
 
         # Step 3: Keyword-based searches
-        for query in search_queries:
-            if query.strip():
-                # Fix division by zero: ensure len(search_queries) > 0
-                queries_count = max(1, len(search_queries))  # Prevent division by zero
-                keyword_similar = await db.search_similarity_threshold(
-                    query=query.strip(),
-                    limit=max(3, self.config.max_similar_memories // queries_count),
-                    threshold=self.config.similarity_threshold,
-                    filter=f"area == '{area}'"
-                )
-                all_similar.extend(keyword_similar)
+        queries_count = max(1, len(search_queries))  # Prevent division by zero
+        for embedding in embeddings[1:]:
+            [keyword_similar] = await db.search_by_embedding(
+                embedding,
+                [
+                    MemorySearch(
+                        limit=max(3, self.config.max_similar_memories // queries_count),
+                        threshold=self.config.similarity_threshold,
+                        filter=f"area == '{area}'",
+                    )
+                ],
+            )
+            all_similar.extend(keyword_similar)
 
         # Step 4: Deduplicate by document ID and store similarity info
         seen_ids = set()
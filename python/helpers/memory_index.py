@@ -0,0 +1,348 @@
+import json
+import math
+import operator
+import os
+import threading
+import uuid
+from typing import TYPE_CHECKING, Any, Callable
+
+import numpy as np
+
+# faiss needs to be patched for python 3.12 on arm #TODO remove once not needed
+from python.helpers import faiss_monkey_patch
+import faiss
+
+from langchain_community.vectorstores import FAISS
+from langchain_community.vectorstores.utils import DistanceStrategy
+from langchain_core.documents import Document
+
+from python.helpers.print_style import PrintStyle
+
+if TYPE_CHECKING:
+    from python.helpers.memory import MyFaiss
+
+
+CONFIG_FILE = "index.json"  # optional per memory subdir, overrides DEFAULT_CONFIG
+
+TYPE_FLAT = "flat"
+TYPE_IVF = "ivf"
+TYPE_HNSW = "hnsw"
+
+DEFAULT_CONFIG = {
+    "type": TYPE_HNSW,  # index used once the memory has promote_at vectors, "flat" to always scan
+    "promote_at": 50_000,  # below this many vectors (half of it once promoted) a flat scan is used
+    "hnsw_m": 32,  # graph neighbours per vector
+    "hnsw_ef_construction": 80,  # build breadth, higher is slower to build but more accurate
+    "hnsw_ef_search": 64,  # search breadth
+    "ivf_nprobe": 16,  # clusters scanned per search
+}
+
+REBUILD_DELETED = 0.25  # rebuild an approximate index once this share of its vectors is deleted
+RECLUSTER_GROWTH = 2  # re-cluster IVF once the ideal cluster count is this many times the trained one
+IVF_TRAIN_POINTS = 64  # training vectors sampled per IVF cluster
+
+
+class MemoryIndex:
+    """Index type management of a memory DB.
+
+    Small memories keep the exact flat index. Past a vector count the DB is
+    promoted to an approximate index (HNSW or IVF) built in the background from
+    the current vectors; mutations made meanwhile are journaled and applied
+    before the new index is swapped in under the DB lock.
+
+    Approximate indexes cannot drop vectors in place, so deleted documents are
+    only removed from index_to_docstore_id and skipped at search time, labels of
+    new vectors keep counting from index.ntotal. Once too many are deleted, or an
+    IVF index outgrows its clustering, the index is rebuilt the same way.
+
+    A reverse map of docstore ids to labels mirrors index_to_docstore_id, so
+    deletes and updates look their labels up instead of scanning the mapping.
+    """
+
+    def __init__(self, db_dir: str, lock: Any):
+        self.db_dir = db_dir
+        self.lock = lock  # the DB mutation lock, shared with the memory log
+        self.config = load_config(db_dir)
+        self._journal: list[tuple] | None = None  # mutations made while a new index is built
+        self._thread: threading.Thread | None = None
+        self._labels: dict[str, int] = {}  # docstore id -> label, reverse of _labels_of
+        self._labels_of: dict[int, str] | None = None  # index_to_docstore_id mirrored by _labels
+
+    def _get_labels(self, db: "MyFaiss") -> dict[str, int]:
+        # rebuilt only when the mapping was replaced (loaded, flat mutation, rebuild)
+        if self._labels_of is not db.index_to_docstore_id:
+            self._labels = {id: label for label, id in db.index_to_docstore_id.items()}
+            self._labels_of = db.index_to_docstore_id
+        return self._labels
+
+    # mutations
+
+    def add(
+        self,
+        db: "MyFaiss",
+        texts: list[str],
+        embeddings: Any,
+        metadatas: list[dict] | None,
+        ids: list[str] | None,
+    ) -> list[str]:
+        texts = list(texts)
+        ids = ids or [str(uuid.uuid4()) for _ in texts]
+        vectors = np.array(list(embeddings), dtype=np.float32)
+        if db._normalize_L2:
+            faiss.normalize_L2(vectors)
+        with self.lock:
+            if get_type(db.index) == TYPE_FLAT:
+                FAISS._FAISS__add(db, texts, vectors, metadatas, ids)  # type: ignore
+                self._labels_of = None
+            else:
+                if len(ids) != len(set(ids)):
+                    raise ValueError("Duplicate ids found in the ids list.")
+                metadatas = metadatas or [{} for _ in texts]
+                db.docstore.add(  # type: ignore
+                    {
+                        id: Document(id=id, page_content=text, metadata=meta)
+                        for id, text, meta in zip(ids, texts, metadatas)
+                    }
+                )
+                _add_vectors(db.index, db.index_to_docstore_id, ids, vectors, self._get_labels(db))
+
+            if self._journal is not None:
+                self._journal.append(("add", ids, vectors))
+            self.check(db)
+        return ids
+
+    def delete(self, db: "MyFaiss", ids: list[str]) -> bool:
+        with self.lock:
+            if get_type(db.index) == TYPE_FLAT:
+                FAISS.delete(db, ids)
+                self._labels_of = None
+            else:
+                labels = self._get_labels(db)
+                missing = {id for id in ids if id not in labels}
+                if missing:
+                    raise ValueError(
+                        f"Some specified ids do not exist in the current store. Ids not found: {missing}"
+                    )
+                _drop_labels(db.index_to_docstore_id, ids, labels)
+                db.docstore.delete(ids)  # type: ignore
+
+            if self._journal is not None:
+                self._journal.append(("delete", ids))
+            self.check(db)
+        return True
+
+    # search
+
+    def search(
+        self,
+        db: "MyFaiss",
+        embedding: list[float],
+        k: int = 4,
+        filter: Callable | dict | None = None,
+        fetch_k: int = 20,
+        **kwargs: Any,
+    ) -> list[tuple[Document, float]]:
+        """Same as FAISS.similarity_search_with_score_by_vector, skipping deleted vectors"""
+        vector = np.array([embedding], dtype=np.float32)
+        if db._normalize_L2:
+            faiss.normalize_L2(vector)
+        n = k if filter is None else fetch_k
+
+        with self.lock:  # approximate indexes are not safe to search while vectors are added
+            index, mapping = db.index, db.index_to_docstore_id
+            if not index.ntotal:
+                return []
+            # fetch more to make up for deleted vectors among the results
+            n = min(index.ntotal, math.ceil(n * index.ntotal / max(len(mapping), 1)))
+            scores, labels = index.search(vector, n, params=self._get_params(index, n))
+
+        filter_func = db._create_filter_func(filter) if filter is not None else None
+        docs = []
+        for score, label in zip(scores[0], labels[0]):
+            id = mapping.get(int(label))
+            if id is None:
+                continue  # not enough results or deleted
+            doc = db.docstore.search(id)
+            if not isinstance(doc, Document):
+                raise ValueError(f"Could not find document for id {id}, got {doc}")
+            if filter_func is None or filter_func(doc.metadata):
+                docs.append((doc, score))
+
+        score_threshold = kwargs.get("score_threshold")
+        if score_threshold is not None:
+            cmp = (
+                operator.ge
+                if db.distance_strategy
+                in (DistanceStrategy.MAX_INNER_PRODUCT, DistanceStrategy.JACCARD)
+                else operator.le
+            )
+            docs = [(doc, score) for doc, score in docs if cmp(score, score_threshold)]
+        return docs[:k]
+
+    def _get_params(self, index: Any, k: int):
+        if isinstance(index, faiss.IndexHNSW):
+            return faiss.SearchParametersHNSW(efSearch=max(self.config["hnsw_ef_search"], k))
+        if isinstance(index, faiss.IndexIVF):
+            return faiss.SearchParametersIVF(nprobe=self.config["ivf_nprobe"])
+        return None
+
+    # promotion and rebuilds
+
+    def check(self, db: "MyFaiss", background: bool = True):
+        """Start a rebuild of the index if its type or state no longer fits the DB"""
+        if self._thread and self._thread.is_alive():
+            return
+        target = self.get_rebuild_type(db)
+        if not target:
+            return
+        if background:
+            self._thread = threading.Thread(
+                target=self.rebuild, args=(db, target), daemon=True, name="MemoryIndexBuild"
+            )
+            self._thread.start()
+        else:
+            self.rebuild(db, target)
+
+    def get_rebuild_type(self, db: "MyFaiss") -> str | None:
+        index = db.index
+        current = get_type(index)
+        live = len(db.index_to_docstore_id)
+        promote_at = self.config["promote_at"]
+
+        # promote past the threshold, demote well below it
+        if self.config["type"] == TYPE_FLAT or live < promote_at / 2:
+            target = TYPE_FLAT
+        elif live >= promote_at:
+            target = self.config["type"]
+        else:
+            target = current
+        if target != current:
+            return target
+
+        if current != TYPE_FLAT and index.ntotal - live >= index.ntotal * REBUILD_DELETED:
+            return current
+        if current == TYPE_IVF and get_ivf_nlist(live) >= RECLUSTER_GROWTH * index.nlist:
+            return current
+        return None
+
+    def rebuild(self, db: "MyFaiss", type: str):
+        try:
+            with self.lock:
+                # capture the live vectors, the build itself runs outside of the lock
+                mapping = dict(db.index_to_docstore_id)
+                labels = np.fromiter(mapping.keys(), dtype=np.int64, count=len(mapping))
+                vectors = (
+                    db.index.reconstruct_batch(labels)
+                    if len(labels)
+                    else np.zeros((0, db.index.d), dtype=np.float32)
+                )
+                ids = list(mapping.values())
+                dim = db.index.d
+                self._journal = []
+
+            PrintStyle.standard(f"Building {type} memory index of {len(ids)} vectors in {self.db_dir}")
+            index = self._build_index(type, dim, vectors)
+            index_to_id = {i: id for i, id in enumerate(ids)}
+            id_to_label = {id: i for i, id in enumerate(ids)}
+
+            with self.lock:
+                # catch up with mutations made during the build
+                for op in self._journal:
+                    if op[0] == "add":
+                        _drop_labels(index_to_id, op[1], id_to_label)  # updated documents
+                        _add_vectors(index, index_to_id, op[1], op[2], id_to_label)
+                    else:
+                        _drop_labels(index_to_id, op[1], id_to_label)
+                if type == TYPE_FLAT:
+                    # positions of a flat index are its labels, drop deleted vectors for real
+                    index, index_to_id = _compact_flat(index, index_to_id)
+                    id_to_label = {id: label for label, id in index_to_id.items()}
+                db.index = index
+                db.index_to_docstore_id = index_to_id
+                self._labels, self._labels_of = id_to_label, index_to_id
+                self._journal = None
+
+            # persist the new index
+            if db.wal:
+                db.wal.snapshot(db)
+        except Exception as e:
+            self._journal = None
+            PrintStyle.error(f"Failed to build memory index in {self.db_dir}: {e}")
+
+    def _build_index(self, type: str, dim: int, vectors: np.ndarray):
+        if type == TYPE_HNSW:
+            index = faiss.IndexHNSWFlat(dim, self.config["hnsw_m"], faiss.METRIC_INNER_PRODUCT)
+            index.hnsw.efConstruction = self.config["hnsw_ef_construction"]
+        elif type == TYPE_IVF:
+            nlist = get_ivf_nlist(len(vectors))
+            quantizer = faiss.IndexFlatIP(dim)
+            index = faiss.IndexIVFFlat(quantizer, dim, nlist, faiss.METRIC_INNER_PRODUCT)
+            sample = vectors
+            if len(vectors) > nlist * IVF_TRAIN_POINTS:
+                rng = np.random.default_rng(0)
+                sample = vectors[rng.choice(len(vectors), nlist * IVF_TRAIN_POINTS, replace=False)]
+            index.train(sample)
+            index.make_direct_map()  # vectors are reconstructed for later rebuilds
+        else:
+            index = faiss.IndexFlatIP(dim)
+        if len(vectors):
+            index.add(vectors)
+        return index
+
+
+def load_config(db_dir: str) -> dict:
+    config = dict(DEFAULT_CONFIG)
+    path = os.path.join(db_dir, CONFIG_FILE)
+    if os.path.exists(path):
+        try:
+            with open(path, "r") as f:
+                config.update(json.load(f))
+        except Exception as e:
+            PrintStyle.error(f"Invalid memory index config {path}: {e}")
+    if config["type"] not in (TYPE_FLAT, TYPE_IVF, TYPE_HNSW):
+        PrintStyle.error(f"Unknown memory index type {config['type']}, using flat")
+        config["type"] = TYPE_FLAT
+    return config
+
+
+def get_type(index: Any) -> str:
+    if isinstance(index, faiss.IndexHNSW):
+        return TYPE_HNSW
+    if isinstance(index, faiss.IndexIVF):
+        return TYPE_IVF
+    return TYPE_FLAT
+
+
+def get_ivf_nlist(count: int) -> int:
+    # about 4 * sqrt(n) clusters, each with enough points to train on
+    return max(1, min(int(4 * math.sqrt(count)), count // 39))
+
+
+def _add_vectors(
+    index: Any,
+    index_to_id: dict[int, str],
+    ids: list[str],
+    vectors: np.ndarray,
+    id_to_label: dict[str, int],
+):
+    start = index.ntotal  # new vectors are labeled sequentially
+    index.add(vectors)
+    for j, id in enumerate(ids):
+        index_to_id[start + j] = id
+        id_to_label[id] = start + j
+
+
+def _drop_labels(index_to_id: dict[int, str], ids: list[str], id_to_label: dict[str, int]):
+    for id in ids:
+        label = id_to_label.pop(id, None)
+        if label is not None:
+            del index_to_id[label]
+
+
+def _compact_flat(index: Any, index_to_id: dict[int, str]):
+    if index.ntotal == len(index_to_id):
+        return index, index_to_id
+    labels = np.array(sorted(index_to_id.keys()), dtype=np.int64)
+    flat = faiss.IndexFlatIP(index.d)
+    flat.add(index.reconstruct_batch(labels))
+    return flat, {i: index_to_id[int(label)] for i, label in enumerate(labels)}
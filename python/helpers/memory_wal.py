@@ -0,0 +1,261 @@
+import json
+import os
+import pickle
+import struct
+import threading
+import time
+import zlib
+from typing import TYPE_CHECKING, Any
+
+import numpy as np
+
+# faiss needs to be patched for python 3.12 on arm #TODO remove once not needed
+from python.helpers import faiss_monkey_patch
+import faiss
+
+from langchain_community.docstore.in_memory import InMemoryDocstore
+from langchain_core.documents import Document
+
+from python.helpers.print_style import PrintStyle
+
+if TYPE_CHECKING:
+    from python.helpers.memory import MyFaiss
+
+
+LOG_FILE = "mutations.log"  # active log, appended on every mutation
+SEGMENT_PREFIX = "mutations."  # rotated logs waiting for a snapshot: mutations.<n>.log
+SEGMENT_SUFFIX = ".log"
+COMMIT_MARKER = "snapshot.commit"  # present while a written snapshot is being swapped in
+INDEX_FILE = "index.faiss"
+DOCSTORE_FILE = "index.pkl"
+TMP_SUFFIX = ".tmp"
+
+COMPACT_SIZE = 32 * 1024 * 1024  # compact once the log grows past this many bytes
+COMPACT_INTERVAL = 10 * 60  # or once its oldest record is this many seconds old
+
+_HEADER = struct.Struct("<II")  # payload length, crc32
+
+
+class MemoryWal:
+    """Append-only mutation log next to a FAISS memory snapshot.
+
+    Every mutation is applied to the in-memory DB and appended to the log, so a
+    write costs O(changed documents) instead of a full save_local. On load the
+    log is replayed over the last snapshot. Past a size or age threshold the
+    DB is compacted into a new snapshot in the background: the state is
+    captured and the log rotated under the lock, files are written outside of
+    it and swapped in through a commit marker, so a crash at any point leaves
+    either the old snapshot with its full log or the new one.
+    """
+
+    _instances: dict[str, "MemoryWal"] = {}
+    _instances_lock = threading.Lock()
+
+    @classmethod
+    def get(cls, db_dir: str) -> "MemoryWal":
+        # one log per directory, shared by reloaded DB instances
+        with cls._instances_lock:
+            if db_dir not in cls._instances:
+                cls._instances[db_dir] = cls(db_dir)
+            return cls._instances[db_dir]
+
+    def __init__(self, db_dir: str):
+        self.db_dir = db_dir
+        self.lock = threading.RLock()
+        self._log_size = 0
+        self._first_record: float | None = None
+        self._compacting = False
+        self._thread: threading.Thread | None = None
+
+    # mutations
+
+    def add(self, db: "MyFaiss", ids: list[str], docs: list[Document], vectors: Any):
+        record = {
+            "op": "add",
+            "ids": ids,
+            "docs": docs,
+            "vectors": np.asarray(vectors, dtype=np.float32),
+        }
+        with self.lock:
+            self._apply(db, record)
+            self._append(record)
+
+    def delete(self, db: "MyFaiss", ids: list[str]):
+        record = {"op": "delete", "ids": ids}
+        with self.lock:
+            self._apply(db, record)
+            self._append(record)
+
+    @staticmethod
+    def _apply(db: "MyFaiss", record: dict):
+        # records are idempotent, so replaying a log over a newer snapshot is safe
+        existing = [id for id in record["ids"] if id in db.docstore._dict]  # type: ignore
+        if existing:
+            db.delete(ids=existing)
+        if record["op"] == "add":
+            docs: list[Document] = record["docs"]
+            db.add_embeddings(
+                text_embeddings=zip([doc.page_content for doc in docs], record["vectors"]),
+                metadatas=[doc.metadata for doc in docs],
+                ids=record["ids"],
+            )
+
+    def _append(self, record: dict):
+        payload = pickle.dumps(record, protocol=pickle.HIGHEST_PROTOCOL)
+        data = _HEADER.pack(len(payload), zlib.crc32(payload)) + payload
+        with open(self._path(LOG_FILE), "ab") as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        self._log_size += len(data)
+        if self._first_record is None:
+            self._first_record = time.time()
+
+    # loading
+
+    def recover(self):
+        """Finish a snapshot swap interrupted by a crash, or discard its leftovers."""
+        if self._thread and self._thread.is_alive():
+            self._thread.join()  # let a running compaction finish first
+        marker = self._path(COMMIT_MARKER)
+        if os.path.exists(marker):
+            with open(marker, "r") as f:
+                segments = json.load(f)
+            self._commit(segments)
+        for file in (INDEX_FILE, DOCSTORE_FILE):
+            if os.path.exists(self._path(file + TMP_SUFFIX)):
+                os.remove(self._path(file + TMP_SUFFIX))
+
+    def replay(self, db: "MyFaiss") -> int:
+        """Apply all logged mutations to a freshly loaded snapshot."""
+        count = 0
+        with self.lock:
+            for file in self._segments() + [LOG_FILE]:
+                for record in self._read(file):
+                    self._apply(db, record)
+                    count += 1
+            if os.path.exists(self._path(LOG_FILE)):
+                self._log_size = os.path.getsize(self._path(LOG_FILE))
+                self._first_record = time.time() if self._log_size else None
+        return count
+
+    def _read(self, file: str):
+        path = self._path(file)
+        if not os.path.exists(path):
+            return
+        with open(path, "rb") as f:
+            data = f.read()
+        pos = 0
+        while pos + _HEADER.size <= len(data):
+            length, crc = _HEADER.unpack_from(data, pos)
+            payload = data[pos + _HEADER.size : pos + _HEADER.size + length]
+            if len(payload) < length or zlib.crc32(payload) != crc:
+                break
+            yield pickle.loads(payload)
+            pos += _HEADER.size + length
+        if pos < len(data):
+            # torn write from a crash, drop the incomplete tail
+            PrintStyle.warning(f"Discarding incomplete memory log record in {path}")
+            with open(path, "r+b") as f:
+                f.truncate(pos)
+
+    # compaction
+
+    def needs_compaction(self) -> bool:
+        if self._compacting or not self._log_size:
+            return False
+        if self._log_size >= COMPACT_SIZE:
+            return True
+        return bool(
+            self._first_record and time.time() - self._first_record >= COMPACT_INTERVAL
+        )
+
+    def snapshot(self, db: "MyFaiss", background: bool = True):
+        """Write the current DB state as a new snapshot and drop the logs it covers."""
+        if not background and self._thread and self._thread.is_alive():
+            self._thread.join()
+        with self.lock:
+            if self._compacting:
+                return
+            self._compacting = True
+            try:
+                # capture state, the heavy serialization happens outside of the lock
+                index_bytes = faiss.serialize_index(db.index)
+                docstore = dict(db.docstore._dict)  # type: ignore
+                index_to_id = dict(db.index_to_docstore_id)
+                segments = self._rotate()
+            except Exception:
+                self._compacting = False
+                raise
+
+        if background:
+            self._thread = threading.Thread(
+                target=self._write_snapshot,
+                args=(index_bytes, docstore, index_to_id, segments),
+                daemon=True,
+                name="MemoryCompaction",
+            )
+            self._thread.start()
+        else:
+            self._write_snapshot(index_bytes, docstore, index_to_id, segments)
+
+    def _write_snapshot(
+        self,
+        index_bytes: Any,
+        docstore: dict[str, Document],
+        index_to_id: dict[int, str],
+        segments: list[str],
+    ):
+        try:
+            self._write_file(INDEX_FILE + TMP_SUFFIX, index_bytes.tobytes())
+            self._write_file(
+                DOCSTORE_FILE + TMP_SUFFIX,
+                pickle.dumps((InMemoryDocstore(docstore), index_to_id)),
+            )
+            # from here on the new snapshot is complete and will be swapped in even after a crash
+            self._write_file(COMMIT_MARKER, json.dumps(segments).encode("utf-8"))
+            self._commit(segments)
+        except Exception as e:
+            PrintStyle.error(f"Failed to write memory snapshot in {self.db_dir}: {e}")
+        finally:
+            self._compacting = False
+
+    def _commit(self, segments: list[str]):
+        for file in (DOCSTORE_FILE, INDEX_FILE):
+            if os.path.exists(self._path(file + TMP_SUFFIX)):
+                os.replace(self._path(file + TMP_SUFFIX), self._path(file))
+        for segment in segments:
+            if os.path.exists(self._path(segment)):
+                os.remove(self._path(segment))
+        if os.path.exists(self._path(COMMIT_MARKER)):
+            os.remove(self._path(COMMIT_MARKER))
+
+    def _rotate(self) -> list[str]:
+        # move the active log aside, it is covered by the snapshot being taken
+        if os.path.exists(self._path(LOG_FILE)):
+            os.replace(
+                self._path(LOG_FILE),
+                self._path(f"{SEGMENT_PREFIX}{time.time_ns()}{SEGMENT_SUFFIX}"),
+            )
+        self._log_size = 0
+        self._first_record = None
+        return self._segments()
+
+    def _segments(self) -> list[str]:
+        segments = [
+            file
+            for file in os.listdir(self.db_dir)
+            if file.startswith(SEGMENT_PREFIX)
+            and file.endswith(SEGMENT_SUFFIX)
+            and file != LOG_FILE
+        ]
+        return sorted(segments, key=lambda s: int(s[len(SEGMENT_PREFIX) : -len(SEGMENT_SUFFIX)]))
+
+    def _write_file(self, file: str, data: bytes):
+        with open(self._path(file), "wb") as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+
+    def _path(self, file: str) -> str:
+        return os.path.join(self.db_dir, file)
@@ -0,0 +1,340 @@
+import ast
+import bisect
+import operator
+import threading
+from datetime import datetime
+from functools import lru_cache
+from typing import Any, Callable, Iterable
+
+from langchain_core.documents import Document
+from simpleeval import NameNotDefined, simple_eval
+
+# Typed lookup tables over document metadata and a compiler for the filter
+# conditions used by memory and vector DB searches ("area == 'main' and ...").
+# A compiled filter evaluates with the semantics of simple_eval(condition,
+# names=metadata), and can narrow the documents to check by index lookups.
+
+MEMORY_FIELDS = ("area", "knowledge_source", "source_file", "id")
+MEMORY_RANGE_FIELDS = ("timestamp",)
+
+_COMPARE_OPS: dict[type, Callable[[Any, Any], Any]] = {
+    ast.Eq: operator.eq,
+    ast.NotEq: operator.ne,
+    ast.Lt: operator.lt,
+    ast.LtE: operator.le,
+    ast.Gt: operator.gt,
+    ast.GtE: operator.ge,
+    ast.In: lambda a, b: a in b,
+    ast.NotIn: lambda a, b: a not in b,
+    ast.Is: operator.is_,
+    ast.IsNot: operator.is_not,
+}
+
+_MIRRORED_OPS: dict[type, type] = {
+    ast.Eq: ast.Eq,
+    ast.NotEq: ast.NotEq,
+    ast.Lt: ast.Gt,
+    ast.LtE: ast.GtE,
+    ast.Gt: ast.Lt,
+    ast.GtE: ast.LtE,
+}
+
+
+class MetadataIndex:
+    """Value -> document ids lookup for selected metadata fields.
+
+    Equality fields map each value to the ids having it, range fields keep a
+    sorted list of (datetime, id). Values that cannot be indexed (unhashable,
+    unparsable dates) are tracked per field and always returned as candidates.
+    """
+
+    def __init__(
+        self,
+        fields: Iterable[str] = MEMORY_FIELDS,
+        range_fields: Iterable[str] = MEMORY_RANGE_FIELDS,
+        docs: dict[str, Document] | None = None,
+    ):
+        self.fields = tuple(fields)
+        self.range_fields = tuple(range_fields)
+        self._lock = threading.Lock()
+        self._values: dict[str, dict[Any, set[str]]] = {f: {} for f in self.fields}
+        self._ranges: dict[str, list[tuple[datetime, str]]] = {f: [] for f in self.range_fields}
+        self._unindexed: dict[str, set[str]] = {f: set() for f in self.fields + self.range_fields}
+        self._docs: dict[str, dict[str, Any]] = {}  # id -> indexed values, for removal
+        if docs:
+            self.add(docs.items())
+
+    def add(self, docs: Iterable[tuple[str, Document]]):
+        with self._lock:
+            for id, doc in docs:
+                if id in self._docs:
+                    self._remove(id)
+                self._add(id, doc.metadata)
+
+    def remove(self, ids: Iterable[str]):
+        with self._lock:
+            for id in ids:
+                self._remove(id)
+
+    def _add(self, id: str, metadata: dict):
+        values = {}
+        for field in self.fields:
+            if field not in metadata:
+                continue
+            value = values[field] = metadata[field]
+            try:
+                self._values[field].setdefault(value, set()).add(id)
+            except TypeError:
+                self._unindexed[field].add(id)
+        for field in self.range_fields:
+            if field not in metadata:
+                continue
+            value = values[field] = _to_datetime(metadata[field])
+            if value is None:
+                self._unindexed[field].add(id)
+            else:
+                bisect.insort(self._ranges[field], (value, id))
+        self._docs[id] = values
+
+    def _remove(self, id: str):
+        values = self._docs.pop(id, None)
+        if values is None:
+            return
+        for field, value in values.items():
+            self._unindexed[field].discard(id)
+            if field in self._values:
+                try:
+                    ids = self._values[field].get(value)
+                except TypeError:
+                    continue
+                if ids is not None:
+                    ids.discard(id)
+                    if not ids:
+                        del self._values[field][value]
+            elif value is not None:
+                entries = self._ranges[field]
+                i = bisect.bisect_left(entries, (value, id))
+                if i < len(entries) and entries[i] == (value, id):
+                    del entries[i]
+
+    # lookups, all return new sets
+
+    def all(self) -> set[str]:
+        with self._lock:
+            return set(self._docs)
+
+    def has_field(self, field: str) -> bool:
+        return field in self._values or field in self._ranges
+
+    def lookup(self, field: str, values: Iterable[Any]) -> set[str]:
+        with self._lock:
+            result = set(self._unindexed[field])
+            for value in values:
+                try:
+                    result |= self._values[field].get(value, set())
+                except TypeError:
+                    return set(self._docs)  # unhashable constant, no narrowing
+            return result
+
+    def lookup_truthy(self, field: str) -> set[str]:
+        with self._lock:
+            result = set(self._unindexed[field])
+            for value, ids in self._values[field].items():
+                if value:
+                    result |= ids
+            return result
+
+    def lookup_present(self, field: str) -> set[str]:
+        with self._lock:
+            return {id for id, values in self._docs.items() if field in values}
+
+    def lookup_range(self, field: str, low: datetime | None, high: datetime | None) -> set[str]:
+        """Ids with low <= value <= high, plus unindexed ones"""
+        with self._lock:
+            entries = self._ranges[field]
+            start = bisect.bisect_left(entries, (low,)) if low else 0
+            end = bisect.bisect_right(entries, (high, "\uffff")) if high else len(entries)
+            result = {id for _, id in entries[start:end]}
+            return result | self._unindexed[field]
+
+
+class MetadataFilter:
+    """A filter condition compiled from its source string"""
+
+    def __init__(self, condition: str):
+        self.condition = condition
+        try:
+            tree = ast.parse(condition.strip(), mode="eval").body
+        except SyntaxError:
+            tree = None
+        if tree is None:
+            self._evaluate = lambda data: simple_eval(condition, names=data)
+            self._plan = None
+        else:
+            self._evaluate = _compile(tree)
+            self._plan = tree
+
+    def evaluate(self, metadata: dict[str, Any]) -> Any:
+        """Result of the condition, raises like simple_eval does (e.g. for missing names)"""
+        return self._evaluate(metadata)
+
+    def candidates(self, index: MetadataIndex) -> set[str] | None:
+        """Superset of the ids matching the condition, None if the index cannot narrow it"""
+        if self._plan is None:
+            return None
+        return _plan(self._plan, index)
+
+
+@lru_cache(maxsize=256)
+def compile_filter(condition: str) -> MetadataFilter:
+    return MetadataFilter(condition)
+
+
+def get_comparator(
+    condition: str,
+    candidates: set[str] | None = None,
+    on_error: Callable[[Exception], None] | None = None,
+) -> Callable[[dict[str, Any]], bool]:
+    """Metadata predicate for FAISS searches, documents outside candidates are rejected without evaluation"""
+    metadata_filter = compile_filter(condition)
+
+    def comparator(data: dict[str, Any]):
+        if candidates is not None and data.get("id", None) not in candidates and "id" in data:
+            return False
+        try:
+            return metadata_filter.evaluate(data)
+        except Exception as e:
+            if on_error:
+                on_error(e)
+            return False
+
+    return comparator
+
+
+def _to_datetime(value: Any) -> datetime | None:
+    if isinstance(value, datetime):
+        return value.replace(tzinfo=None)
+    if isinstance(value, str):
+        try:
+            return datetime.fromisoformat(value).replace(tzinfo=None)
+        except ValueError:
+            return None
+    return None
+
+
+# compiler, supported nodes are translated to closures, anything else is left to simple_eval
+
+
+def _compile(node: ast.expr) -> Callable[[dict[str, Any]], Any]:
+    if isinstance(node, ast.Constant):
+        value = node.value
+        return lambda data: value
+
+    if isinstance(node, ast.Name):
+        name = node.id
+
+        def get_name(data):
+            if name in data:
+                return data[name]
+            raise NameNotDefined(name, name)
+
+        return get_name
+
+    if isinstance(node, (ast.List, ast.Tuple, ast.Set)) and all(
+        isinstance(e, ast.Constant) for e in node.elts
+    ):
+        values = [e.value for e in node.elts]  # type: ignore
+        container = set(values) if isinstance(node, ast.Set) else (
+            tuple(values) if isinstance(node, ast.Tuple) else values
+        )
+        return lambda data: container
+
+    if isinstance(node, ast.BoolOp):
+        parts = [_compile(v) for v in node.values]
+        if isinstance(node.op, ast.And):
+
+            def and_(data):
+                result = True
+                for part in parts:
+                    result = part(data)
+                    if not result:
+                        return result
+                return result
+
+            return and_
+
+        def or_(data):
+            result = False
+            for part in parts:
+                result = part(data)
+                if result:
+                    return result
+            return result
+
+        return or_
+
+    if isinstance(node, ast.UnaryOp) and isinstance(node.op, ast.Not):
+        operand = _compile(node.operand)
+        return lambda data: not operand(data)
+
+    if (
+        isinstance(node, ast.Compare)
+        and len(node.ops) == 1
+        and type(node.ops[0]) in _COMPARE_OPS
+    ):
+        left, right = _compile(node.left), _compile(node.comparators[0])
+        op = _COMPARE_OPS[type(node.ops[0])]
+        return lambda data: op(left(data), right(data))
+
+    source = ast.unparse(node)
+    return lambda data: simple_eval(source, names=data)
+
+
+def _plan(node: ast.expr, index: MetadataIndex) -> set[str] | None:
+    if isinstance(node, ast.BoolOp):
+        results = [_plan(v, index) for v in node.values]
+        if isinstance(node.op, ast.And):
+            narrowed = [r for r in results if r is not None]
+            if not narrowed:
+                return None
+            return set.intersection(*sorted(narrowed, key=len))
+        if any(r is None for r in results):
+            return None
+        return set().union(*results)  # type: ignore
+
+    if isinstance(node, ast.Name) and node.id in index.fields:
+        return index.lookup_truthy(node.id)
+
+    if isinstance(node, ast.Compare) and len(node.ops) == 1:
+        left, op, right = node.left, type(node.ops[0]), node.comparators[0]
+        if isinstance(right, ast.Name) and isinstance(left, ast.Constant) and op in _MIRRORED_OPS:
+            left, right, op = right, left, _MIRRORED_OPS[op]
+        if not isinstance(left, ast.Name) or not index.has_field(left.id):
+            return None
+        field = left.id
+
+        if field in index.fields:
+            if op is ast.Eq and isinstance(right, ast.Constant):
+                return index.lookup(field, [right.value])
+            if op is ast.In and isinstance(right, (ast.List, ast.Tuple, ast.Set)) and all(
+                isinstance(e, ast.Constant) for e in right.elts
+            ):
+                return index.lookup(field, [e.value for e in right.elts])  # type: ignore
+            if op is ast.NotEq:
+                return index.lookup_present(field)  # missing names fail the condition
+            return None
+
+        if isinstance(right, ast.Constant):
+            value = _to_datetime(right.value)
+            if value is None:
+                return None
+            # bounds are inclusive, the exact condition is checked on the candidates
+            if op in (ast.Gt, ast.GtE):
+                return index.lookup_range(field, value, None)
+            if op in (ast.Lt, ast.LtE):
+                return index.lookup_range(field, None, value)
+            if op is ast.Eq:
+                return index.lookup_range(field, value, value)
+        return None
+
+    return None
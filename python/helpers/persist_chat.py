@@ -1,17 +1,34 @@
+import atexit
 from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
 from datetime import datetime
-from typing import Any
+import os
+import threading
+import time
+from typing import Any, Callable
 import uuid
 from agent import Agent, AgentConfig, AgentContext, AgentContextType
-from python.helpers import files, history
+from python.helpers import files, history, state_monitor
 import json
 from initialize import initialize_agent
 
+from python.helpers.localization import Localization
 from python.helpers.log import Log, LogItem
+from python.helpers.print_style import PrintStyle
+from python.helpers.strings import sanitize_string
 
 CHATS_FOLDER = "tmp/chats"
 LOG_SIZE = 1000
 CHAT_FILE_NAME = "chat.json"
+META_FILE_NAME = "meta.json"  # id, name, timestamps and data of the chat, read at startup
+SEGMENT_FILE_NAME = "chat.{}.log"  # changes appended since the chat.json with the same segment number
+
+SAVE_DELAY = 1.0  # seconds, saves of one chat within this window are written together
+COMPACT_SIZE = 2 * 1024 * 1024  # rewrite chat.json once the change log grows past this many bytes
+
+LOAD_WORKERS = min(os.cpu_count() or 1, 4)  # threads reading and restoring chats
+PRELOAD_CHATS = 3  # most recent chats restored in the background after startup
 
 
 def get_chat_folder_path(ctxid: str):
@@ -29,46 +46,489 @@ def get_chat_folder_path(ctxid: str):
 def get_chat_msg_files_folder(ctxid: str):
     return files.get_abs_path(get_chat_folder_path(ctxid), "messages")
 
+@dataclass
+class _AgentState:
+    history_id: int
+    current_id: int
+    revision: int
+    messages: int
+    counter: int
+    data: str
+
+
+@dataclass
+class _ChatState:
+    segment: int = 0
+    segment_size: int = 0
+    log_guid: str = ""
+    log_version: int = 0
+    context: str = ""
+    agents: dict[int, _AgentState] = field(default_factory=dict)
+    ops: list[tuple[str, int, str]] = field(default_factory=list)  # ("snapshot"|"append", segment, text)
+    due: float = 0.0
+
+
+_states: dict[str, _ChatState] = {}
+_states_lock = threading.Condition()  # guards _states and wakes the writer
+_write_lock = threading.Lock()  # held while files are written, so removal never races a write
+_writer: threading.Thread | None = None
+
+
 def save_tmp_chat(context: AgentContext):
-    """Save context to the chats folder"""
+    """Save context to the chats folder.
+
+    Only what changed since the previous save is collected (new history messages,
+    updated log items, small metadata) and appended to the chat's change log by a
+    background writer, coalescing saves within SAVE_DELAY. Once the log grows past
+    COMPACT_SIZE or when the log was reset, a full chat.json is written instead
+    and starts a new log. A restructured history (new topic, compression) is
+    appended whole for that agent.
+    """
     # Skip saving BACKGROUND contexts as they should be ephemeral
     if context.type == AgentContextType.BACKGROUND:
         return
 
-    path = _get_chat_file_path(context.id)
-    files.make_dirs(path)
-    data = _serialize_context(context)
-    js = _safe_json_serialize(data, ensure_ascii=False)
-    files.write_file(path, js)
+    with _states_lock:
+        state = _states.setdefault(context.id, _ChatState())
+        records = _collect_changes(context, state) if state.segment else None
+        if records is None or state.segment_size >= COMPACT_SIZE:
+            # full snapshot, serialized here as the context keeps changing on its loop
+            state.segment = time.time_ns()
+            state.segment_size = 0
+            data = _serialize_context(context)
+            data["log_segment"] = state.segment
+            _track_state(context, state)
+            state.ops = [("snapshot", state.segment, _safe_json_serialize(data, ensure_ascii=False))]
+        elif records:
+            text = "".join(_safe_json_serialize(r, ensure_ascii=False) + "\n" for r in records)
+            state.segment_size += len(text)
+            state.ops.append(("append", state.segment, text))
+        else:
+            return
+
+        if records is None or any(r["t"] == "context" for r in records):
+            meta = _serialize_chat_meta(context)
+            state.ops.append(("meta", state.segment, _safe_json_serialize(meta, ensure_ascii=False)))
+
+        if not state.due:
+            state.due = time.monotonic() + SAVE_DELAY
+        _start_writer()
+        _states_lock.notify_all()
 
 
 def save_tmp_chats():
     """Save all contexts to the chats folder"""
-    for _, context in AgentContext._contexts.items():
+    for context in AgentContext.all():
         # Skip BACKGROUND contexts as they should be ephemeral
         if context.type == AgentContextType.BACKGROUND:
             continue
+        # and chats still being restored, their agents are not in place yet
+        if is_unloaded(context.id):
+            continue
         save_tmp_chat(context)
+    flush_tmp_chats()
+
+
+def flush_tmp_chats():
+    """Write all pending saves now"""
+    with _write_lock:
+        with _states_lock:
+            batch = _take_ops(force=True)
+        _write_batch(batch)
+
+
+atexit.register(flush_tmp_chats)
+
+
+def _collect_changes(context: AgentContext, state: _ChatState) -> list[dict] | None:
+    """Records describing changes since the last save, None if a full snapshot is needed."""
+    log = context.log
+    if log.guid != state.log_guid or len(log.updates) < state.log_version:
+        return None  # log was reset
+
+    records: list[dict] = []
+
+    # context metadata, written only when it changed
+    meta = _get_context_record(context)
+    meta_text = _safe_json_serialize(meta, ensure_ascii=False)
+    if meta_text != state.context:
+        records.append(meta)
+        state.context = meta_text
+
+    agents: dict[int, _AgentState] = {}
+    for agent in _get_agents(context):
+        prev = state.agents.get(agent.number)
+        hist = agent.history
+        data = {k: v for k, v in agent.data.items() if not k.startswith("_")}
+        data_text = _safe_json_serialize(data, ensure_ascii=False)
+        if not prev or prev.data != data_text:
+            records.append({"t": "agent", "number": agent.number, "data": data})
+
+        if (
+            prev
+            and prev.history_id == id(hist)
+            and prev.current_id == id(hist.current)
+            and prev.revision == hist.revision
+            and prev.messages <= len(hist.current.messages)
+        ):
+            # only messages were appended to the current topic
+            new = hist.current.messages[prev.messages :]
+            if new or prev.counter != hist.counter:
+                records.append(
+                    {
+                        "t": "messages",
+                        "number": agent.number,
+                        "counter": hist.counter,
+                        "messages": [m.to_dict() for m in new],
+                    }
+                )
+        else:
+            records.append(
+                {"t": "history", "number": agent.number, "history": hist.serialize()}
+            )
+        agents[agent.number] = _get_agent_state(agent, data_text)
+    state.agents = agents
+
+    # log items updated since the last save
+    nos = list(dict.fromkeys(log.updates[state.log_version :]))
+    if nos:
+        records.append(
+            {
+                "t": "log",
+                "progress": log.progress,
+                "progress_no": log.progress_no,
+                "items": [log.logs[no].output() for no in nos],
+            }
+        )
+    state.log_version = len(log.updates)
+
+    return records
+
+
+def _track_state(context: AgentContext, state: _ChatState):
+    state.log_guid = context.log.guid
+    state.log_version = len(context.log.updates)
+    state.context = _safe_json_serialize(_get_context_record(context), ensure_ascii=False)
+    state.agents = {
+        agent.number: _get_agent_state(
+            agent,
+            _safe_json_serialize(
+                {k: v for k, v in agent.data.items() if not k.startswith("_")},
+                ensure_ascii=False,
+            ),
+        )
+        for agent in _get_agents(context)
+    }
+
+
+def _get_context_record(context: AgentContext) -> dict:
+    return {
+        "t": "context",
+        **_serialize_context_meta(context),
+        "agents": [agent.number for agent in _get_agents(context)],
+    }
+
+
+def _get_agent_state(agent: Agent, data_text: str) -> _AgentState:
+    hist = agent.history
+    return _AgentState(
+        history_id=id(hist),
+        current_id=id(hist.current),
+        revision=hist.revision,
+        messages=len(hist.current.messages),
+        counter=hist.counter,
+        data=data_text,
+    )
+
+
+def _get_agents(context: AgentContext) -> list[Agent]:
+    agents = []
+    agent = context.agent0
+    while agent:
+        agents.append(agent)
+        agent = agent.data.get(Agent.DATA_NAME_SUBORDINATE, None)
+    return agents
+
+
+def _start_writer():
+    global _writer
+    if _writer is None or not _writer.is_alive():
+        _writer = threading.Thread(target=_writer_loop, daemon=True, name="ChatPersistence")
+        _writer.start()
+
+
+def _writer_loop():
+    while True:
+        with _states_lock:
+            while True:
+                dues = [s.due for s in _states.values() if s.ops]
+                if not dues:
+                    _states_lock.wait()
+                    continue
+                wait = min(dues) - time.monotonic()
+                if wait <= 0:
+                    break
+                _states_lock.wait(wait)
+        with _write_lock:
+            with _states_lock:
+                batch = _take_ops(force=False)
+            _write_batch(batch)
+
+
+def _take_ops(force: bool) -> list[tuple[str, list[tuple[str, int, str]]]]:
+    now = time.monotonic()
+    batch = []
+    for ctxid, state in _states.items():
+        if state.ops and (force or state.due <= now):
+            batch.append((ctxid, state.ops))
+            state.ops = []
+            state.due = 0.0
+    return batch
+
+
+def _write_batch(batch: list[tuple[str, list[tuple[str, int, str]]]]):
+    for ctxid, ops in batch:
+        try:
+            _write_ops(ctxid, ops)
+        except Exception as e:
+            PrintStyle.error(f"Failed to save chat {ctxid}: {e}")
+
+
+def _write_ops(ctxid: str, ops: list[tuple[str, int, str]]):
+    # a snapshot supersedes everything queued before it
+    for i in range(len(ops) - 1, -1, -1):
+        if ops[i][0] == "snapshot":
+            ops = ops[i:]
+            break
+
+    folder = get_chat_folder_path(ctxid)
+    os.makedirs(folder, exist_ok=True)
+    appends: dict[int, list[str]] = {}
+    meta = None
+    for kind, segment, text in ops:
+        if kind == "meta":
+            meta = text
+        elif kind == "snapshot":
+            path = _get_chat_file_path(ctxid)
+            files.write_file(path + ".tmp", text)
+            os.replace(path + ".tmp", path)
+            # older change logs are covered by the new chat.json
+            for file in _list_segments(ctxid):
+                if _get_segment_no(file) != segment:
+                    os.remove(os.path.join(folder, file))
+        else:
+            appends.setdefault(segment, []).append(text)
+
+    for segment, texts in appends.items():
+        with open(
+            os.path.join(folder, SEGMENT_FILE_NAME.format(segment)), "a", encoding="utf-8"
+        ) as f:
+            f.write(sanitize_string("".join(texts)))
+
+    if meta:
+        path = os.path.join(folder, META_FILE_NAME)
+        files.write_file(path + ".tmp", meta)
+        os.replace(path + ".tmp", path)
+
+
+def _list_segments(ctxid: str) -> list[str]:
+    return files.list_files(get_chat_folder_path(ctxid), SEGMENT_FILE_NAME.format("*"))
+
+
+def _get_segment_no(file: str) -> int:
+    try:
+        return int(file.split(".")[1])
+    except (IndexError, ValueError):
+        return 0
+
+
+def _read_chat(ctxid: str) -> dict:
+    """Read chat.json and replay the change log written after it"""
+    data = json.loads(files.read_file(_get_chat_file_path(ctxid)))
+    segment = data.pop("log_segment", None)
+    if segment is None:
+        return data
+    path = os.path.join(get_chat_folder_path(ctxid), SEGMENT_FILE_NAME.format(segment))
+    if not os.path.exists(path):
+        return data
+
+    agents: dict[int, dict] = {a["number"]: a for a in data.get("agents", [])}
+    histories: dict[int, dict] = {}  # parsed histories of agents receiving messages
+    log = data.setdefault("log", {})
+    items: list[dict] = log.setdefault("logs", [])
+    offset = items[0]["no"] if items else 0
+
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                break  # torn write at the end of the log
+            kind = record.pop("t")
+            if kind == "context":
+                numbers = record.pop("agents")
+                data.update(record)
+                agents = {
+                    n: agents.get(n, {"number": n, "data": {}, "history": ""})
+                    for n in numbers
+                }
+            elif kind == "agent":
+                agents.setdefault(
+                    record["number"], {"number": record["number"], "history": ""}
+                )["data"] = record["data"]
+            elif kind == "history":
+                agents.setdefault(record["number"], {"number": record["number"], "data": {}})[
+                    "history"
+                ] = record["history"]
+                histories.pop(record["number"], None)
+            elif kind == "messages":
+                number = record["number"]
+                if number not in histories:
+                    serialized = agents.get(number, {}).get("history", "")
+                    histories[number] = (
+                        json.loads(serialized) if serialized else _empty_history()
+                    )
+                hist = histories[number]
+                hist["counter"] = record["counter"]
+                hist["current"]["messages"].extend(record["messages"])
+            elif kind == "log":
+                log["progress"] = record["progress"]
+                log["progress_no"] = record["progress_no"]
+                for item in record["items"]:
+                    index = item["no"] - offset
+                    if 0 <= index < len(items):
+                        items[index] = item
+                    elif index == len(items):
+                        items.append(item)
+
+    for number, hist in histories.items():
+        if number in agents:
+            agents[number]["history"] = json.dumps(hist, ensure_ascii=False)
+    data["agents"] = list(agents.values())
+    log["logs"] = items[-LOG_SIZE:]
+    return data
+
+
+def _empty_history() -> dict:
+    return {
+        "_cls": "History",
+        "counter": 0,
+        "bulks": [],
+        "topics": [],
+        "current": {"_cls": "Topic", "summary": "", "messages": []},
+    }
+
+
+_unloaded: dict[str, dict] = {}  # ctxid -> metadata of saved chats not restored yet
+_load_locks: dict[str, threading.RLock] = {}  # reentrant, a chat being restored may look itself up
+_load_locks_lock = threading.Lock()
+_load_pool = ThreadPoolExecutor(max_workers=LOAD_WORKERS, thread_name_prefix="ChatLoad")
 
 
 def load_tmp_chats():
-    """Load all contexts from the chats folder"""
+    """Register all chats from the chats folder.
+
+    Only the chat metadata is read here, enough for the chat list. A chat is fully
+    restored by load_tmp_chat on first access through AgentContext.get; the most
+    recent ones are restored right away in the background.
+    """
     _convert_v080_chats()
     folders = files.list_files(CHATS_FOLDER, "*")
-    json_files = []
-    for folder_name in folders:
-        json_files.append(_get_chat_file_path(folder_name))
 
     ctxids = []
-    for file in json_files:
+    for folder_name, meta in zip(folders, _load_pool.map(_read_chat_meta, folders)):
+        if meta and not AgentContext._contexts.get(folder_name):
+            _unloaded[folder_name] = meta
+            ctxids.append(folder_name)
+    state_monitor.mark_dirty()
+
+    recent = sorted(ctxids, key=lambda id: _unloaded[id].get("last_message", ""), reverse=True)
+    for ctxid in recent[:PRELOAD_CHATS]:
+        _load_pool.submit(load_tmp_chat, ctxid)
+    return ctxids
+
+
+def load_tmp_chat(ctxid: str) -> AgentContext | None:
+    """Restore a saved chat registered by load_tmp_chats, None if there is no such chat"""
+    if ctxid not in _unloaded:
+        return AgentContext._contexts.get(ctxid)  # restored meanwhile or never saved
+    with _load_locks_lock:
+        lock = _load_locks.setdefault(ctxid, threading.RLock())
+    with lock:
+        context = AgentContext._contexts.get(ctxid)
+        if context or ctxid not in _unloaded:
+            return context  # restored by another thread meanwhile
         try:
-            js = files.read_file(file)
-            data = json.loads(js)
-            ctx = _deserialize_context(data)
-            ctxids.append(ctx.id)
+            context = _deserialize_context(_read_chat(ctxid))
         except Exception as e:
-            print(f"Error loading chat {file}: {e}")
-    return ctxids
+            PrintStyle.error(f"Error loading chat {ctxid}: {e}")
+        finally:
+            _unloaded.pop(ctxid, None)
+            with _load_locks_lock:
+                _load_locks.pop(ctxid, None)
+        return context
+
+
+def get_unloaded_chats() -> list[dict]:
+    """Chats not restored yet, in the format of AgentContext.output"""
+    localization = Localization.get()
+    chats = []
+    for meta in list(_unloaded.values()):
+        chats.append(
+            {
+                "id": meta["id"],
+                "name": meta.get("name"),
+                "created_at": localization.serialize_datetime(
+                    datetime.fromisoformat(meta["created_at"])
+                ),
+                "no": 0,
+                "log_guid": meta.get("log_guid", ""),
+                "log_version": 0,
+                "log_length": 0,
+                "paused": False,
+                "last_message": localization.serialize_datetime(
+                    datetime.fromisoformat(meta["last_message"])
+                ),
+                "type": meta.get("type", AgentContextType.USER.value),
+                **meta.get("output_data", {}),
+            }
+        )
+    return chats
+
+
+def get_unloaded_chat_ids() -> list[str]:
+    return list(_unloaded.keys())
+
+
+def is_unloaded(ctxid: str) -> bool:
+    """True until a saved chat is restored, including while it is being restored"""
+    return ctxid in _unloaded
+
+
+def load_tmp_chats_where(predicate: Callable[[dict], bool]) -> list[AgentContext]:
+    """Restore the chats not loaded yet whose metadata matches the predicate"""
+    ctxids = [id for id, meta in list(_unloaded.items()) if predicate(meta)]
+    return [ctx for ctx in _load_pool.map(load_tmp_chat, ctxids) if ctx]
+
+
+def _read_chat_meta(ctxid: str) -> dict | None:
+    try:
+        path = os.path.join(get_chat_folder_path(ctxid), META_FILE_NAME)
+        if os.path.exists(path):
+            return json.loads(files.read_file(path))
+
+        # chats saved by older versions, read once and write the metadata file for the next start
+        data = _read_chat(ctxid)
+        meta = {k: v for k, v in data.items() if k not in ("agents", "log", "streaming_agent")}
+        meta["id"] = ctxid
+        meta["log_guid"] = data.get("log", {}).get("guid", "")
+        meta.setdefault("created_at", datetime.fromtimestamp(0).isoformat())
+        meta.setdefault("last_message", datetime.fromtimestamp(0).isoformat())
+        files.write_file(path, _safe_json_serialize(meta, ensure_ascii=False))
+        return meta
+    except Exception as e:
+        PrintStyle.error(f"Error loading chat {ctxid}: {e}")
+        return None
 
 
 def _get_chat_file_path(ctxid: str):
@@ -105,8 +565,13 @@ def export_json_chat(context: AgentContext):
 
 def remove_chat(ctxid):
     """Remove a chat or task context"""
-    path = get_chat_folder_path(ctxid)
-    files.delete_dir(path)
+    # drop pending saves first, so the writer does not recreate the folder
+    with _write_lock:
+        with _states_lock:
+            _states.pop(ctxid, None)
+        _unloaded.pop(ctxid, None)
+        path = get_chat_folder_path(ctxid)
+        files.delete_dir(path)
 
 
 def remove_msg_files(ctxid):
@@ -117,13 +582,23 @@ def remove_msg_files(ctxid):
 
 def _serialize_context(context: AgentContext):
     # serialize agents
-    agents = []
-    agent = context.agent0
-    while agent:
-        agents.append(_serialize_agent(agent))
-        agent = agent.data.get(Agent.DATA_NAME_SUBORDINATE, None)
+    agents = [_serialize_agent(agent) for agent in _get_agents(context)]
+
+    return {
+        **_serialize_context_meta(context),
+        "agents": agents,
+        "log": _serialize_log(context.log),
+    }
 
 
+def _serialize_chat_meta(context: AgentContext):
+    return {
+        **_serialize_context_meta(context),
+        "log_guid": context.log.guid,
+    }
+
+
+def _serialize_context_meta(context: AgentContext):
     data = {k: v for k, v in context.data.items() if not k.startswith("_")}
     output_data = {k: v for k, v in context.output_data.items() if not k.startswith("_")}
 
@@ -141,11 +616,9 @@ def _serialize_context(context: AgentContext):
             if context.last_message
             else datetime.fromtimestamp(0).isoformat()
         ),
-        "agents": agents,
         "streaming_agent": (
             context.streaming_agent.number if context.streaming_agent else 0
         ),
-        "log": _serialize_log(context.log),
         "data": data,
         "output_data": output_data,
     }
@@ -1,4 +1,6 @@
 import os
+import threading
+from collections import OrderedDict
 from typing import Literal, TypedDict, TYPE_CHECKING
 
 from python.helpers import files, dirty_json, persist_chat, file_tree
@@ -257,6 +259,10 @@ def deactivate_project(context_id: str):
 def reactivate_project_in_chats(name: str):
     from agent import AgentContext
 
+    # chats not restored since startup are restored first
+    persist_chat.load_tmp_chats_where(
+        lambda meta: meta.get("data", {}).get(CONTEXT_DATA_KEY_PROJECT) == name
+    )
     for context in AgentContext.all():
         if context.get_data(CONTEXT_DATA_KEY_PROJECT) == name:
             activate_project(context.id, name)
@@ -266,6 +272,10 @@ def reactivate_project_in_chats(name: str):
 def deactivate_project_in_chats(name: str):
     from agent import AgentContext
 
+    # chats not restored since startup are restored first
+    persist_chat.load_tmp_chats_where(
+        lambda meta: meta.get("data", {}).get(CONTEXT_DATA_KEY_PROJECT) == name
+    )
     for context in AgentContext.all():
         if context.get_data(CONTEXT_DATA_KEY_PROJECT) == name:
             deactivate_project(context.id)
@@ -290,6 +300,25 @@ def build_system_prompt_vars(name: str):
     }
 
 
+def get_system_prompt_version(name: str) -> tuple:
+    """Modification times of the files build_system_prompt_vars reads, changes when they change"""
+    header_file = files.get_abs_path(get_project_meta_folder(name), PROJECT_HEADER_FILE)
+    instructions_folder = files.get_abs_path(
+        get_project_folder(name), PROJECT_META_DIR, PROJECT_INSTRUCTIONS_DIR
+    )
+    paths = [header_file, instructions_folder]
+    if os.path.isdir(instructions_folder):
+        paths += [os.path.join(instructions_folder, f) for f in sorted(os.listdir(instructions_folder))]
+    stamp = []
+    for path in paths:
+        try:
+            st = os.stat(path)
+            stamp.append((path, st.st_mtime_ns, st.st_size))
+        except OSError:
+            stamp.append((path, None, None))
+    return tuple(stamp)
+
+
 def get_additional_instructions_files(name: str):
     instructions_folder = files.get_abs_path(
         get_project_folder(name), PROJECT_META_DIR, PROJECT_INSTRUCTIONS_DIR
@@ -358,25 +387,52 @@ def get_knowledge_files_count(name: str):
     )
     return len(files.list_files_in_dir_recursively(knowledge_folder))
 
+FILE_STRUCTURE_CACHE_SIZE = 16  # rendered trees kept, per project and settings
+_file_structures: OrderedDict[tuple, tuple[str, dict[str, int]]] = OrderedDict()
+_file_structures_lock = threading.Lock()
+
+
 def get_file_structure(name: str, basic_data: BasicProjectData|None=None) -> str:
     project_folder = get_project_folder(name)
     if basic_data is None:
         basic_data = load_basic_project_data(name)
-    
+    settings = basic_data["file_structure"]
+    key = (
+        project_folder,
+        settings["max_depth"],
+        settings["max_files"],
+        settings["max_folders"],
+        settings["max_lines"],
+        settings["gitignore"],
+    )
+
+    # the walk is reused until a directory it listed or an entry it sorted changes
+    with _file_structures_lock:
+        cached = _file_structures.get(key)
+        if cached:
+            _file_structures.move_to_end(key)
+    if cached and file_tree.mtimes_unchanged(cached[1]):
+        return cached[0]
+
+    dir_mtimes: dict[str, int] = {}
     tree = str(file_tree.file_tree(
         project_folder,
-        max_depth=basic_data["file_structure"]["max_depth"],
-        max_files=basic_data["file_structure"]["max_files"],
-        max_folders=basic_data["file_structure"]["max_folders"],
-        max_lines=basic_data["file_structure"]["max_lines"],
-        ignore=basic_data["file_structure"]["gitignore"],
-        output_mode=file_tree.OUTPUT_MODE_STRING
+        max_depth=settings["max_depth"],
+        max_files=settings["max_files"],
+        max_folders=settings["max_folders"],
+        max_lines=settings["max_lines"],
+        ignore=settings["gitignore"],
+        output_mode=file_tree.OUTPUT_MODE_STRING,
+        dir_mtimes=dir_mtimes,
     ))
 
     # empty?
     if "\n" not in tree:
         tree += "\n # Empty"
 
+    with _file_structures_lock:
+        _file_structures[key] = (tree, dir_mtimes)
+        _file_structures.move_to_end(key)
+        while len(_file_structures) > FILE_STRUCTURE_CACHE_SIZE:
+            _file_structures.popitem(last=False)
     return tree
-
-    
\ No newline at end of file
@@ -1,57 +1,187 @@
 import asyncio
+import json
+import os
+import threading
 import time
-from typing import Callable, Awaitable
+from collections import deque
+from contextlib import contextmanager
+from typing import Callable, Awaitable, Iterator
+
+try:
+    import fcntl
+except ImportError:  # windows
+    fcntl = None
+
+SHARED_SUPPORTED = fcntl is not None  # file backed limiters can be shared by processes
+MAX_SLEEP = 1.0  # waiting callers re-check at least this often, limits and callbacks may change
+
+
+class _Window:
+    """Amounts added within the timeframe, per key, with running totals"""
+
+    def __init__(self):
+        self.entries: dict[str, deque[tuple[float, float]]] = {}
+        self.totals: dict[str, float] = {}
+
+    def add(self, now: float, amounts: dict[str, float]):
+        for key, value in amounts.items():
+            if not value:
+                continue
+            self.entries.setdefault(key, deque()).append((now, value))
+            self.totals[key] = self.totals.get(key, 0) + value
+
+    def prune(self, cutoff: float):
+        for key, entries in self.entries.items():
+            while entries and entries[0][0] <= cutoff:
+                self.totals[key] -= entries.popleft()[1]
+            if not entries:
+                self.totals[key] = 0
+
+    def get_free_time(self, key: str, limit: float, need: float) -> float:
+        """Time the oldest entries must expire by to have room for need, 0 if there is room"""
+        total = self.totals.get(key, 0)
+        if total + need <= limit or total <= 0:
+            return 0
+        freed = 0
+        for t, value in self.entries[key]:
+            freed += value
+            if total - freed + need <= limit or freed >= total:
+                return t
+        return 0
+
+    def to_json(self) -> str:
+        return json.dumps({key: list(entries) for key, entries in self.entries.items()})
+
+    @classmethod
+    def from_json(cls, text: str) -> "_Window":
+        window = cls()
+        for key, entries in (json.loads(text) if text.strip() else {}).items():
+            window.entries[key] = deque((t, v) for t, v in entries)
+            window.totals[key] = sum(v for _, v in entries)
+        return window
 
 
 class RateLimiter:
-    def __init__(self, seconds: int = 60, **limits: int):
+    """Sliding window limiter of requests, input and output tokens.
+
+    Usage is kept per key with running totals, so checks do not rescan the
+    window. Callers waiting for capacity are served first come first served
+    across all contexts and event loops: only the first one in line checks,
+    sleeping until exactly when enough usage expires from the window.
+
+    With a path the window is kept in that file under an exclusive file lock,
+    so all processes using the same path share one budget (first in line is
+    then only guaranteed within each process).
+    """
+
+    def __init__(self, seconds: int = 60, path: str | None = None, **limits: int):
         self.timeframe = seconds
         self.limits = {key: value if isinstance(value, (int, float)) else 0 for key, value in (limits or {}).items()}
-        self.values = {key: [] for key in self.limits.keys()}
-        self._lock = asyncio.Lock()
+        self.path = path if path and SHARED_SUPPORTED else None
+        self._window = _Window()
+        self._lock = threading.RLock()  # not an asyncio lock, callers come from different event loops
+        self._queue: deque[tuple[asyncio.AbstractEventLoop, asyncio.Event]] = deque()
+
+    @contextmanager
+    def _locked_window(self) -> Iterator[_Window]:
+        with self._lock:
+            if not self.path:
+                self._window.prune(time.time() - self.timeframe)
+                yield self._window
+                return
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            with open(self.path, "a+") as f:
+                fcntl.flock(f, fcntl.LOCK_EX)  # type: ignore
+                try:
+                    f.seek(0)
+                    window = _Window.from_json(f.read())
+                    window.prune(time.time() - self.timeframe)
+                    yield window
+                    f.seek(0)
+                    f.truncate()
+                    f.write(window.to_json())
+                    f.flush()
+                finally:
+                    fcntl.flock(f, fcntl.LOCK_UN)  # type: ignore
 
     def add(self, **kwargs: int):
-        now = time.time()
-        for key, value in kwargs.items():
-            if not key in self.values:
-                self.values[key] = []
-            self.values[key].append((now, value))
+        with self._locked_window() as window:
+            window.add(time.time(), kwargs)
 
     async def cleanup(self):
-        async with self._lock:
-            now = time.time()
-            cutoff = now - self.timeframe
-            for key in self.values:
-                self.values[key] = [(t, v) for t, v in self.values[key] if t > cutoff]
+        with self._locked_window():
+            pass
 
     async def get_total(self, key: str) -> int:
-        async with self._lock:
-            if not key in self.values:
-                return 0
-            return sum(value for _, value in self.values[key])
+        with self._locked_window() as window:
+            return window.totals.get(key, 0)  # type: ignore
+
+    async def acquire(
+        self,
+        callback: Callable[[str, str, int, int], Awaitable[bool]] | None = None,
+        **amounts: int,
+    ):
+        """Wait in line until the amounts fit in the limits, then add them.
+
+        An amount larger than its limit passes once the window is empty. If the
+        callback returns True, the caller stops waiting and adds the amounts anyway.
+        """
+        turn = asyncio.Event()
+        waiter = (asyncio.get_running_loop(), turn)
+        with self._lock:
+            self._queue.append(waiter)
+            if self._queue[0] is waiter:
+                turn.set()
+        try:
+            await turn.wait()
+            while True:
+                with self._locked_window() as window:
+                    now = time.time()
+                    blocked = None
+                    free_at = now
+                    for key, limit in self.limits.items():
+                        if limit <= 0:  # Skip if no limit set
+                            continue
+                        t = window.get_free_time(key, limit, amounts.get(key, 0))
+                        if t:
+                            free_at = max(free_at, t + self.timeframe)
+                            blocked = blocked or (key, int(window.totals.get(key, 0)), limit)
+                    if blocked is None:
+                        window.add(now, amounts)
+                        return
+
+                if callback:
+                    key, total, limit = blocked
+                    msg = f"Rate limit exceeded for {key} ({total}/{limit}), waiting..."
+                    if await callback(msg, key, total, limit):
+                        self.add(**amounts)
+                        return
+
+                await asyncio.sleep(min(max(free_at - time.time(), 0), MAX_SLEEP))
+        finally:
+            self._leave(waiter)
 
     async def wait(
         self,
         callback: Callable[[str, str, int, int], Awaitable[bool]] | None = None,
     ):
-        while True:
-            await self.cleanup()
-            should_wait = False
-
-            for key, limit in self.limits.items():
-                if limit <= 0:  # Skip if no limit set
-                    continue
-
-                total = await self.get_total(key)
-                if total > limit:
-                    if callback:
-                        msg = f"Rate limit exceeded for {key} ({total}/{limit}), waiting..."
-                        should_wait = not await callback(msg, key, total, limit)
-                    else:
-                        should_wait = True
-                    break
-
-            if not should_wait:
-                break
-
-            await asyncio.sleep(1)
+        """Wait in line until the usage already added is within the limits"""
+        await self.acquire(callback)
+
+    def _leave(self, waiter: tuple[asyncio.AbstractEventLoop, asyncio.Event]):
+        with self._lock:
+            was_first = bool(self._queue) and self._queue[0] is waiter
+            try:
+                self._queue.remove(waiter)
+            except ValueError:
+                pass
+            if not was_first:
+                return
+            # hand the turn to the next caller in line, on its own loop
+            while self._queue:
+                loop, turn = self._queue[0]
+                try:
+                    loop.call_soon_threadsafe(turn.set)
+                    return
+                except RuntimeError:
+                    self._queue.popleft()  # loop closed
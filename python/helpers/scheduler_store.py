@@ -0,0 +1,120 @@
+import sqlite3
+import threading
+from contextlib import contextmanager
+from typing import Iterable, Iterator, NamedTuple
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS tasks (
+    uuid TEXT PRIMARY KEY,
+    type TEXT NOT NULL,
+    name TEXT NOT NULL,
+    state TEXT NOT NULL,
+    context_id TEXT,
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS tasks_state ON tasks (state);
+CREATE INDEX IF NOT EXISTS tasks_context_id ON tasks (context_id, state);
+"""
+
+
+class TaskRow(NamedTuple):
+    uuid: str
+    type: str
+    name: str
+    state: str
+    context_id: str | None
+    data: str  # the task as JSON
+
+
+class SchedulerStore:
+    """SQLite storage of scheduler tasks.
+
+    One row per task, the task itself is kept as JSON in the data column and
+    the columns used for lookups are indexed. Writes run in IMMEDIATE
+    transactions, so a read-check-write inside transaction() is atomic across
+    processes sharing the file.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.RLock()
+        self._conn = sqlite3.connect(
+            path, check_same_thread=False, isolation_level=None, timeout=30
+        )
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(SCHEMA)
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    @contextmanager
+    def transaction(self) -> Iterator["SchedulerStore"]:
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield self
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+            self._conn.execute("COMMIT")
+
+    def get_data_version(self) -> int:
+        """Changes whenever another connection commits to the database"""
+        with self._lock:
+            return self._conn.execute("PRAGMA data_version").fetchone()[0]
+
+    def count(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM tasks").fetchone()[0]
+
+    def get_all(self) -> list[TaskRow]:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT uuid, type, name, state, context_id, data FROM tasks ORDER BY rowid"
+            ).fetchall()
+        return [TaskRow(*row) for row in rows]
+
+    def get(self, uuid: str) -> TaskRow | None:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT uuid, type, name, state, context_id, data FROM tasks WHERE uuid = ?",
+                (uuid,),
+            ).fetchone()
+        return TaskRow(*row) if row else None
+
+    def get_uuids_by_context_id(self, context_id: str, state: str | None = None) -> list[str]:
+        with self._lock:
+            if state is None:
+                rows = self._conn.execute(
+                    "SELECT uuid FROM tasks WHERE context_id = ? ORDER BY rowid",
+                    (context_id,),
+                ).fetchall()
+            else:
+                rows = self._conn.execute(
+                    "SELECT uuid FROM tasks WHERE context_id = ? AND state = ? ORDER BY rowid",
+                    (context_id, state),
+                ).fetchall()
+        return [row[0] for row in rows]
+
+    def get_uuids_by_state(self, state: str) -> list[str]:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT uuid FROM tasks WHERE state = ? ORDER BY rowid", (state,)
+            ).fetchall()
+        return [row[0] for row in rows]
+
+    def put(self, rows: Iterable[TaskRow]):
+        with self._lock:
+            self._conn.executemany(
+                "INSERT INTO tasks (uuid, type, name, state, context_id, data) VALUES (?, ?, ?, ?, ?, ?) "
+                "ON CONFLICT (uuid) DO UPDATE SET type = excluded.type, name = excluded.name, "
+                "state = excluded.state, context_id = excluded.context_id, data = excluded.data",
+                list(rows),
+            )
+
+    def delete(self, uuids: Iterable[str]):
+        with self._lock:
+            self._conn.executemany(
+                "DELETE FROM tasks WHERE uuid = ?", [(uuid,) for uuid in uuids]
+            )
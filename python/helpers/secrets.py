@@ -35,13 +35,37 @@ class EnvLine:
     )
 
 
+class SecretsMatcher:
+    """Compiled matcher that replaces all secret values in a single pass over the text.
+
+    The values are joined into one regex alternation, longest first so the longest
+    value wins at any position. The regex engine skips positions that cannot start
+    a value, so the cost is linear in the text rather than in text times secrets.
+    """
+
+    def __init__(self, value_to_key: Dict[str, str]):
+        self.value_to_key = value_to_key
+        values = sorted(value_to_key.keys(), key=len, reverse=True)
+        self.pattern = re.compile("|".join(re.escape(v) for v in values)) if values else None
+        self.max_len: int = len(values[0]) if values else 0
+
+    def replace(self, text: str, placeholder: str = "§§secret({key})") -> str:
+        if not self.pattern or not text:
+            return text
+        return self.pattern.sub(
+            lambda m: alias_for_key(self.value_to_key[m.group(0)], placeholder), text
+        )
+
+
 class StreamingSecretsFilter:
     """Stateful streaming filter that masks secrets on the fly.
 
     - Replaces full secret values with placeholders §§secret(KEY) when detected.
     - Holds the longest suffix of the current buffer that matches any secret prefix
-      (with minimum trigger length of 3) to avoid leaking partial secrets across chunks.
-    - On finalize(), any unresolved partial is masked with '***'.
+      to avoid leaking partial secrets across chunks, including a full value that
+      may still continue into a longer one.
+    - On finalize(), an unresolved partial of at least min_trigger (3) characters
+      is masked with '***', shorter ones are flushed as they are.
     """
 
     def __init__(self, key_to_value: Dict[str, str], min_trigger: int = 3):
@@ -52,57 +76,73 @@ class StreamingSecretsFilter:
         }
         # Only keep non-empty values
         self.secret_values: List[str] = [v for v in self.value_to_key.keys() if v]
-        # Precompute all prefixes for quick suffix matching
+        self.matcher = SecretsMatcher(self.value_to_key)
+        # Precompute all prefixes for quick suffix matching, proper ones separately
+        # to tell a value that may continue into a longer one
         self.prefixes: Set[str] = set()
+        self.proper_prefixes: Set[str] = set()
         for v in self.secret_values:
-            for i in range(self.min_trigger, len(v) + 1):
-                self.prefixes.add(v[:i])
-        self.max_len: int = max((len(v) for v in self.secret_values), default=0)
+            for i in range(1, len(v)):
+                self.proper_prefixes.add(v[:i])
+        self.prefixes = self.proper_prefixes | set(self.secret_values)
+        self.max_len: int = self.matcher.max_len
 
         # Internal buffer of pending text that is not safe to flush yet
         self.pending: str = ""
+        # Everything emitted so far, the masked counterpart of the streamed full text
+        self.output: str = ""
 
     def _replace_full_values(self, text: str) -> str:
         """Replace all full secret values with placeholders in the given text."""
-        # Sort by length desc to avoid partial overlaps
-        for val in sorted(self.secret_values, key=len, reverse=True):
-            if not val:
-                continue
-            key = self.value_to_key.get(val, "")
-            if key:
-                text = text.replace(val, alias_for_key(key))
-        return text
+        return self.matcher.replace(text)
 
-    def _longest_suffix_prefix(self, text: str) -> int:
+    def _longest_suffix_prefix(self, text: str, min_length: int = 1) -> int:
         """Return length of longest suffix of text that is a known secret prefix.
-        Returns 0 if none found (or only shorter than min_trigger)."""
+        Returns 0 if none found (or only shorter than min_length)."""
         max_check = min(len(text), self.max_len)
-        for length in range(max_check, self.min_trigger - 1, -1):
+        for length in range(max_check, min_length - 1, -1):
             suffix = text[-length:]
             if suffix in self.prefixes:
                 return length
         return 0
 
+    def _hold_start(self, text: str, start: int) -> int:
+        """Start of the longest suffix from start on that a secret may still continue,
+        len(text) if there is none."""
+        for pos in range(max(start, len(text) - self.max_len + 1), len(text)):
+            if text[pos:] in self.proper_prefixes:
+                return pos
+        return len(text)
+
+    def _replace(self, text: str, hold: bool) -> tuple[str, int]:
+        """Mask text, returns it with the position the unsafe rest begins at if hold is set"""
+        parts = []
+        pos = 0
+        end = self._hold_start(text, 0) if hold else len(text)
+        if self.matcher.pattern:
+            for match in self.matcher.pattern.finditer(text):
+                # values from the held suffix on may be part of a longer one
+                if match.start() >= end:
+                    break
+                parts.append(text[pos : match.start()])
+                parts.append(alias_for_key(self.value_to_key[match.group(0)]))
+                pos = match.end()
+                if hold and pos > end:
+                    end = self._hold_start(text, pos)
+        end = max(end, pos)
+        parts.append(text[pos:end])
+        return "".join(parts), end
+
     def process_chunk(self, chunk: str) -> str:
         if not chunk:
             return ""
 
+        # only the held back tail and the new chunk are scanned, never the whole stream
         self.pending += chunk
+        emit, end = self._replace(self.pending, hold=True)
+        self.pending = self.pending[end:]
 
-        # Replace any full secret occurrences first
-        self.pending = self._replace_full_values(self.pending)
-
-        # Determine the longest suffix that could still form a secret
-        hold_len = self._longest_suffix_prefix(self.pending)
-        if hold_len > 0:
-            # Flush everything except the hold suffix
-            emit = self.pending[:-hold_len]
-            self.pending = self.pending[-hold_len:]
-        else:
-            # Safe to flush everything
-            emit = self.pending
-            self.pending = ""
-
+        self.output += emit
         return emit
 
     def finalize(self) -> str:
@@ -111,14 +151,15 @@ class StreamingSecretsFilter:
         if not self.pending:
             return ""
 
-        hold_len = self._longest_suffix_prefix(self.pending)
+        hold_len = self._longest_suffix_prefix(self.pending, self.min_trigger)
         if hold_len > 0:
-            safe = self.pending[:-hold_len]
+            safe, _ = self._replace(self.pending[:-hold_len], hold=False)
             # Mask unresolved partial
             result = safe + "***"
         else:
-            result = self.pending
+            result, _ = self._replace(self.pending, hold=False)
         self.pending = ""
+        self.output += result
         return result
 
 
@@ -146,6 +187,9 @@ class SecretsManager:
         self._raw_snapshots: Dict[str, str] = {}
         self._secrets_cache = None
         self._last_raw_text = None
+        self._stamp: Optional[tuple] = None
+        self._matchers: Dict[int, SecretsMatcher] = {}  # by min_length, built from the cached secrets
+        self._version = 0  # incremented when the cache is cleared, as on saves
 
     def read_secrets_raw(self) -> str:
         """Read raw secrets file content from local filesystem (same system)."""
@@ -176,9 +220,12 @@ class SecretsManager:
     def load_secrets(self) -> Dict[str, str]:
         """Load secrets from file, return key-value dict"""
         with self._lock:
-            if self._secrets_cache is not None:
+            stamp = self._get_stamp()
+            if self._secrets_cache is not None and stamp == self._stamp:
                 return self._secrets_cache
 
+            self._matchers = {}
+            self._stamp = stamp
             combined_raw = self.read_secrets_raw()
             merged_secrets = (
                 self.parse_env_content(combined_raw) if combined_raw else {}
@@ -302,17 +349,23 @@ class SecretsManager:
         if not text:
             return text
 
-        secrets = self.load_secrets()
-        result = text
+        return self.get_matcher(min_length).replace(text, placeholder)
 
-        # Sort by length (longest first) to avoid partial replacements
-        for key, value in sorted(
-            secrets.items(), key=lambda x: len(x[1]), reverse=True
-        ):
-            if value and len(value.strip()) >= min_length:
-                result = result.replace(value, alias_for_key(key, placeholder))
-
-        return result
+    def get_matcher(self, min_length: int = 4) -> SecretsMatcher:
+        """Compiled matcher for secret values of at least min_length, rebuilt when the secrets change"""
+        with self._lock:
+            secrets = self.load_secrets()
+            matcher = self._matchers.get(min_length)
+            if matcher is None:
+                matcher = SecretsMatcher(
+                    {
+                        value: key
+                        for key, value in secrets.items()
+                        if value and len(value.strip()) >= min_length
+                    }
+                )
+                self._matchers[min_length] = matcher
+            return matcher
 
     def get_masked_secrets(self) -> str:
         """Get content with values masked for frontend display (preserves comments and unrecognized lines)"""
@@ -348,9 +401,27 @@ class SecretsManager:
     def clear_cache(self):
         """Clear the secrets cache"""
         with self._lock:
+            self._version += 1
             self._secrets_cache = None
             self._raw_snapshots = {}
             self._last_raw_text = None
+            self._matchers = {}
+
+    def get_version(self) -> tuple:
+        """Changes whenever the secrets files or the secrets for prompt may change"""
+        with self._lock:
+            return (self._version, self._get_stamp())
+
+    def _get_stamp(self) -> tuple:
+        # size and mtime of the secrets files, edits outside of the UI invalidate the cache too
+        stamp = []
+        for path in self._files:
+            try:
+                st = os.stat(files.get_abs_path(path))
+                stamp.append((st.st_mtime_ns, st.st_size))
+            except OSError:
+                stamp.append(None)
+        return tuple(stamp)
 
     @classmethod
     def _invalidate_all_caches(cls):
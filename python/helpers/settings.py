@@ -4,6 +4,7 @@ import json
 import os
 import re
 import subprocess
+import threading
 from typing import Any, Literal, TypedDict, cast
 
 import models
@@ -163,6 +164,10 @@ API_KEY_PLACEHOLDER = "************"
 
 SETTINGS_FILE = files.get_abs_path("tmp/settings.json")
 _settings: Settings | None = None
+_settings_version: int = 0  # incremented whenever the settings snapshot is rebuilt
+_settings_stamp: tuple = ()  # mtimes of the files the snapshot was built from
+_settings_lock = threading.RLock()
+_version: str | None = None
 
 
 def convert_out(settings: Settings) -> SettingsOutput:
@@ -1313,7 +1318,7 @@ def _get_api_key_field(settings: Settings, provider: str, title: str) -> Setting
 
 
 def convert_in(settings: dict) -> Settings:
-    current = get_settings()
+    current = json.loads(json.dumps(get_settings()))  # private copy, the snapshot is shared
     for section in settings["sections"]:
         if "fields" in section:
             for field in section["fields"]:
@@ -1334,24 +1339,60 @@ def convert_in(settings: dict) -> Settings:
     return current
 
 def get_settings() -> Settings:
-    global _settings
-    if not _settings:
-        _settings = _read_settings_file()
-    if not _settings:
-        _settings = get_default_settings()
-    norm = normalize_settings(_settings)
-    return norm
+    """Return the current settings snapshot.
+
+    The snapshot is shared and must be treated as read-only, copy it before making changes.
+    It is rebuilt only by set_settings or when the settings or .env file changes on disk.
+    """
+    global _settings, _settings_stamp, _settings_version
+    stamp = _get_settings_stamp()
+    if _settings and stamp == _settings_stamp:
+        return _settings
+    with _settings_lock:
+        if _settings and stamp == _settings_stamp:
+            return _settings
+        if _settings and stamp[0] == _settings_stamp[0]:
+            # only .env changed, refresh values derived from it (auth token)
+            dotenv.load_dotenv()
+            settings = normalize_settings(_settings)
+        else:
+            settings = _read_settings_file() or normalize_settings(get_default_settings())
+        _settings, _settings_stamp = settings, stamp
+        _settings_version += 1
+        return settings
+
+
+def get_settings_version() -> int:
+    """Version of the settings snapshot, changes whenever get_settings() returns new values."""
+    get_settings()
+    return _settings_version
 
 
 def set_settings(settings: Settings, apply: bool = True):
-    global _settings
-    previous = _settings
-    _settings = normalize_settings(settings)
-    _write_settings_file(_settings)
+    global _settings, _settings_stamp, _settings_version
+    with _settings_lock:
+        previous = _settings
+        _settings = normalize_settings(settings)
+        _write_settings_file(_settings)
+        # token may have changed with the credentials written to .env
+        _settings["mcp_server_token"] = create_auth_token()
+        _settings_stamp = _get_settings_stamp()
+        _settings_version += 1
     if apply:
         _apply_settings(previous)
 
 
+def _get_settings_stamp() -> tuple:
+    stamp = []
+    for path in (SETTINGS_FILE, dotenv.get_dotenv_file_path()):
+        try:
+            st = os.stat(path)
+            stamp.append((st.st_mtime_ns, st.st_size))
+        except OSError:
+            stamp.append(None)
+    return tuple(stamp)
+
+
 def set_settings_delta(delta: dict, apply: bool = True):
     current = get_settings()
     new = {**current, **delta}
@@ -1543,7 +1584,7 @@ def _apply_settings(previous: Settings | None):
         from initialize import initialize_agent
 
         config = initialize_agent()
-        for ctx in AgentContext._contexts.values():
+        for ctx in AgentContext.all():
             ctx.config = config  # reinitialize context config with new settings
             # apply config to agents
             agent = ctx.agent0
@@ -1737,4 +1778,8 @@ def create_auth_token() -> str:
 
 
 def _get_version():
-    return git.get_version()
+    # build-time value, resolve once per process
+    global _version
+    if _version is None:
+        _version = git.get_version()
+    return _version
@@ -5,12 +5,14 @@ import time
 import sys
 from typing import Optional, Tuple
 from python.helpers import tty_session, runtime
-from python.helpers.shell_ssh import clean_string
+from python.helpers.shell_output import ShellOutput
+
+COLLECT_TIME = 0.1  # once output arrives, keep collecting while it flows for up to this long
 
 class LocalInteractiveSession:
     def __init__(self, cwd: str|None = None):
         self.session: tty_session.TTYSession|None = None
-        self.full_output = ''
+        self.output = ShellOutput()
         self.cwd = cwd
 
     async def connect(self):
@@ -26,7 +28,7 @@ class LocalInteractiveSession:
     async def send_command(self, command: str):
         if not self.session:
             raise Exception("Shell not connected")
-        self.full_output = ""
+        self.output.reset()
         await self.session.sendline(command)
  
     async def read_output(self, timeout: float = 0, reset_full_output: bool = False) -> Tuple[str, Optional[str]]:
@@ -34,16 +36,21 @@ class LocalInteractiveSession:
             raise Exception("Shell not connected")
 
         if reset_full_output:
-            self.full_output = ""
+            self.output.reset()
 
-        # get output from terminal
-        partial_output = await self.session.read_full_until_idle(idle_timeout=0.01, total_timeout=timeout)
-        self.full_output += partial_output
+        # get output from terminal, waking as soon as the child writes
+        partial_output = self.session.read_nowait()
+        if not partial_output and timeout > 0:
+            partial_output = await self.session.read(timeout=timeout) or ""
+        if partial_output:
+            partial_output += await self.session.read_full_until_idle(
+                idle_timeout=0.01, total_timeout=COLLECT_TIME
+            )
 
-        # clean output
-        partial_output = clean_string(partial_output)
-        clean_full_output = clean_string(self.full_output)
+        # clean only the new output
+        partial_output = self.output.feed(partial_output)
+        clean_full_output = self.output.get_text()
 
         if not partial_output:
             return clean_full_output, None
-        return clean_full_output, partial_output
\ No newline at end of file
+        return clean_full_output, partial_output
@@ -0,0 +1,167 @@
+import re
+from collections import deque
+from typing import Callable, Iterator
+
+ANSI_ESCAPE = re.compile(r"\x1B(?:[@-Z\\-_]|\[[0-?]*[ -/]*[@-~])")
+BYTE_ESCAPE = re.compile(r"(?<!\\)\\x[0-9A-Fa-f]{2}")  # single byte \xXX escapes printed as text
+LIMIT = 990_000  # chars kept, head and tail halves, below the ~1MB the code tool shows
+LINE_LIMIT = 65_536  # an unfinished line without carriage returns is flushed beyond this
+
+
+def clean_line(line: str) -> str:
+    # Handle carriage returns '\r' by taking the last non blank part
+    parts = [part for part in line.split("\r") if part.strip()]
+    return parts[-1].rstrip() if parts else line
+
+
+def strip_start(text: str) -> str:
+    # remove ipython \r\r\n> sequences and any amount of '> ' from the start
+    text = re.sub(r"^[ \r]*(?:\r*\n>[ \r]*)*", "", text)
+    text = re.sub(r"^(>\s*)+", "", text)
+    return text.lstrip("\r ")
+
+
+def clean_string(text: str) -> str:
+    text = ANSI_ESCAPE.sub("", text).replace("\x00", "")
+    text = strip_start(text).replace("\r\n", "\n")
+    return "\n".join(clean_line(line) for line in text.split("\n"))
+
+
+def strip_byte_escapes(text: str) -> str:
+    return BYTE_ESCAPE.sub("", text)
+
+
+def default_placeholder(length: int) -> str:
+    return f"\n<< {length} CHARACTERS REMOVED >>\n"
+
+
+class ShellOutput:
+    """Cleaned output of a shell command, kept incrementally.
+
+    Each chunk is cleaned once when it arrives, the same way clean_string
+    and strip_byte_escapes clean the whole output: only the unfinished last
+    line is kept raw and re-cleaned. The first half of the limit keeps the
+    start of the output, the rest is a ring of its end, the middle is dropped
+    and replaced by the placeholder.
+    """
+
+    def __init__(
+        self,
+        limit: int = LIMIT,
+        placeholder: Callable[[int], str] = default_placeholder,
+    ):
+        self.head_limit = limit // 2
+        self.tail_limit = limit - self.head_limit
+        self.placeholder = placeholder
+        self.reset()
+
+    def reset(self):
+        self.dropped = 0
+        self._head: list[str] = []
+        self._head_len = 0
+        self._tail: deque[str] = deque()
+        self._tail_len = 0
+        self._pending = ""  # unfinished last line, raw except for escapes
+        self._started = False  # anything besides leading prompt junk seen
+        self._text: str | None = ""
+
+    def feed(self, raw: str) -> str:
+        """Add raw output, returns the chunk cleaned on its own"""
+        if not raw:
+            return ""
+        text = ANSI_ESCAPE.sub("", self._pending + raw).replace("\x00", "")
+        self._text = None
+
+        if not self._started:
+            # leading prompt junk is kept whole until content shows up, an
+            # escape sequence split between chunks is not content yet
+            esc = text.rfind("\x1b")
+            body = text[:esc] if esc >= 0 and len(text) - esc < 32 else text
+            if not strip_start(body).strip(" \r\n>") and len(text) < LINE_LIMIT:
+                self._pending = text
+                return clean_string(raw)
+            text = strip_start(text)
+            self._started = True
+
+        text = text.replace("\r\n", "\n")
+        end = text.rfind("\n")
+        if end >= 0:
+            lines = "\n".join(clean_line(line) for line in text[:end].split("\n")) + "\n"
+            self._append(strip_byte_escapes(lines))
+            text = text[end + 1 :]
+
+        # only the last carriage return part and the one being written matter
+        cr = text.rfind("\r")
+        if cr >= 0:
+            parts = [part for part in text[:cr].split("\r") if part.strip()]
+            text = (parts[-1] if parts else text[max(cr - 16, 0) : cr]) + text[cr:]
+        elif len(text) > LINE_LIMIT:
+            # not within a byte escape or right after a backslash
+            cut = len(text) - 1024
+            safe = text.rfind("\\", cut - 3, cut)
+            if safe < 0:
+                safe = cut
+            while safe > 0 and text[safe - 1] == "\\":
+                safe -= 1
+            if safe > 0:
+                cut = safe
+            self._append(strip_byte_escapes(text[:cut]))
+            text = text[cut:]
+        self._pending = text
+        return clean_string(raw)
+
+    def get_text(self) -> str:
+        if self._text is None:
+            middle = self.placeholder(self.dropped) if self.dropped else ""
+            last = clean_line(self._pending) if self._started else clean_string(self._pending)
+            last = strip_byte_escapes(last)
+            self._text = "".join(self._head) + middle + "".join(self._tail) + last
+        return self._text
+
+    def _append(self, text: str):
+        if self._head_len < self.head_limit:
+            room = self.head_limit - self._head_len
+            self._head.append(text[:room])
+            self._head_len += len(self._head[-1])
+            text = text[room:]
+        if not text:
+            return
+        self._tail.append(text)
+        self._tail_len += len(text)
+        while self._tail_len > self.tail_limit:
+            excess = self._tail_len - self.tail_limit
+            first = self._tail[0]
+            if len(first) <= excess:
+                self._tail.popleft()
+                removed = len(first)
+            else:
+                self._tail[0] = first[excess:]
+                removed = excess
+            self._tail_len -= removed
+            self.dropped += removed
+
+
+def iter_lines_reversed(text: str) -> Iterator[str]:
+    """Lines of text as str.splitlines gives them, last first, without splitting it all"""
+    end = len(text)
+    if text.endswith("\n"):
+        end -= 1
+    while end >= 0:
+        start = text.rfind("\n", 0, end)
+        yield text[start + 1 : end]
+        if start < 0:
+            break
+        end = start
+    return
+
+
+def get_last_lines(text: str, count: int) -> list[str]:
+    if not text:
+        return []
+    lines = []
+    for line in iter_lines_reversed(text):
+        if len(lines) >= count:
+            break
+        lines.append(line)
+    lines.reverse()
+    return lines
@@ -5,6 +5,7 @@ import re
 from typing import Tuple
 from python.helpers.log import Log
 from python.helpers.print_style import PrintStyle
+from python.helpers import shell_output
 # from python.helpers.strings import calculate_valid_match_lengths
 
 
@@ -24,7 +25,7 @@ class SSHInteractiveSession:
         self.client = paramiko.SSHClient()
         self.client.set_missing_host_key_policy(paramiko.AutoAddPolicy())
         self.shell = None
-        self.full_output = b""
+        self.output = shell_output.ShellOutput()
         self.last_command = b""
         self.trimmed_command_length = 0  # Initialize trimmed_command_length
         self.cwd = cwd
@@ -97,7 +98,7 @@ class SSHInteractiveSession:
     async def send_command(self, command: str):
         if not self.shell:
             raise Exception("Shell not connected")
-        self.full_output = b""
+        self.output.reset()
         # if len(command) > 10: # if command is long, add end_comment to split output
         #     command = (command + " \\\n" +SSHInteractiveSession.end_comment + "\n")
         # else:
@@ -113,7 +114,7 @@ class SSHInteractiveSession:
             raise Exception("Shell not connected")
 
         if reset_full_output:
-            self.full_output = b""
+            self.output.reset()
         partial_output = b""
         leftover = b""
         start_time = time.time()
@@ -153,17 +154,13 @@ class SSHInteractiveSession:
             #         self.trimmed_command_length += trim_com
 
             partial_output += data
-            self.full_output += data
             await asyncio.sleep(0.1)  # Prevent busy waiting
 
-        # Decode once at the end
-        decoded_partial_output = partial_output.decode("utf-8", errors="replace")
-        decoded_full_output = self.full_output.decode("utf-8", errors="replace")
-
-        decoded_partial_output = clean_string(decoded_partial_output)
-        decoded_full_output = clean_string(decoded_full_output)
-
-        return decoded_full_output, decoded_partial_output
+        # Decode and clean only the new data, receive_bytes keeps utf-8 sequences whole
+        decoded_partial_output = self.output.feed(
+            partial_output.decode("utf-8", errors="replace")
+        )
+        return self.output.get_text(), decoded_partial_output
 
     def receive_bytes(self, num_bytes=1024):
         if not self.shell:
@@ -214,33 +211,4 @@ class SSHInteractiveSession:
         return data
 
 def clean_string(input_string):
-    # Remove ANSI escape codes
-    ansi_escape = re.compile(r"\x1B(?:[@-Z\\-_]|\[[0-?]*[ -/]*[@-~])")
-    cleaned = ansi_escape.sub("", input_string)
-
-    # remove null bytes
-    cleaned = cleaned.replace("\x00", "")
-
-    # remove ipython \r\r\n> sequences from the start
-    cleaned = re.sub(r'^[ \r]*(?:\r*\n>[ \r]*)*', '', cleaned)
-    # also remove any amount of '> ' sequences from the start
-    cleaned = re.sub(r'^(>\s*)+', '', cleaned)
-
-    # Replace '\r\n' with '\n'
-    cleaned = cleaned.replace("\r\n", "\n")
-
-    # remove leading \r and spaces
-    cleaned = cleaned.lstrip("\r ")
-
-    # Split the string by newline characters to process each segment separately
-    lines = cleaned.split("\n")
-
-    for i in range(len(lines)):
-        # Handle carriage returns '\r' by splitting and taking the last part
-        parts = [part for part in lines[i].split("\r") if part.strip()]
-        if parts:
-            lines[i] = parts[
-                -1
-            ].rstrip()  # Overwrite with the last part after the last '\r'
-
-    return "\n".join(lines)
+    return shell_output.clean_string(input_string)
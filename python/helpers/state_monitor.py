@@ -0,0 +1,48 @@
+import threading
+
+# Change counters for everything the UI shows. The shared version covers what every
+# client lists (contexts, tasks, notifications), each context has its own version for
+# its log, progress and pause state. Writers bump them, /poll_stream waits on the
+# shared version and the one of its context, so a client sleeps without cost until
+# something it shows actually changes.
+
+_lock = threading.Lock()
+_version = 0
+_context_versions: dict[str, int] = {}
+_waiters: dict[str, set[threading.Condition]] = {}  # context id ("" for none) -> waiting streams
+
+
+def mark_dirty(context_id: str = ""):
+    """Bump the version of a context, or the shared version when no context is given."""
+    global _version
+    with _lock:
+        if context_id:
+            _context_versions[context_id] = _context_versions.get(context_id, 0) + 1
+            waiters = _waiters.get(context_id, ())
+        else:
+            _version += 1
+            waiters = [w for group in _waiters.values() for w in group]
+        for condition in waiters:
+            condition.notify()
+
+
+def get_version(context_id: str = "") -> tuple[int, int]:
+    """Shared version and the version of the context."""
+    return _version, _context_versions.get(context_id, 0) if context_id else 0
+
+
+def wait_for_change(
+    version: tuple[int, int], timeout: float | None = None, context_id: str = ""
+) -> tuple[int, int]:
+    """Block until the shared or context version differs from `version` or the timeout passes, return the current version."""
+    condition = threading.Condition(_lock)
+    with _lock:
+        _waiters.setdefault(context_id, set()).add(condition)
+        try:
+            condition.wait_for(lambda: get_version(context_id) != version, timeout=timeout)
+        finally:
+            group = _waiters[context_id]
+            group.discard(condition)
+            if not group:
+                del _waiters[context_id]
+        return get_version(context_id)
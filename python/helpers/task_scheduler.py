@@ -1,5 +1,8 @@
 import asyncio
+from contextlib import contextmanager
 from datetime import datetime, timezone, timedelta
+from functools import lru_cache
+import heapq
 import os
 import random
 import threading
@@ -20,14 +23,21 @@ from initialize import initialize_agent
 from python.helpers.persist_chat import save_tmp_chat
 from python.helpers.print_style import PrintStyle
 from python.helpers.defer import DeferredTask
-from python.helpers.files import get_abs_path, make_dirs, read_file, write_file
+from python.helpers.files import get_abs_path, make_dirs, read_file
+from python.helpers.scheduler_store import SchedulerStore, TaskRow
 from python.helpers.localization import Localization
-from python.helpers import projects
+from python.helpers import projects, state_monitor
 import pytz
 from typing import Annotated
 
 SCHEDULER_FOLDER = "tmp/scheduler"
 
+
+@lru_cache(maxsize=1024)
+def get_crontab(expression: str) -> CronTab:
+    # parsed crontabs are immutable, share them between tasks and checks
+    return CronTab(crontab=expression)  # type: ignore
+
 # ----------------------
 # Task Models
 # ----------------------
@@ -184,6 +194,10 @@ class BaseTask(BaseModel):
     def get_next_run(self) -> datetime | None:
         return None
 
+    def get_next_run_after(self, after: datetime) -> datetime | None:
+        """Next time the scheduler should fire the task, after the given time if recurring"""
+        return None
+
     def is_dedicated(self) -> bool:
         return self.context_id == self.uuid
 
@@ -341,7 +355,7 @@ class ScheduledTask(BaseTask):
 
     def check_schedule(self, frequency_seconds: float = 60.0) -> bool:
         with self._lock:
-            crontab = CronTab(crontab=self.schedule.to_crontab())  # type: ignore
+            crontab = get_crontab(self.schedule.to_crontab())
 
             # Get the timezone from the schedule or use UTC as fallback
             task_timezone = pytz.timezone(self.schedule.timezone or Localization.get().get_timezone())
@@ -363,9 +377,15 @@ class ScheduledTask(BaseTask):
 
     def get_next_run(self) -> datetime | None:
         with self._lock:
-            crontab = CronTab(crontab=self.schedule.to_crontab())  # type: ignore
+            crontab = get_crontab(self.schedule.to_crontab())
             return crontab.next(now=datetime.now(timezone.utc), return_datetime=True)  # type: ignore
 
+    def get_next_run_after(self, after: datetime) -> datetime | None:
+        with self._lock:
+            crontab = get_crontab(self.schedule.to_crontab())
+            task_timezone = pytz.timezone(self.schedule.timezone or Localization.get().get_timezone())
+            return crontab.next(now=after.astimezone(task_timezone), return_datetime=True)  # type: ignore
+
 
 class PlannedTask(BaseTask):
     type: Literal[TaskType.PLANNED] = TaskType.PLANNED
@@ -422,6 +442,10 @@ class PlannedTask(BaseTask):
         with self._lock:
             return self.plan.get_next_launch_time()
 
+    def get_next_run_after(self, after: datetime) -> datetime | None:
+        # overdue plan items are launched as soon as the task is idle
+        return self.get_next_run()
+
     async def on_run(self):
         with self._lock:
             # Get the next launch time and set it as in_progress
@@ -468,13 +492,10 @@ class SchedulerTaskList(BaseModel):
 
     @classmethod
     def get(cls) -> "SchedulerTaskList":
-        path = get_abs_path(SCHEDULER_FOLDER, "tasks.json")
         if cls.__instance is None:
-            if not exists(path):
-                make_dirs(path)
-                cls.__instance = asyncio.run(cls(tasks=[]).save())
-            else:
-                cls.__instance = cls.model_validate_json(read_file(path))
+            instance = cls(tasks=[])
+            instance._store = _open_store()
+            cls.__instance = asyncio.run(instance.reload())
         else:
             asyncio.run(cls.__instance.reload())
         return cls.__instance
@@ -482,23 +503,51 @@ class SchedulerTaskList(BaseModel):
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
         self._lock = threading.RLock()
+        self._store: SchedulerStore | None = None
+        self._data_version: int | None = None  # store data version last loaded
+        self._persisted: dict[str, str] = {}  # uuid -> task JSON as stored
+        self._by_uuid: dict[str, Union[ScheduledTask, AdHocTask, PlannedTask]] = {}
+        self._version = 0  # incremented on every change of the tasks
+
+    @property
+    def version(self) -> int:
+        return self._version
+
+    def _changed(self):
+        # callers notify the scheduler once they released self._lock
+        self._version += 1
+
+    def get_snapshot(self) -> tuple[int, dict[str, Union[ScheduledTask, AdHocTask, PlannedTask]]]:
+        """Version of the task list and its tasks by uuid, read consistently"""
+        with self._lock:
+            return self._version, dict(self._by_uuid)
 
     async def reload(self) -> "SchedulerTaskList":
-        path = get_abs_path(SCHEDULER_FOLDER, "tasks.json")
-        if exists(path):
-            with self._lock:
-                data = self.__class__.model_validate_json(read_file(path))
-                self.tasks.clear()
-                self.tasks.extend(data.tasks)
+        if self._store is None:
+            return self
+        with self._lock:
+            # only re-read when another process committed changes
+            data_version = self._store.get_data_version()
+            if data_version == self._data_version:
+                return self
+            rows = self._store.get_all()
+            self.tasks.clear()
+            self.tasks.extend(_parse_task(row) for row in rows)
+            self._by_uuid = {task.uuid: task for task in self.tasks}
+            self._persisted = {row.uuid: row.data for row in rows}
+            self._data_version = data_version
+            self._changed()
+        TaskScheduler.notify_change()
         return self
 
     async def add_task(self, task: Union[ScheduledTask, AdHocTask, PlannedTask]) -> "SchedulerTaskList":
         with self._lock:
             self.tasks.append(task)
-            await self.save()
+        await self.save()
         return self
 
     async def save(self) -> "SchedulerTaskList":
+        version = self._version
         with self._lock:
             # Debug: check for AdHocTasks with null tokens before saving
             for task in self.tasks:
@@ -513,29 +562,22 @@ class SchedulerTaskList(BaseModel):
                             f"Fixed: Generated new token '{task.token}' for task {task.name}"
                         )
 
-            path = get_abs_path(SCHEDULER_FOLDER, "tasks.json")
-            if not exists(path):
-                make_dirs(path)
-
-            # Get the JSON string before writing
-            json_data = self.model_dump_json()
-
-            # Debug: check if 'null' appears as token value in JSON
-            if '"type": "adhoc"' in json_data and '"token": null' in json_data:
-                PrintStyle(italic=True, font_color="red", padding=False).print(
-                    "ERROR: Found null token in JSON output for an adhoc task"
-                )
-
-            write_file(path, json_data)
-
-            # Debug: Verify after saving
-            if exists(path):
-                loaded_json = read_file(path)
-                if '"type": "adhoc"' in loaded_json and '"token": null' in loaded_json:
-                    PrintStyle(italic=True, font_color="red", padding=False).print(
-                        "ERROR: Null token persisted in JSON file for an adhoc task"
-                    )
-
+            # write only the rows of tasks changed since they were loaded or saved
+            rows = [_task_row(task) for task in self.tasks]
+            changed = [row for row in rows if self._persisted.get(row.uuid) != row.data]
+            removed = set(self._persisted).difference(row.uuid for row in rows)
+            if changed or removed:
+                if self._store:
+                    with self._store.transaction():
+                        self._store.put(changed)
+                        self._store.delete(removed)
+                self._persisted = {row.uuid: row.data for row in rows}
+                self._by_uuid = {task.uuid: task for task in self.tasks}
+                self._changed()
+
+        if self._version != version:
+            TaskScheduler.notify_change()
+        state_monitor.mark_dirty()
         return self
 
     async def update_task_by_uuid(
@@ -548,50 +590,82 @@ class SchedulerTaskList(BaseModel):
         Atomically update a task by UUID using the provided updater function.
 
         The updater_func should take the task as an argument and perform any necessary updates.
-        This method ensures that the task is updated and saved atomically, preventing race conditions.
+        The task is read, verified and written back in one store transaction, preventing race conditions
+        with other threads and processes. Only the row of the task is written.
 
         Returns the updated task or None if not found.
         """
-        with self._lock:
-            # Reload to ensure we have the latest state
-            await self.reload()
-
-            # Find the task
-            task = next((task for task in self.tasks if task.uuid == task_uuid and verify_func(task)), None)
-            if task is None:
-                return None
-
-            # Apply the updates via the provided function
-            updater_func(task)
+        # Reload to ensure we have the latest state
+        await self.reload()
 
-            # Save the changes
+        if self._store is None:
+            with self._lock:
+                task = self._by_uuid.get(task_uuid)
+                if task is None or not verify_func(task):
+                    return None
+                updater_func(task)
             await self.save()
-
             return task
 
+        with self._lock:
+            with self._store.transaction():
+                row = self._store.get(task_uuid)
+                task = _parse_task(row) if row else None
+                if task is None or not verify_func(task):
+                    return None
+
+                # Apply the updates via the provided function
+                updater_func(task)
+                row = _task_row(task)
+                self._store.put([row])
+
+            # replace the cached task with the updated one
+            current = self._by_uuid.get(task_uuid)
+            if current is not None:
+                self.tasks[self.tasks.index(current)] = task
+            else:
+                self.tasks.append(task)
+            self._by_uuid[task_uuid] = task
+            self._persisted[task_uuid] = row.data
+            self._changed()
+
+        TaskScheduler.notify_change()
+        state_monitor.mark_dirty()
+        return task
+
     def get_tasks(self) -> list[Union[ScheduledTask, AdHocTask, PlannedTask]]:
         with self._lock:
             return self.tasks
 
     def get_tasks_by_context_id(self, context_id: str, only_running: bool = False) -> list[Union[ScheduledTask, AdHocTask, PlannedTask]]:
         with self._lock:
-            return [
-                task for task in self.tasks
-                if task.context_id == context_id
-                and (not only_running or task.state == TaskState.RUNNING)
-            ]
+            if self._store is None:
+                return [
+                    task for task in self.tasks
+                    if task.context_id == context_id
+                    and (not only_running or task.state == TaskState.RUNNING)
+                ]
+            uuids = self._store.get_uuids_by_context_id(
+                context_id, TaskState.RUNNING.value if only_running else None
+            )
+            return [self._by_uuid[uuid] for uuid in uuids if uuid in self._by_uuid]
 
     async def get_due_tasks(self) -> list[Union[ScheduledTask, AdHocTask, PlannedTask]]:
+        await self.reload()
         with self._lock:
-            await self.reload()
-            return [
-                task for task in self.tasks
-                if task.check_schedule() and task.state == TaskState.IDLE
-            ]
+            if self._store is None:
+                idle = [task for task in self.tasks if task.state == TaskState.IDLE]
+            else:
+                idle = [
+                    self._by_uuid[uuid]
+                    for uuid in self._store.get_uuids_by_state(TaskState.IDLE.value)
+                    if uuid in self._by_uuid
+                ]
+            return [task for task in idle if task.check_schedule()]
 
     def get_task_by_uuid(self, task_uuid: str) -> Union[ScheduledTask, AdHocTask, PlannedTask] | None:
         with self._lock:
-            return next((task for task in self.tasks if task.uuid == task_uuid), None)
+            return self._by_uuid.get(task_uuid)
 
     def get_task_by_name(self, name: str) -> Union[ScheduledTask, AdHocTask, PlannedTask] | None:
         with self._lock:
@@ -604,17 +678,71 @@ class SchedulerTaskList(BaseModel):
     async def remove_task_by_uuid(self, task_uuid: str) -> "SchedulerTaskList":
         with self._lock:
             self.tasks = [task for task in self.tasks if task.uuid != task_uuid]
-            await self.save()
+        await self.save()
         return self
 
     async def remove_task_by_name(self, name: str) -> "SchedulerTaskList":
         with self._lock:
             self.tasks = [task for task in self.tasks if task.name != name]
-            await self.save()
+        await self.save()
         return self
 
 
+_TASK_CLASSES: dict[str, Type[Union[ScheduledTask, AdHocTask, PlannedTask]]] = {
+    TaskType.SCHEDULED.value: ScheduledTask,
+    TaskType.AD_HOC.value: AdHocTask,
+    TaskType.PLANNED.value: PlannedTask,
+}
+
+
+def _task_row(task: Union[ScheduledTask, AdHocTask, PlannedTask]) -> TaskRow:
+    return TaskRow(
+        uuid=task.uuid,
+        type=task.type.value,
+        name=task.name,
+        state=task.state.value,
+        context_id=task.context_id,
+        data=task.model_dump_json(),
+    )
+
+
+def _parse_task(row: TaskRow) -> Union[ScheduledTask, AdHocTask, PlannedTask]:
+    return _TASK_CLASSES[row.type].model_validate_json(row.data)
+
+
+def _open_store() -> SchedulerStore:
+    path = get_abs_path(SCHEDULER_FOLDER, "tasks.db")
+    make_dirs(path)
+    store = SchedulerStore(path)
+
+    # migrate tasks from the former JSON file, kept as tasks.json.migrated
+    json_path = get_abs_path(SCHEDULER_FOLDER, "tasks.json")
+    if exists(json_path):
+        with store.transaction():
+            if not store.count():
+                tasks = SchedulerTaskList.model_validate_json(read_file(json_path)).tasks
+                store.put(_task_row(task) for task in tasks)
+                PrintStyle.standard(f"Migrated {len(tasks)} scheduler task(s) to {path}")
+        try:
+            os.replace(json_path, json_path + ".migrated")
+        except OSError:
+            pass  # already moved by another process
+    return store
+
+
 class TaskScheduler:
+    """Runs tasks at their next fire times.
+
+    Next fire times of all tasks are kept in a min-heap, rebuilt whenever the
+    task list changes. Recurring tasks remember the fire time they were last
+    scheduled from, so each cron time is popped exactly once and a rebuild does
+    not skip or repeat a run. A run holds an in-process lease on its task until
+    it finishes, so overlapping ticks or manual runs cannot start it twice.
+
+    The heap lock is never held while taking the task list lock: the heap is
+    rebuilt from a snapshot of the task list taken before, and the task list
+    notifies changes after releasing its lock.
+    """
 
     _tasks: SchedulerTaskList
     _printer: PrintStyle
@@ -631,8 +759,111 @@ class TaskScheduler:
         if not hasattr(self, '_initialized'):
             self._tasks = SchedulerTaskList.get()
             self._printer = PrintStyle(italic=True, font_color="green", padding=False)
+            self._heap: list[tuple[datetime, str]] = []  # (fire time, task uuid)
+            self._heap_version = -1  # task list version the heap was built from
+            self._scheduled_from: dict[str, datetime] = {}  # recurring task uuid -> last fire time
+            self._leases: set[str] = set()  # uuids of tasks being run
+            self._heap_lock = threading.RLock()
+            self._waiters: list[tuple[asyncio.AbstractEventLoop, asyncio.Event]] = []
+            self._waiters_lock = threading.Lock()
             self._initialized = True
 
+    @classmethod
+    def notify_change(cls):
+        """Wake up loops waiting for the next run, their fire times may have changed"""
+        instance = cls._instance
+        if instance is None or not hasattr(instance, "_initialized"):
+            return
+        with instance._waiters_lock:
+            waiters = list(instance._waiters)
+        for loop, event in waiters:
+            try:
+                loop.call_soon_threadsafe(event.set)
+            except RuntimeError:
+                pass  # loop closed
+
+    @contextmanager
+    def _locked_heap(self):
+        """Hold the heap lock with the heap current, yields the tasks by uuid it was built from"""
+        while True:
+            # snapshot first, the task list lock must not be taken under the heap lock
+            version, tasks = self._tasks.get_snapshot()
+            with self._heap_lock:
+                if self._heap_version > version:
+                    continue  # rebuilt from a newer task list meanwhile, take a new snapshot
+                if self._heap_version < version:
+                    self._refresh_heap(version, tasks)
+                yield tasks
+                return
+
+    def _refresh_heap(self, version: int, tasks: dict[str, Union[ScheduledTask, AdHocTask, PlannedTask]]):
+        # rebuild after changes to the task list, cheap enough for any realistic number of tasks
+        self._heap_version = version
+        now = datetime.now(timezone.utc)
+        heap = []
+        for task in tasks.values():
+            after = self._scheduled_from.setdefault(task.uuid, now)
+            fire_time = task.get_next_run_after(after)
+            if fire_time is not None:
+                heap.append((fire_time, task.uuid))
+        for removed in set(self._scheduled_from) - tasks.keys():
+            del self._scheduled_from[removed]
+        heapq.heapify(heap)
+        self._heap = heap
+
+    def _pop_due_tasks(self) -> list[Union[ScheduledTask, AdHocTask, PlannedTask]]:
+        due = []
+        with self._locked_heap() as tasks:
+            now = datetime.now(timezone.utc)
+            while self._heap and self._heap[0][0] <= now:
+                fire_time, task_uuid = heapq.heappop(self._heap)
+                task = tasks.get(task_uuid)
+                if task is None:
+                    continue
+                if isinstance(task, ScheduledTask):
+                    # schedule the following run, a missed run of a busy task is skipped
+                    self._scheduled_from[task_uuid] = fire_time
+                    next_time = task.get_next_run_after(fire_time)
+                    if next_time is not None:
+                        heapq.heappush(self._heap, (next_time, task_uuid))
+                # planned tasks come back with the next change of their state or plan
+                if task.state == TaskState.IDLE:
+                    due.append(task)
+        return due
+
+    def get_seconds_to_next_run(self) -> float | None:
+        with self._locked_heap():
+            if not self._heap:
+                return None
+            return max(0.0, (self._heap[0][0] - datetime.now(timezone.utc)).total_seconds())
+
+    async def wait_for_next_run(self, max_seconds: float):
+        """Sleep until the next task is due, the task list changes, or max_seconds pass"""
+        event = asyncio.Event()
+        waiter = (asyncio.get_running_loop(), event)
+        with self._waiters_lock:
+            self._waiters.append(waiter)
+        try:
+            seconds = self.get_seconds_to_next_run()
+            timeout = max_seconds if seconds is None else min(seconds, max_seconds)
+            await asyncio.wait_for(event.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+        finally:
+            with self._waiters_lock:
+                self._waiters.remove(waiter)
+
+    def _acquire_lease(self, task_uuid: str) -> bool:
+        with self._heap_lock:
+            if task_uuid in self._leases:
+                return False
+            self._leases.add(task_uuid)
+            return True
+
+    def _release_lease(self, task_uuid: str):
+        with self._heap_lock:
+            self._leases.discard(task_uuid)
+
     async def reload(self):
         await self._tasks.reload()
 
@@ -665,7 +896,8 @@ class TaskScheduler:
         return self._tasks.find_task_by_name(name)
 
     async def tick(self):
-        for task in await self._tasks.get_due_tasks():
+        await self._tasks.reload()  # no-op unless another process changed the tasks
+        for task in self._pop_due_tasks():
             await self._run_task(task)
 
     async def run_task_by_uuid(self, task_uuid: str, task_context: str | None = None):
@@ -767,8 +999,17 @@ class TaskScheduler:
         save_tmp_chat(context)
 
     async def _run_task(self, task: Union[ScheduledTask, AdHocTask, PlannedTask], task_context: str | None = None):
+        if not self._acquire_lease(task.uuid):
+            self._printer.print(f"Scheduler Task '{task.name}' already running, skipping")
+            return
 
         async def _run_task_wrapper(task_uuid: str, task_context: str | None = None):
+            try:
+                await _run_task_leased(task_uuid, task_context)
+            finally:
+                self._release_lease(task_uuid)
+
+        async def _run_task_leased(task_uuid: str, task_context: str | None = None):
 
             # preflight checks with a snapshot of the task
             task_snapshot: Union[ScheduledTask, AdHocTask, PlannedTask] | None = self.get_task_by_uuid(task_uuid)
@@ -106,6 +106,13 @@ class TTYSession:
         except asyncio.TimeoutError:
             return None
 
+    def read_nowait(self):
+        # Return all decoded text already produced by the child, without waiting
+        chunks = []
+        while not self._buf.empty():
+            chunks.append(self._buf.get_nowait())
+        return "".join(chunks)
+
     # backward-compat alias:
     readline = read
 
@@ -1,4 +1,5 @@
 from typing import Any, List, Sequence
+import math
 import uuid
 from langchain_community.vectorstores import FAISS
 
@@ -14,12 +15,33 @@ from langchain_community.vectorstores.utils import (
     DistanceStrategy,
 )
 from langchain.embeddings import CacheBackedEmbeddings
-from simpleeval import simple_eval
+from python.helpers.embedding_cache import CachedQueryEmbeddings
+from python.helpers.metadata_index import MetadataIndex, compile_filter
+from python.helpers import metadata_index
 
 from agent import Agent
 
 
+FILTER_FETCH_K = 20  # vectors fetched for a filtered search, langchain's default
+FILTER_FETCH_K_MAX = 10_000  # upper bound when the filter matches only a few documents
+
+
 class MyFaiss(FAISS):
+    metadata_index: MetadataIndex | None = None  # kept up to date by add and delete when set
+
+    # all of langchain's add methods end up here
+    def _FAISS__add(self, texts, embeddings, metadatas=None, ids=None):
+        ids = FAISS._FAISS__add(self, texts, embeddings, metadatas, ids)  # type: ignore
+        if self.metadata_index:
+            self.metadata_index.add((id, self.docstore._dict[id]) for id in ids)  # type: ignore
+        return ids
+
+    def delete(self, ids: Sequence[str] | None = None, **kwargs) -> bool | None:
+        result = super().delete(ids=ids, **kwargs)  # type: ignore
+        if self.metadata_index and ids:
+            self.metadata_index.remove(ids)
+        return result
+
     # override aget_by_ids
     def get_by_ids(self, ids: Sequence[str], /) -> List[Document]:
         # return all self.docstore._dict[id] in ids
@@ -48,12 +70,13 @@ class VectorDB:
         )
         if namespace not in VectorDB._cached_embeddings:
             store = InMemoryByteStore()
-            VectorDB._cached_embeddings[namespace] = (
+            VectorDB._cached_embeddings[namespace] = CachedQueryEmbeddings(
                 CacheBackedEmbeddings.from_bytes_store(
                     model,
                     store,
                     namespace=namespace,
-                )
+                ),
+                namespace=namespace,
             )
         return VectorDB._cached_embeddings[namespace]
 
@@ -72,11 +95,23 @@ class VectorDB:
             # normalize_L2=True,
             relevance_score_fn=cosine_normalizer,
         )
+        self.db.metadata_index = MetadataIndex(fields=("document_uri", "id"), range_fields=())
 
     async def search_by_similarity_threshold(
         self, query: str, limit: int, threshold: float, filter: str = ""
     ):
-        comparator = get_comparator(filter) if filter else None
+        comparator = None
+        fetch_k = FILTER_FETCH_K
+        if filter:
+            candidates = compile_filter(filter).candidates(self.db.metadata_index)  # type: ignore
+            if candidates is not None:
+                if not candidates:
+                    return []
+                # search deep enough to find the limit among the candidates
+                total = len(self.db.index_to_docstore_id)
+                fetch_k = max(fetch_k, limit * math.ceil(total / len(candidates)))
+                fetch_k = min(fetch_k, FILTER_FETCH_K_MAX, total)
+            comparator = get_comparator(filter, candidates)
 
         return await self.db.asearch(
             query,
@@ -84,14 +119,17 @@ class VectorDB:
             k=limit,
             score_threshold=threshold,
             filter=comparator,
+            fetch_k=fetch_k,
         )
 
     async def search_by_metadata(self, filter: str, limit: int = 0) -> list[Document]:
+        candidates = compile_filter(filter).candidates(self.db.metadata_index)  # type: ignore
         comparator = get_comparator(filter)
         all_docs = self.db.get_all_docs()
         result = []
-        for doc in all_docs.values():
-            if comparator(doc.metadata):
+        for id in list(all_docs.keys() if candidates is None else candidates):
+            doc = all_docs.get(id)
+            if doc and comparator(doc.metadata):
                 result.append(doc)
                 # stop if limit reached and limit > 0
                 if limit > 0 and len(result) >= limit:
@@ -105,7 +143,7 @@ class VectorDB:
             for doc, id in zip(docs, ids):
                 doc.metadata["id"] = id  # add ids to documents metadata
 
-            self.db.add_documents(documents=docs, ids=ids)
+            await self.db.aadd_documents(documents=docs, ids=ids)
         return ids
 
     async def delete_documents_by_ids(self, ids: list[str]):
@@ -138,13 +176,5 @@ def cosine_normalizer(val: float) -> float:
     return res
 
 
-def get_comparator(condition: str):
-    def comparator(data: dict[str, Any]):
-        try:
-            result = simple_eval(condition, {}, data)
-            return result
-        except Exception as e:
-            # PrintStyle.error(f"Error evaluating condition: {e}")
-            return False
-
-    return comparator
+def get_comparator(condition: str, candidates: set[str] | None = None):
+    return metadata_index.get_comparator(condition, candidates)
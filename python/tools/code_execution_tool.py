@@ -7,9 +7,9 @@ from python.helpers import files, rfc_exchange, projects, runtime
 from python.helpers.print_style import PrintStyle
 from python.helpers.shell_local import LocalInteractiveSession
 from python.helpers.shell_ssh import SSHInteractiveSession
+from python.helpers.shell_output import get_last_lines, iter_lines_reversed
 from python.helpers.docker import DockerContainerManager
 from python.helpers.strings import truncate_text as truncate_text_string
-from python.helpers.messages import truncate_text as truncate_text_agent
 import re
 
 # Timeouts for python, nodejs, and terminal runtimes.
@@ -151,6 +151,11 @@ class CodeExecution(Tool):
             else:
                 shell = LocalInteractiveSession(cwd=self.get_cwd())
 
+            # dropped middle of long outputs is marked like truncated messages
+            agent = self.agent
+            shell.output.placeholder = lambda length: agent.read_prompt(
+                "fw.msg_truncated.md", length=length
+            )
             shells[session] = ShellWrap(id=session, session=shell, running=False)
             await shell.connect()
 
@@ -239,7 +244,6 @@ class CodeExecution(Tool):
         between_output_timeout=15,  # Wait up to x seconds between outputs
         dialog_timeout=5,  # potential dialog detection timeout
         max_exec_timeout=180,  # hard cap on total runtime
-        sleep_time=0.1,
         prefix="",
         timeouts: dict | None = None,
     ):
@@ -265,7 +269,7 @@ class CodeExecution(Tool):
             self.log.update(content=prefix)
 
         while True:
-            await asyncio.sleep(sleep_time)
+            # returns as soon as the shell produces output, or after the timeout
             full_output, partial_output = await self.state.shells[session].session.read_output(
                 timeout=1, reset_full_output=reset_full_output
             )
@@ -277,7 +281,7 @@ class CodeExecution(Tool):
             if partial_output:
                 PrintStyle(font_color="#85C1E9").stream(partial_output)
                 # full_output += partial_output # Append new output
-                truncated_output = self.fix_full_output(full_output)
+                truncated_output = full_output  # cleaned and bounded by the session's output buffer
                 self.set_progress(truncated_output)
                 heading = self.get_heading_from_output(truncated_output, 0)
                 self.log.update(content=prefix + truncated_output, heading=heading)
@@ -285,9 +289,7 @@ class CodeExecution(Tool):
                 got_output = True
 
                 # Check for shell prompt at the end of output
-                last_lines = (
-                    truncated_output.splitlines()[-3:] if truncated_output else []
-                )
+                last_lines = get_last_lines(truncated_output, 3)
                 last_lines.reverse()
                 for idx, line in enumerate(last_lines):
                     for pat in self.prompt_patterns:
@@ -343,9 +345,7 @@ class CodeExecution(Tool):
                 # potential dialog detection
                 if now - last_output_time > dialog_timeout:
                     # Check for dialog prompt at the end of output
-                    last_lines = (
-                        truncated_output.splitlines()[-2:] if truncated_output else []
-                    )
+                    last_lines = get_last_lines(truncated_output, 2)
                     for line in last_lines:
                         for pat in self.dialog_patterns:
                             if pat.search(line.strip()):
@@ -384,13 +384,11 @@ class CodeExecution(Tool):
         full_output, _ = await self.state.shells[session].session.read_output(
             timeout=1, reset_full_output=reset_full_output
         )
-        truncated_output = self.fix_full_output(full_output)
+        truncated_output = full_output  # cleaned and bounded by the session's output buffer
         self.set_progress(truncated_output)
         heading = self.get_heading_from_output(truncated_output, 0)
 
-        last_lines = (
-            truncated_output.splitlines()[-3:] if truncated_output else []
-        )
+        last_lines = get_last_lines(truncated_output, 3)
         last_lines.reverse()
         for idx, line in enumerate(last_lines):
             for pat in self.prompt_patterns:
@@ -452,25 +450,15 @@ class CodeExecution(Tool):
         if not output:
             return self.get_heading() + done_icon
 
-        # find last non-empty line with skip
-        lines = output.splitlines()
-        # Start from len(lines) - skip_lines - 1 down to 0
-        for i in range(len(lines) - skip_lines - 1, -1, -1):
-            line = lines[i].strip()
-            if not line:
+        # find last non-empty line with skip, walking back from the end only
+        for i, line in enumerate(iter_lines_reversed(output)):
+            line = line.strip()
+            if i < skip_lines or not line:
                 continue
             return self.get_heading(line) + done_icon
 
         return self.get_heading() + done_icon
 
-    def fix_full_output(self, output: str):
-        # remove any single byte \xXX escapes
-        output = re.sub(r"(?<!\\)\\x[0-9A-Fa-f]{2}", "", output)
-        # Strip every line of output before truncation
-        # output = "\n".join(line.strip() for line in output.splitlines())
-        output = truncate_text_agent(agent=self.agent, output=output, threshold=1000000) # ~1MB, larger outputs should be dumped to file, not read from terminal
-        return output
-
     def get_cwd(self):
         project_name = projects.get_context_project_name(self.agent.context)
         if not project_name:
@@ -0,0 +1,75 @@
+import sys, os, json, time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from python.helpers.dirty_json import DirtyJson, DirtyJsonStream
+
+import pytest
+
+
+def make_response(size: int) -> str:
+    code = "".join(f"print('line {i}')  # \"quoted\" \\ text\n" for i in range(size // 40))
+    return json.dumps(
+        {
+            "thoughts": ["writing a file", "with a long body"],
+            "headline": "Writing file",
+            "tool_name": "code_execution_tool",
+            "tool_args": {"runtime": "python", "session": 0, "code": code},
+        },
+        indent=4,
+    )
+
+
+def stream(text: str, chunk_size: int):
+    parser = DirtyJsonStream()
+    results = []
+    for end in range(chunk_size, len(text) + chunk_size, chunk_size):
+        results.append(parser.update(text[:end]))
+    return results
+
+
+@pytest.mark.parametrize("chunk_size", [1, 7, 64])
+def test_stream_matches_one_shot(chunk_size: int):
+    text = "Sure, here it is:\n" + make_response(2_000)
+    results = stream(text, chunk_size)
+    assert results[-1] == DirtyJson.parse_string(text) == json.loads(text[text.find("{") :])
+
+
+def test_stream_exposes_partial_strings():
+    text = make_response(1_000)
+    cut = text.find("line 5")
+    parsed = DirtyJsonStream().update(text[:cut])
+    assert parsed["tool_name"] == "code_execution_tool"
+    assert parsed["tool_args"]["code"].endswith("print('")
+
+
+def test_stream_restarts_on_rewritten_text():
+    parser = DirtyJsonStream()
+    parser.update('{"text": "my password is hunt')
+    parsed = parser.update('{"text": "my password is ***", "done": true}')
+    assert parsed == {"text": "my password is ***", "done": True}
+
+
+def test_dirty_input():
+    assert DirtyJson.parse_string("{a: 'b', c: [1, 2,], // comment\n d: true}") == {
+        "a": "b",
+        "c": [1, 2],
+        "d": True,
+    }
+
+
+def benchmark():
+    # per chunk cost should stay flat regardless of total reply size,
+    # measured like the agent streams: the growing full text on every chunk
+    for size in [1_000, 50_000, 500_000]:
+        text = make_response(size)
+        fulls = [text[:end] for end in range(32, len(text) + 32, 32)]
+        parser = DirtyJsonStream()
+        start = time.perf_counter()
+        for full in fulls:
+            dict(parser.update(full) or {})
+        elapsed = time.perf_counter() - start
+        print(f"{len(text):>8} chars, {len(fulls):>6} chunks: {elapsed / len(fulls) * 1e6:.1f} us/chunk")
+
+
+if __name__ == "__main__":
+    benchmark()
@@ -0,0 +1,48 @@
+import sys, os, asyncio, threading
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import pytest
+
+from python.helpers.embedding_batch import EmbeddingBatcher
+
+
+def make_batcher(**kwargs):
+    calls = []
+    release = threading.Event()
+
+    def encode(texts):
+        release.wait(5)  # hold the first batch so the following requests queue up
+        calls.append(list(texts))
+        return [[float(len(t))] for t in texts]
+
+    return EmbeddingBatcher(encode, **kwargs), calls, release
+
+
+def test_concurrent_requests_share_a_batch():
+    batcher, calls, release = make_batcher(max_wait=0.01)
+
+    async def main():
+        first = asyncio.ensure_future(batcher.aembed(["a"]))
+        await asyncio.sleep(0.05)  # first batch is closed and encoding
+        rest = [asyncio.ensure_future(batcher.aembed(["b" * i, "c"])) for i in range(1, 6)]
+        await asyncio.sleep(0.02)
+        release.set()
+        return await first, await asyncio.gather(*rest)
+
+    first, rest = asyncio.run(main())
+    assert first == [[1.0]]
+    assert rest == [[[float(i)], [1.0]] for i in range(1, 6)]
+    assert len(calls) == 2 and len(calls[1]) == 10
+
+
+def test_batch_size_and_errors():
+    batcher, calls, release = make_batcher(max_batch=4, max_wait=0.05)
+    release.set()
+    futures = [batcher.submit(["x", "y"]) for _ in range(4)]
+    assert [f.result() for f in futures] == [[[1.0], [1.0]]] * 4
+    assert all(len(c) <= 4 for c in calls)
+    assert batcher.embed([]) == []
+
+    failing = EmbeddingBatcher(lambda texts: 1 / 0)
+    with pytest.raises(ZeroDivisionError):
+        failing.embed(["x"])
@@ -0,0 +1,43 @@
+import sys, os
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from python.helpers import file_tree
+
+
+def test_dir_mtimes_cover_listed_directories(tmp_path):
+    for path in ["src/a.py", "src/pkg/b.py", "node_modules/lib/c.js", "docs/deep/er/d.md"]:
+        (tmp_path / path).parent.mkdir(parents=True, exist_ok=True)
+        (tmp_path / path).write_text("x")
+
+    dir_mtimes: dict[str, int] = {}
+    kwargs = dict(max_depth=3, ignore="node_modules/", sort=("name", "asc"))
+    tree = file_tree.file_tree(str(tmp_path), dir_mtimes=dir_mtimes, **kwargs)
+    assert tree == file_tree.file_tree(str(tmp_path), **kwargs)
+
+    listed = {os.path.relpath(path, tmp_path) for path in dir_mtimes}
+    # the root, its folders and the ignored folder checked for visible entries
+    assert {".", "src", "docs", "node_modules"} <= listed
+    assert "docs/deep/er" not in listed  # beyond max_depth
+    assert all(os.stat(path).st_mtime_ns == mtime for path, mtime in dir_mtimes.items())
+
+
+def test_files_edited_in_place_change_mtimes(tmp_path):
+    for name in ["a.txt", "b.txt"]:
+        (tmp_path / name).write_text("x")
+    os.utime(tmp_path / "a.txt", ns=(1_000_000_000, 1_000_000_000))
+
+    dir_mtimes: dict[str, int] = {}
+    tree = file_tree.file_tree(str(tmp_path), dir_mtimes=dir_mtimes)
+    assert tree.index("b.txt") < tree.index("a.txt")  # newest first
+    assert file_tree.mtimes_unchanged(dir_mtimes)
+
+    # a file edited in place leaves its directory's mtime as it is
+    (tmp_path / "a.txt").write_text("edited")
+    assert not file_tree.mtimes_unchanged(dir_mtimes)
+    tree = file_tree.file_tree(str(tmp_path))
+    assert tree.index("a.txt") < tree.index("b.txt")
+
+    # sorted by name, only listed directories matter
+    dir_mtimes = {}
+    file_tree.file_tree(str(tmp_path), sort=("name", "asc"), dir_mtimes=dir_mtimes)
+    assert list(dir_mtimes) == [str(tmp_path)]
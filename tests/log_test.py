@@ -0,0 +1,43 @@
+import sys, os, asyncio
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from python.helpers import files  # imported before log, which it cyclically depends on
+from python.helpers import log
+
+
+def test_update_throttled_applies_latest_values():
+    logger = log.Log()
+    item = logger.log(type="agent", heading="start")
+    updates = len(logger.updates)
+
+    for i in range(100):
+        item.update_throttled(heading=f"heading {i}", content=f"content {i}", reasoning=f"r {i}", rate=1)
+    # the first call is applied at once, the rest waits for the next slot
+    assert len(logger.updates) == updates + 1
+    assert item.heading == "heading 0"
+
+    item.flush()
+    assert len(logger.updates) == updates + 2
+    assert (item.heading, item.content, item.kvps["reasoning"]) == ("heading 99", "content 99", "r 99")
+
+    # nothing pending, nothing applied
+    item.flush()
+    assert len(logger.updates) == updates + 2
+
+    # a direct update applies pending values first
+    item.update_throttled(content="pending", rate=1)
+    item.update(finished=True)
+    assert item.content == "pending" and item.kvps["finished"] is True
+
+
+def test_update_throttled_timer_applies_pending_values():
+    async def stream():
+        logger = log.Log()
+        item = logger.log(type="agent")
+        for i in range(10):
+            item.update_throttled(content=f"content {i}", rate=20)
+        assert item.content == "content 0"
+        await asyncio.sleep(0.1)
+        assert item.content == "content 9"
+
+    asyncio.run(stream())
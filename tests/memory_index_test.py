@@ -0,0 +1,116 @@
+import sys, os, json, threading
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import numpy as np
+import pytest
+
+from python.helpers import faiss_monkey_patch
+import faiss
+from python.helpers import memory_index
+from python.helpers.memory_index import MemoryIndex
+from langchain_community.vectorstores import FAISS
+from langchain_community.docstore.in_memory import InMemoryDocstore
+from langchain_community.vectorstores.utils import DistanceStrategy
+
+DIM = 32
+
+
+def vector(text: str) -> np.ndarray:
+    v = np.random.default_rng(int(text[1:])).standard_normal(DIM).astype(np.float32)
+    return v / np.linalg.norm(v)
+
+
+def make_db(tmp_path, type: str, promote_at: int):
+    (tmp_path / memory_index.CONFIG_FILE).write_text(
+        json.dumps({"type": type, "promote_at": promote_at})
+    )
+    db = FAISS(
+        embedding_function=None,  # type: ignore
+        index=faiss.IndexFlatIP(DIM),
+        docstore=InMemoryDocstore(),
+        index_to_docstore_id={},
+        distance_strategy=DistanceStrategy.COSINE,
+    )
+    return db, MemoryIndex(str(tmp_path), threading.RLock())
+
+
+def add(db, ann: MemoryIndex, texts: list[str]):
+    ann.add(db, texts, [vector(t) for t in texts], [{"n": int(t[1:])} for t in texts], texts)
+
+
+def wait(ann: MemoryIndex):
+    if ann._thread:
+        ann._thread.join()
+
+
+def top(db, ann: MemoryIndex, text: str, **kwargs):
+    results = ann.search(db, vector(text).tolist(), k=1, **kwargs)
+    return results[0][0].page_content if results else None
+
+
+@pytest.mark.parametrize("type", [memory_index.TYPE_HNSW, memory_index.TYPE_IVF])
+def test_promote_with_mutations_during_build(tmp_path, type):
+    db, ann = make_db(tmp_path, type, promote_at=1000)
+    texts = [f"t{i}" for i in range(1200)]
+    add(db, ann, texts[:999])
+    assert memory_index.get_type(db.index) == memory_index.TYPE_FLAT
+
+    add(db, ann, texts[999:1100])  # starts the build
+    ann.delete(db, ["t5", "t6"])
+    add(db, ann, texts[1100:])
+    wait(ann)
+
+    assert memory_index.get_type(db.index) == type
+    assert len(db.index_to_docstore_id) == len(db.docstore._dict) == 1198  # type: ignore
+    assert top(db, ann, "t1150") == "t1150"
+    assert top(db, ann, "t5") != "t5"
+    assert top(db, ann, "t300", filter=lambda m: m["n"] % 2 == 1) != "t300"
+
+
+def test_deleted_vectors_rebuild_and_demote(tmp_path):
+    db, ann = make_db(tmp_path, memory_index.TYPE_HNSW, promote_at=400)
+    texts = [f"t{i}" for i in range(600)]
+    add(db, ann, texts)
+    wait(ann)
+    assert memory_index.get_type(db.index) == memory_index.TYPE_HNSW
+
+    ann.delete(db, texts[:200])
+    wait(ann)
+    assert db.index.ntotal == len(db.index_to_docstore_id) == 400  # rebuilt without deleted
+
+    ann.delete(db, texts[200:450])
+    wait(ann)
+    assert memory_index.get_type(db.index) == memory_index.TYPE_FLAT
+    assert sorted(db.index_to_docstore_id) == list(range(150))
+    assert top(db, ann, "t500") == "t500"
+
+
+class NoScanDict(dict):
+    def items(self):
+        raise AssertionError("mapping scanned")
+
+    def values(self):
+        raise AssertionError("mapping scanned")
+
+
+def test_deletes_look_labels_up(tmp_path):
+    db, ann = make_db(tmp_path, memory_index.TYPE_HNSW, promote_at=400)
+    texts = [f"t{i}" for i in range(600)]
+    add(db, ann, texts)
+    wait(ann)
+    assert memory_index.get_type(db.index) == memory_index.TYPE_HNSW
+
+    # deletes and updates use the reverse map, never the whole mapping
+    db.index_to_docstore_id = NoScanDict(db.index_to_docstore_id)
+    ann._labels_of = db.index_to_docstore_id
+    ann.delete(db, ["t1", "t2"])
+    ann.delete(db, ["t3"])
+    with pytest.raises(ValueError):
+        ann.delete(db, ["t1"])
+    add(db, ann, ["t1"])
+    assert ann._thread is None or not ann._thread.is_alive()
+
+    mapping = dict(db.index_to_docstore_id)
+    assert {id: label for label, id in mapping.items()} == ann._labels
+    assert len(mapping) == 598 and "t2" not in ann._labels
+    assert top(db, ann, "t1") == "t1"
@@ -0,0 +1,115 @@
+import sys, os
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import numpy as np
+
+from python.helpers import faiss_monkey_patch
+import faiss
+from python.helpers import memory_wal
+from python.helpers.memory_wal import MemoryWal
+from langchain_community.vectorstores import FAISS
+from langchain_community.docstore.in_memory import InMemoryDocstore
+from langchain_core.documents import Document
+
+DIM = 16
+
+
+def new_db():
+    return FAISS(
+        embedding_function=None,  # type: ignore
+        index=faiss.IndexFlatIP(DIM),
+        docstore=InMemoryDocstore(),
+        index_to_docstore_id={},
+    )
+
+
+def load_db(path):
+    # the way Memory loads a DB: recover the snapshot, load it and replay the log over it
+    wal = MemoryWal(str(path))
+    wal.recover()
+    db = FAISS.load_local(str(path), None, allow_dangerous_deserialization=True)  # type: ignore
+    wal.replay(db)
+    return db, wal
+
+
+def add(wal: MemoryWal, db, ids: list[int]):
+    rng = np.random.default_rng(ids[0])
+    wal.add(
+        db,
+        [f"m{i}" for i in ids],
+        [Document(page_content=f"memory {i}", metadata={"n": i}) for i in ids],
+        rng.standard_normal((len(ids), DIM)).astype(np.float32),
+    )
+
+
+def state(db) -> dict:
+    # documents with their vectors, independent of the order they were indexed in
+    return {
+        id: (
+            db.docstore._dict[id].page_content,
+            db.docstore._dict[id].metadata,
+            tuple(db.index.reconstruct(i).round(5)),
+        )
+        for i, id in db.index_to_docstore_id.items()
+    }
+
+
+def test_replay_drops_torn_last_record(tmp_path):
+    db, wal = new_db(), MemoryWal(str(tmp_path))
+    wal.snapshot(db, background=False)
+    add(wal, db, [1, 2, 3])
+    wal.delete(db, ["m2"])
+    add(wal, db, [3, 4])  # replaces m3
+    expected = state(db)
+
+    # a crash in the middle of writing the last record
+    log = tmp_path / memory_wal.LOG_FILE
+    size = log.stat().st_size
+    add(wal, db, [5])
+    with open(log, "r+b") as f:
+        f.truncate(size + 20)
+
+    loaded, wal = load_db(tmp_path)
+    assert state(loaded) == expected
+    assert log.stat().st_size == size
+
+    # the log goes on after the discarded tail
+    add(wal, loaded, [6])
+    assert state(load_db(tmp_path)[0]) == state(loaded)
+
+
+def test_replay_after_compaction_with_concurrent_appends(tmp_path):
+    db, wal = new_db(), MemoryWal(str(tmp_path))
+    wal.snapshot(db, background=False)
+    for i in range(0, 200, 10):
+        add(wal, db, list(range(i, i + 10)))
+
+    wal.snapshot(db)  # in the background, while more mutations come in
+    for i in range(200, 300, 10):
+        add(wal, db, list(range(i, i + 10)))
+        wal.delete(db, [f"m{i - 100}"])
+    wal._thread.join()  # type: ignore
+    add(wal, db, [300])
+
+    assert state(load_db(tmp_path)[0]) == state(db)
+    assert not (tmp_path / memory_wal.COMMIT_MARKER).exists()
+    assert not wal._segments()
+
+
+def test_recover_finishes_interrupted_snapshot(tmp_path, monkeypatch):
+    db, wal = new_db(), MemoryWal(str(tmp_path))
+    wal.snapshot(db, background=False)
+    add(wal, db, [1, 2, 3])
+
+    # crash right after the commit marker is written
+    commit = MemoryWal._commit
+    monkeypatch.setattr(MemoryWal, "_commit", lambda self, segments: 1 / 0)
+    wal.snapshot(db, background=False)
+    monkeypatch.setattr(MemoryWal, "_commit", commit)
+    assert (tmp_path / memory_wal.COMMIT_MARKER).exists()
+    add(wal, db, [4])
+
+    loaded, wal = load_db(tmp_path)
+    assert state(loaded) == state(db)
+    assert not (tmp_path / memory_wal.COMMIT_MARKER).exists()
+    assert not wal._segments()
@@ -0,0 +1,87 @@
+import sys, os
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import pytest
+from langchain_core.documents import Document
+from simpleeval import simple_eval
+
+from python.helpers.metadata_index import MetadataIndex, compile_filter
+
+DOCS = {
+    f"d{i}": Document(
+        page_content=f"doc {i}",
+        metadata={
+            "id": f"d{i}",
+            "area": ["main", "fragments", "solutions"][i % 3],
+            "timestamp": f"2024-01-{i % 28 + 1:02d} 12:00:00",
+            **({"knowledge_source": True, "source_file": f"file{i % 4}.md"} if i % 5 == 0 else {}),
+            **({"tags": ["a", "b"]} if i % 7 == 0 else {}),
+        },
+    )
+    for i in range(100)
+}
+
+CONDITIONS = [
+    "area == 'main'",
+    "area=='solutions'",
+    "'fragments' == area",
+    "area == 'main' or area == 'fragments'",
+    "area != 'main'",
+    "knowledge_source",
+    "knowledge_source == True and source_file == 'file0.md'",
+    "not knowledge_source",
+    "timestamp > '2024-01-20'",
+    "timestamp <= '2024-01-05 12:00:00' and area == 'main'",
+    "timestamp >= '2024-01-10' and timestamp < '2024-01-12'",
+    "'a' in tags",
+    "len(tags) > 1",
+    "area == 'main' and 'b' in tags",
+    "missing == 1 or area == 'main'",
+    "area.startswith('sol')",
+]
+
+
+def reference(condition: str, metadata: dict) -> bool:
+    try:
+        return bool(simple_eval(condition, names=metadata))
+    except Exception:
+        return False
+
+
+def compiled(condition: str, metadata: dict) -> bool:
+    try:
+        return bool(compile_filter(condition).evaluate(metadata))
+    except Exception:
+        return False
+
+
+@pytest.mark.parametrize("condition", CONDITIONS)
+def test_same_result_as_simple_eval(condition):
+    index = MetadataIndex(docs=DOCS)
+    candidates = compile_filter(condition).candidates(index)
+    expected = {id for id, doc in DOCS.items() if reference(condition, doc.metadata)}
+
+    assert {id for id, doc in DOCS.items() if compiled(condition, doc.metadata)} == expected
+    if candidates is not None:
+        assert expected <= candidates
+
+
+def test_list_constants():
+    # not available in simple_eval, compiled filters accept them
+    index = MetadataIndex(docs=DOCS)
+    condition = "area in ['main', 'solutions']"
+    expected = {id for id, doc in DOCS.items() if doc.metadata["area"] != "fragments"}
+    assert {id for id, doc in DOCS.items() if compiled(condition, doc.metadata)} == expected
+    assert compile_filter(condition).candidates(index) == expected
+
+
+def test_lookups_narrow_and_follow_changes():
+    index = MetadataIndex(docs=DOCS)
+    assert len(compile_filter("area == 'main'").candidates(index)) == 34  # type: ignore
+    assert compile_filter("area.startswith('m')").candidates(index) is None
+
+    index.remove(["d0", "d3"])
+    index.add([("d3", Document(page_content="", metadata={"id": "d3", "area": "solutions"}))])
+    candidates = compile_filter("area == 'main'").candidates(index)
+    assert "d0" not in candidates and "d3" not in candidates  # type: ignore
+    assert "d3" in compile_filter("area == 'solutions'").candidates(index)  # type: ignore
@@ -0,0 +1,150 @@
+import sys, os, json
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import pytest
+
+from agent import AgentContext
+from initialize import initialize_agent
+from python.helpers import persist_chat
+
+
+@pytest.fixture
+def context(tmp_path, monkeypatch):
+    monkeypatch.setattr(persist_chat, "CHATS_FOLDER", str(tmp_path))
+    context = AgentContext(config=initialize_agent())
+    yield context
+    persist_chat._states.pop(context.id, None)
+    AgentContext.remove(context.id)
+
+
+def save(context: AgentContext):
+    persist_chat.save_tmp_chat(context)
+    persist_chat.flush_tmp_chats()
+
+
+def snapshot(context: AgentContext) -> dict:
+    # what a full chat.json of the current state holds
+    data = persist_chat._serialize_context(context)
+    return normalize(json.loads(persist_chat._safe_json_serialize(data, ensure_ascii=False)))
+
+
+def reload(context: AgentContext) -> dict:
+    return normalize(persist_chat._read_chat(context.id))
+
+
+def normalize(data: dict) -> dict:
+    for agent in data["agents"]:
+        agent["history"] = json.loads(agent["history"]) if agent["history"] else None
+    return data
+
+
+def segment(context: AgentContext) -> int:
+    with open(persist_chat._get_chat_file_path(context.id), encoding="utf-8") as f:
+        return json.load(f)["log_segment"]
+
+
+def records(context: AgentContext) -> list[dict]:
+    path = os.path.join(
+        persist_chat.get_chat_folder_path(context.id),
+        persist_chat.SEGMENT_FILE_NAME.format(segment(context)),
+    )
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f]
+
+
+def test_appended_changes_round_trip(context):
+    agent = context.agent0
+    save(context)
+    first = segment(context)
+
+    agent.history.add_message(False, "first question")
+    agent.history.add_message(True, "first answer")
+    item = context.log.log(type="user", heading="User message", content="first question")
+    context.name = "Renamed"
+    agent.data["note"] = {"a": 1}
+    save(context)
+    item.update(content="edited question")
+    context.log.log(type="response", content="first answer", finished=True)
+    save(context)
+
+    # changes went to the change log, not to a new chat.json
+    assert segment(context) == first
+    assert {r["t"] for r in records(context)} == {"context", "agent", "messages", "log"}
+    assert reload(context) == snapshot(context)
+
+
+def test_topic_switch_and_compression_round_trip(context):
+    history = context.agent0.history
+    history.add_message(False, "question")
+    save(context)
+    first = segment(context)
+
+    history.new_topic()  # restructured history, appended whole
+    history.add_message(False, "next question")
+    save(context)
+    assert segment(context) == first
+    assert records(context)[-1]["t"] == "history"
+    assert reload(context) == snapshot(context)
+
+    # compression rewrites earlier topics
+    history.topics[0].summary = "summary of the first topic"
+    history.revision += 1
+    history.add_message(True, "answer")
+    save(context)
+    assert reload(context) == snapshot(context)
+
+
+def test_log_reset_and_size_write_new_snapshot(context, monkeypatch):
+    save(context)
+    first = segment(context)
+    context.log.log(type="info", content="before reset")
+    context.log.reset()
+    context.log.log(type="info", content="after reset")
+    save(context)
+    assert segment(context) != first
+    assert reload(context) == snapshot(context)
+    first = segment(context)
+
+    monkeypatch.setattr(persist_chat, "COMPACT_SIZE", 1)
+    context.log.log(type="info", content="x" * 100)
+    save(context)
+    context.log.log(type="info", content="compacted")
+    save(context)
+    assert segment(context) != first
+    assert reload(context) == snapshot(context)
+    # superseded change logs are removed
+    assert persist_chat._list_segments(context.id) == []
+
+
+def test_torn_last_line_is_ignored(context):
+    save(context)
+    context.log.log(type="info", content="saved")
+    save(context)
+    expected = snapshot(context)
+
+    path = os.path.join(
+        persist_chat.get_chat_folder_path(context.id),
+        persist_chat.SEGMENT_FILE_NAME.format(segment(context)),
+    )
+    with open(path, "a", encoding="utf-8") as f:
+        f.write('{"t": "log", "progress": "torn", "items": [{"no": 1')
+    assert reload(context) == expected
+
+
+def test_log_window_offset_after_truncation(context, monkeypatch):
+    monkeypatch.setattr(persist_chat, "LOG_SIZE", 5)
+    items = [context.log.log(type="info", content=f"item {i}") for i in range(8)]
+    save(context)  # chat.json keeps only the last LOG_SIZE items
+
+    items[1].update(content="outside of the saved window")
+    items[6].update(content="inside of the saved window")
+    for i in range(8, 11):
+        context.log.log(type="info", content=f"item {i}")
+    save(context)
+
+    data = reload(context)
+    assert data == snapshot(context)
+    assert [item["no"] for item in data["log"]["logs"]] == [
+        item.no for item in context.log.logs[-5:]
+    ]
+    assert data["log"]["logs"][0]["content"] == "inside of the saved window"
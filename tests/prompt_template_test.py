@@ -0,0 +1,115 @@
+import sys, os
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from python.helpers import files
+
+
+def write(path, content: str, mtime_ns: int):
+    with open(path, "w") as f:
+        f.write(content)
+    os.utime(path, ns=(mtime_ns, mtime_ns))
+
+
+def test_templates_follow_file_changes(tmp_path):
+    default, profile = tmp_path / "prompts", tmp_path / "profile"
+    default.mkdir()
+    profile.mkdir()
+    dirs = [str(profile), str(default)]
+    write(default / "main.md", "hello {{name}}\n{{ include 'part.md' }} {{missing}}", 1_000_000_000)
+    write(default / "part.md", "part of {{name}}", 1_000_000_000)
+
+    assert files.read_prompt_file("main.md", dirs, name="A") == "hello A\npart of A {{missing}}"
+    assert files.read_prompt_file("main.md", dirs, name="B") == "hello B\npart of B {{missing}}"
+
+    # edited file
+    write(default / "part.md", "new part", 2_000_000_000)
+    assert files.read_prompt_file("main.md", dirs, name="A") == "hello A\nnew part {{missing}}"
+
+    # override added to the profile, then removed again
+    write(profile / "part.md", "profile part", 3_000_000_000)
+    os.utime(profile, ns=(3_000_000_000, 3_000_000_000))
+    assert files.read_prompt_file("main.md", dirs, name="A") == "hello A\nprofile part {{missing}}"
+    os.remove(profile / "part.md")
+    os.utime(profile, ns=(4_000_000_000, 4_000_000_000))
+    assert files.read_prompt_file("main.md", dirs, name="A") == "hello A\nnew part {{missing}}"
+
+
+def test_json_templates(tmp_path):
+    write(tmp_path / "data.md", '```json\n{"name": {{name}}, "items": {{items}}}\n```', 1_000_000_000)
+    assert files.parse_file("data.md", [str(tmp_path)], name="A", items=[1, 2]) == {
+        "name": "A",
+        "items": [1, 2],
+    }
+
+
+PLUGIN = """
+import os
+from python.helpers.files import VariablesPlugin
+
+calls = []
+
+
+class Parts(VariablesPlugin):
+    def get_cache_key(self, file, backup_dirs=None, **kwargs):
+        return tuple(backup_dirs or [])
+
+    def get_dependencies(self, file, backup_dirs=None, **kwargs):
+        return [os.path.join(backup_dirs[0], "part.md")]
+
+    def get_variables(self, file, backup_dirs=None, **kwargs):
+        calls.append(file)
+        with open(os.path.join(backup_dirs[0], "part.md")) as f:
+            return {"part": f.read()}
+"""
+
+
+def test_plugin_variables_are_cached(tmp_path):
+    write(tmp_path / "main.md", "main {{part}}", 1_000_000_000)
+    write(tmp_path / "main.py", PLUGIN, 1_000_000_000)
+    write(tmp_path / "part.md", "one", 1_000_000_000)
+    dirs = [str(tmp_path)]
+
+    assert files.read_prompt_file("main.md", dirs) == "main one"
+    assert files.read_prompt_file("main.md", dirs) == "main one"
+
+    write(tmp_path / "part.md", "two", 2_000_000_000)
+    assert files.read_prompt_file("main.md", dirs) == "main two"
+
+    from python.helpers import extract_tools
+
+    module = extract_tools.import_module(str(tmp_path / "main.py"))
+    assert len(module.calls) == 2
+
+
+
+NESTED_PLUGIN = """
+from python.helpers.files import VariablesPlugin
+from python.helpers import files
+
+
+class Nested(VariablesPlugin):
+    def get_cache_key(self, file, backup_dirs=None, **kwargs):
+        return tuple(backup_dirs or [])
+
+    def get_variables(self, file, backup_dirs=None, **kwargs):
+        return {"part": files.read_prompt_file("part.md", backup_dirs)}
+"""
+
+
+def test_cached_variables_follow_nested_prompts(tmp_path):
+    write(tmp_path / "main.md", "main {{part}}", 1_000_000_000)
+    write(tmp_path / "main.py", NESTED_PLUGIN, 1_000_000_000)
+    write(tmp_path / "part.md", "part {{ include 'tips.md' }}", 1_000_000_000)
+    write(tmp_path / "tips.md", "one", 1_000_000_000)
+    dirs = [str(tmp_path)]
+
+    assert files.read_prompt_file("main.md", dirs) == "main part one"
+    # the prompts read by the plugin are no declared dependencies, still tracked
+    write(tmp_path / "tips.md", "two", 2_000_000_000)
+    assert files.read_prompt_file("main.md", dirs) == "main part two"
+
+    # a reloaded plugin replaces the instance of its previous version
+    count = len(files._plugin_instances)
+    write(tmp_path / "main.py", NESTED_PLUGIN + "\n", 2_000_000_000)
+    assert files.read_prompt_file("main.md", dirs) == "main part two"
+    assert len(files._plugin_instances) == count
@@ -0,0 +1,88 @@
+import sys, os, asyncio, threading, time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import pytest
+
+from python.helpers import rate_limiter
+from python.helpers.rate_limiter import RateLimiter
+
+
+async def timed_acquires(limiter: RateLimiter, count: int, **amounts) -> list[float]:
+    start = time.time()
+    done = []
+
+    async def acquire(i):
+        await limiter.acquire(**amounts)
+        done.append((i, time.time() - start))
+
+    await asyncio.gather(*(acquire(i) for i in range(count)))
+    assert [i for i, _ in done] == list(range(count))  # first come first served
+    return [t for _, t in done]
+
+
+def test_waiters_wake_when_capacity_frees():
+    limiter = RateLimiter(seconds=1, requests=2)
+    times = asyncio.run(timed_acquires(limiter, 5, requests=1))
+    assert times[1] < 0.1
+    assert 0.95 < times[2] < 1.2 and 0.95 < times[3] < 1.2
+    assert 1.95 < times[4] < 2.2
+
+
+def test_token_amounts_and_callback():
+    limiter = RateLimiter(seconds=1, input=100)
+    limiter.add(input=150)  # a single oversized amount passes an empty window
+    messages = []
+
+    async def callback(msg, key, total, limit):
+        messages.append((key, total, limit))
+        return True  # stop waiting
+
+    asyncio.run(limiter.acquire(callback, input=10))
+    assert messages == [("input", 150, 100)]
+    assert asyncio.run(limiter.get_total("input")) == 160
+
+
+@pytest.mark.skipif(not rate_limiter.SHARED_SUPPORTED, reason="no file locks")
+def test_shared_file_budget(tmp_path):
+    path = str(tmp_path / "limit.json")
+    first = RateLimiter(seconds=1, path=path, requests=2)
+    second = RateLimiter(seconds=1, path=path, requests=2)
+
+    async def run():
+        start = time.time()
+        await first.acquire(requests=1)
+        await second.acquire(requests=1)
+        await first.acquire(requests=1)
+        return time.time() - start
+
+    assert 0.95 < asyncio.run(run()) < 1.2
+
+
+
+def test_sync_acquire_does_not_nest_loops(monkeypatch):
+    import models
+
+    threads = []
+    acquire = RateLimiter.acquire
+
+    async def recording_acquire(self, *args, **kwargs):
+        threads.append(threading.get_ident())
+        return await acquire(self, *args, **kwargs)
+
+    monkeypatch.setattr(RateLimiter, "acquire", recording_acquire)
+    config = models.ModelConfig(
+        type=models.ModelType.EMBEDDING, provider="test", name="sync", limit_requests=1
+    )
+    models.rate_limiters.pop("test\\sync", None)
+    models.get_rate_limiter("test", "sync", 1, 0, 0).timeframe = 1
+
+    async def sync_calls_on_loop():
+        start = time.time()
+        models.apply_rate_limiter_sync(config, "text")
+        models.apply_rate_limiter_sync(config, "text")  # waits for the first to expire
+        return time.time() - start
+
+    assert 0.95 < asyncio.run(sync_calls_on_loop()) < 1.3
+    # the limiter was awaited off the thread running the loop, not in a loop nested in it
+    assert len(threads) == 2 and threading.get_ident() not in threads
+    models.rate_limiters.pop("test\\sync", None)
@@ -0,0 +1,49 @@
+import sys, os
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import pytest
+
+from python.helpers.scheduler_store import SchedulerStore, TaskRow
+
+
+def row(uuid: str, state: str = "idle", context_id: str | None = None) -> TaskRow:
+    return TaskRow(uuid, "adhoc", f"task {uuid}", state, context_id or uuid, f'{{"uuid": "{uuid}"}}')
+
+
+def test_rows_and_lookups(tmp_path):
+    store = SchedulerStore(str(tmp_path / "tasks.db"))
+    with store.transaction():
+        store.put([row("a"), row("b", "running", "ctx"), row("c", context_id="ctx")])
+    with store.transaction():
+        store.put([row("a", "error")])  # row level update
+
+    assert [r.uuid for r in store.get_all()] == ["a", "b", "c"]
+    assert store.get("a").state == "error"  # type: ignore
+    assert store.get_uuids_by_context_id("ctx") == ["b", "c"]
+    assert store.get_uuids_by_context_id("ctx", "running") == ["b"]
+    assert store.get_uuids_by_state("idle") == ["c"]
+
+    with store.transaction():
+        store.delete(["b"])
+    assert store.count() == 2 and store.get("b") is None
+
+
+def test_rollback_and_other_connections(tmp_path):
+    store = SchedulerStore(str(tmp_path / "tasks.db"))
+    other = SchedulerStore(str(tmp_path / "tasks.db"))
+
+    with pytest.raises(ValueError):
+        with store.transaction():
+            store.put([row("a")])
+            raise ValueError()
+    assert store.count() == 0
+
+    version = store.get_data_version()
+    with store.transaction():
+        store.put([row("a")])
+    assert store.get_data_version() == version  # own commits do not count
+
+    with other.transaction():
+        other.put([row("b")])
+    assert store.get_data_version() != version
+    assert store.count() == 2
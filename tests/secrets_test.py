@@ -0,0 +1,40 @@
+import sys, os
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from python.helpers.secrets import SecretsMatcher, StreamingSecretsFilter
+
+
+def test_matcher_prefers_longest_overlapping_value():
+    matcher = SecretsMatcher({"abcd": "SHORT", "abcdef": "LONG", "defg": "OTHER"})
+    assert matcher.replace("x abcdefg abcd defg") == (
+        "x §§secret(LONG)g §§secret(SHORT) §§secret(OTHER)"
+    )
+    assert matcher.replace("abcdabcd", "***{key}") == "***SHORT***SHORT"
+    assert SecretsMatcher({}).replace("abcd") == "abcd"
+
+
+def stream(filter: StreamingSecretsFilter, text: str, size: int) -> str:
+    out = "".join(filter.process_chunk(text[i : i + size]) for i in range(0, len(text), size))
+    assert out == filter.output
+    return out + filter.finalize()
+
+
+def test_filter_masks_values_split_across_chunks():
+    secrets = {"TOKEN": "s3cr3t-token", "PASS": "s3cr3t"}
+    text = "use s3cr3t-token and s3cr3t, not s3cr3"
+    expected = "use §§secret(TOKEN) and §§secret(PASS), not ***"
+    for size in range(1, len(text) + 1):
+        filter = StreamingSecretsFilter(secrets)
+        assert stream(filter, text, size) == expected, size
+        assert filter.output == expected and not filter.pending
+
+
+def test_filter_finalize_keeps_text_that_is_no_secret():
+    filter = StreamingSecretsFilter({"KEY": "value123"})
+    assert filter.process_chunk("a val") == "a "
+    assert filter.pending == "val"
+    assert filter.process_chunk("id") == "valid"
+    assert filter.process_chunk(" valu") == " "
+    assert filter.finalize() == "***"
+    assert filter.output == "a valid ***"
+    assert filter.finalize() == ""
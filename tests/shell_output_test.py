@@ -0,0 +1,47 @@
+import sys, os
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import random
+
+from python.helpers import shell_output
+from python.helpers.shell_output import ShellOutput, clean_string, get_last_lines, strip_byte_escapes
+
+
+def test_chunks_clean_like_whole_output():
+    rnd = random.Random(1)
+    alphabet = ["a", "b", " ", "\r", "\n", "\r\n", "\x1b[31m", "\x1b[0m", "\x00", "> ", "\\", "\\x4", "1", "\\xff"]
+    for n in range(2000):
+        raw = "".join(rnd.choice(alphabet) for _ in range(rnd.randint(0, 30)))
+        if n % 2:
+            raw = "\r\r\n> " + raw
+        output = ShellOutput()
+        i = 0
+        while i < len(raw):
+            j = i + rnd.randint(1, 5)
+            output.feed(raw[i:j])
+            i = j
+        assert output.get_text() == strip_byte_escapes(clean_string(raw)), repr(raw)
+
+
+def test_head_and_tail_are_kept():
+    output = ShellOutput(limit=100, placeholder=lambda length: f"[{length}]")
+    for i in range(1000):
+        output.feed(f"line {i}\n")
+    output.feed("progress 10%\rprogress 99%")
+
+    text = output.get_text()
+    assert text.startswith("line 0\nline 1\n")
+    assert f"[{output.dropped}]" in text
+    assert text.endswith("line 999\nprogress 99%")
+    assert len(text) == 100 + len(f"[{output.dropped}]") + len("progress 99%")
+    assert get_last_lines(text, 2) == ["line 999", "progress 99%"]
+
+
+def test_long_lines_keep_byte_escapes_whole(monkeypatch):
+    monkeypatch.setattr(shell_output, "LINE_LIMIT", 2000)
+    for shift in range(8):
+        raw = "a" * shift + "\\\\x41b\\x41" * 500
+        output = ShellOutput()
+        for i in range(0, len(raw), 700):
+            output.feed(raw[i : i + 700])
+        assert output.get_text() == strip_byte_escapes(clean_string(raw))
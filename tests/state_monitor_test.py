@@ -0,0 +1,47 @@
+import sys, os, threading, time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from python.helpers import state_monitor
+
+
+def wait_in_thread(context_id: str, timeout: float = 5.0):
+    version = state_monitor.get_version(context_id)
+    result = {}
+
+    def wait():
+        start = time.monotonic()
+        result["version"] = state_monitor.wait_for_change(version, timeout, context_id)
+        result["elapsed"] = time.monotonic() - start
+
+    thread = threading.Thread(target=wait)
+    thread.start()
+    time.sleep(0.05)
+    return version, thread, result
+
+
+def test_other_contexts_do_not_wake():
+    version, thread, result = wait_in_thread("a", timeout=0.3)
+    state_monitor.mark_dirty("b")
+    thread.join()
+    assert result["version"] == version
+    assert result["elapsed"] >= 0.25
+
+
+def test_own_context_and_shared_changes_wake():
+    version, thread, result = wait_in_thread("a")
+    state_monitor.mark_dirty("a")
+    thread.join()
+    assert result["version"][1] == version[1] + 1 and result["elapsed"] < 1
+
+    version, thread, result = wait_in_thread("a")
+    state_monitor.mark_dirty()
+    thread.join()
+    assert result["version"][0] == version[0] + 1 and result["elapsed"] < 1
+
+    # streams without a context only follow the shared version
+    version, thread, result = wait_in_thread("", timeout=0.3)
+    state_monitor.mark_dirty("a")
+    thread.join()
+    assert result["version"] == version
+    assert state_monitor._waiters == {}
@@ -0,0 +1,110 @@
+import sys, os, asyncio, threading, time
+from datetime import datetime, timezone
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import pytest
+
+from python.helpers import task_scheduler
+from python.helpers.task_scheduler import (
+    ScheduledTask,
+    SchedulerTaskList,
+    TaskSchedule,
+    TaskScheduler,
+    TaskState,
+)
+
+
+class Clock:
+    now = datetime(2026, 1, 1, 12, 0, 30, tzinfo=timezone.utc)
+
+
+class FrozenDatetime(datetime):
+    @classmethod
+    def now(cls, tz=None):
+        return Clock.now if tz else Clock.now.replace(tzinfo=None)
+
+
+@pytest.fixture
+def scheduler(monkeypatch):
+    tasks = SchedulerTaskList(tasks=[])  # in memory, without a store
+    monkeypatch.setattr(SchedulerTaskList, "get", classmethod(lambda cls: tasks))
+    monkeypatch.setattr(task_scheduler, "datetime", FrozenDatetime)
+    monkeypatch.setattr(Clock, "now", Clock.now)
+    scheduler = TaskScheduler()
+    monkeypatch.setattr(TaskScheduler, "_instance", scheduler)
+    return scheduler
+
+
+def every_minute(name: str = "task") -> ScheduledTask:
+    schedule = TaskSchedule(minute="*", hour="*", day="*", month="*", weekday="*", timezone="UTC")
+    return ScheduledTask(name=name, system_prompt="", prompt="", schedule=schedule)
+
+
+def at(minute: int, second: int) -> datetime:
+    return datetime(2026, 1, 1, 12, minute, second, tzinfo=timezone.utc)
+
+
+def test_fire_times_pop_once_across_rebuilds(scheduler):
+    task = every_minute()
+    asyncio.run(scheduler._tasks.add_task(task))
+    assert scheduler._pop_due_tasks() == []
+
+    Clock.now = at(1, 10)
+    assert scheduler._pop_due_tasks() == [task]
+    Clock.now = at(1, 20)
+    assert scheduler._pop_due_tasks() == []
+
+    # a change of the task list rebuilds the heap from the last fire time
+    task.update(prompt="changed")
+    asyncio.run(scheduler.save())
+    asyncio.run(scheduler._tasks.add_task(every_minute("other")))
+    Clock.now = at(1, 30)
+    assert scheduler._pop_due_tasks() == []
+
+    Clock.now = at(2, 5)
+    assert sorted(t.name for t in scheduler._pop_due_tasks()) == ["other", "task"]
+    assert scheduler._pop_due_tasks() == []
+
+
+def test_busy_tasks_are_skipped(scheduler):
+    running, disabled, idle = every_minute("running"), every_minute("disabled"), every_minute("idle")
+    running.state = TaskState.RUNNING
+    disabled.state = TaskState.DISABLED
+    for task in (running, disabled, idle):
+        asyncio.run(scheduler._tasks.add_task(task))
+    assert scheduler._pop_due_tasks() == []
+
+    Clock.now = at(1, 0)
+    assert scheduler._pop_due_tasks() == [idle]
+
+    # the missed run is not repeated once the task is idle again
+    running.state = TaskState.IDLE
+    assert scheduler._pop_due_tasks() == []
+    Clock.now = at(2, 0)
+    assert sorted(t.name for t in scheduler._pop_due_tasks()) == ["idle", "running"]
+
+
+def test_lease_refuses_second_run(scheduler):
+    task = every_minute()
+    asyncio.run(scheduler._tasks.add_task(task))
+
+    assert scheduler._acquire_lease(task.uuid)
+    assert not scheduler._acquire_lease(task.uuid)
+    asyncio.run(scheduler._run_task(task))  # skipped while leased
+    assert scheduler.get_task_by_uuid(task.uuid).state == TaskState.IDLE  # type: ignore
+
+    scheduler._release_lease(task.uuid)
+    assert scheduler._acquire_lease(task.uuid)
+
+
+def test_wait_wakes_on_change(scheduler):
+    async def main():
+        waiting = asyncio.ensure_future(scheduler.wait_for_next_run(10))
+        await asyncio.sleep(0.05)
+        threading.Thread(target=TaskScheduler.notify_change).start()
+        start = time.monotonic()
+        await asyncio.wait_for(waiting, 5)
+        return time.monotonic() - start
+
+    assert asyncio.run(main()) < 1
+    assert scheduler._waiters == []
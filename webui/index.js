@@ -274,6 +274,20 @@ export async function poll() {
       return false;
     }
 
+    updated = await applyPollResponse(response);
+  } catch (error) {
+    console.error("Error:", error);
+    setConnectionStatus(false);
+  }
+
+  return updated;
+}
+globalThis.poll = poll;
+
+// apply a state payload from /poll or /poll_stream to the UI
+async function applyPollResponse(response) {
+  let updated = false;
+  try {
     // deselect chat if it is requested by the backend
     if (response.deselect_chat) {
       chatsStore.deselectChat();
@@ -387,7 +401,6 @@ export async function poll() {
 
   return updated;
 }
-globalThis.poll = poll;
 
 function afterMessagesUpdate(logs) {
   if (localStorage.getItem("speech") == "true") {
@@ -492,6 +505,9 @@ export const setContext = function (id) {
 
   //skip one speech if enabled when switching context
   if (localStorage.getItem("speech") == "true") skipOneSpeech = true;
+
+  // the update stream is bound to a context, reopen it for the new one
+  if (updateStream) openUpdateStream();
 };
 
 export const deselectChat = function () {
@@ -598,6 +614,67 @@ async function startPolling() {
   _doPoll();
 }
 
+let updateStream = null;
+let updateStreamQueue = Promise.resolve();
+
+// Receive state updates pushed over server-sent events, nothing is requested while idle
+// Falls back to polling when EventSource is unavailable or the stream cannot be opened
+async function startUpdates() {
+  if (!globalThis.EventSource) return startPolling();
+  await poll(); // initial state, also obtains the CSRF cookie the stream authenticates with
+  openUpdateStream();
+}
+
+function openUpdateStream() {
+  closeUpdateStream();
+
+  const params = new URLSearchParams({
+    log_from: lastLogVersion,
+    notifications_from: notificationStore.lastNotificationVersion || 0,
+    timezone: Intl.DateTimeFormat().resolvedOptions().timeZone,
+  });
+  if (context) params.set("context", context);
+
+  const stream = new EventSource(`/poll_stream?${params}`);
+  let opened = false;
+
+  stream.onopen = () => {
+    opened = true;
+    setConnectionStatus(true);
+  };
+
+  stream.onmessage = (event) => {
+    if (stream !== updateStream) return;
+    const response = JSON.parse(event.data);
+    // apply payloads one by one, a chat reset re-polls in between
+    updateStreamQueue = updateStreamQueue.then(() => applyPollResponse(response));
+  };
+
+  stream.onerror = () => {
+    if (stream !== updateStream) return;
+    closeUpdateStream();
+    if (!opened) {
+      // stream not available (proxy, old server), use polling instead
+      startPolling();
+      return;
+    }
+    // reconnect ourselves so the stream resumes from the current log version
+    setConnectionStatus(false);
+    setTimeout(async () => {
+      if (updateStream) return;
+      await poll();
+      openUpdateStream();
+    }, 1000);
+  };
+
+  updateStream = stream;
+}
+
+function closeUpdateStream() {
+  if (updateStream) updateStream.close();
+  updateStream = null;
+}
+
 // All initializations and event listeners are now consolidated here
 document.addEventListener("DOMContentLoaded", function () {
   // Assign DOM elements to variables now that the DOM is ready
@@ -619,8 +696,8 @@ document.addEventListener("DOMContentLoaded", function () {
     chatHistory.addEventListener("scroll", updateAfterScroll);
   }
 
-  // Start polling for updates
-  startPolling();
+  // Start receiving updates
+  startUpdates();
 });
 
 /*